@@ -10,14 +10,42 @@ DIGITAL_OUTPUT_PIN = 4  # Salida digital a activar al detectar contacto
 # Parámetros de movimiento
 SPEED = 0.3  # m/s
 ACCELERATION = 0.2  # m/s^2
-WAIT_TIME = 2  # Tiempo de espera entre movimientos (segundos)
+WAIT_TIME = 0  # Espera mínima tras cada movimiento (segundos); el final se detecta por RTDE
+SETTLE_TOLERANCE_RAD = 1e-3  # Error articular máximo para dar un moveJ por terminado (rad)
+SETTLE_TOLERANCE_M = 5e-4  # Error de posición TCP máximo para dar un moveL por terminado (m)
+SETTLE_VELOCITY = 2e-3  # Velocidad máxima para considerar el robot parado (rad/s o m/s)
+SETTLE_TIMEOUT = 2.0  # Espera máxima de asentamiento (segundos)
 
 # --- FUNCIONES ---
+def wait_until_settled(con_rcv, target, joint_space):
+    """Espera a que el robot esté en el objetivo y parado (estado RTDE). Devuelve el tiempo de asentamiento."""
+    t0 = time.perf_counter()
+    if WAIT_TIME > 0:
+        time.sleep(WAIT_TIME)  # Espera mínima opcional
+    while True:
+        if joint_space:
+            actual, velocidad = con_rcv.getActualQ(), con_rcv.getActualQd()
+            error = max(abs(a - b) for a, b in zip(actual, target))
+            tolerancia = SETTLE_TOLERANCE_RAD
+        else:
+            actual, velocidad = con_rcv.getActualTCPPose(), con_rcv.getActualTCPSpeed()
+            error = sum((a - b) ** 2 for a, b in zip(actual[:3], target[:3])) ** 0.5
+            tolerancia = SETTLE_TOLERANCE_M
+        if error <= tolerancia and max(abs(v) for v in velocidad) <= SETTLE_VELOCITY:
+            break  # En el objetivo y parado
+        if time.perf_counter() - t0 >= SETTLE_TIMEOUT:
+            print(f"AVISO: El robot no se asentó en {SETTLE_TIMEOUT} s (error {error:.2e}).")
+            break
+        time.sleep(0.004)
+    settle_time = time.perf_counter() - t0
+    print(f"Movimiento asentado en {settle_time * 1000:.0f} ms")
+    return settle_time
+
 def move_linear(con_ctr, con_rcv, pose, speed, acceleration):
     """Realiza un movimiento lineal a las coordenadas especificadas y muestra la posición actual."""
     print(f"Moviendo linealmente a: {pose}")
     con_ctr.moveL(pose, speed, acceleration)  # Movimiento lineal
-    time.sleep(WAIT_TIME)  # Esperar para estabilización
+    wait_until_settled(con_rcv, pose, joint_space=False)  # Esperar a que llegue y se pare
     current_pose = con_rcv.getActualTCPPose()  # Obtener la posición actual
     print(f"Posición actual del robot: {current_pose}")
     return current_pose  # Retorna la posición actual
@@ -26,7 +54,7 @@ def move_joint(con_ctr, con_rcv, q, speed, acceleration):
     """Realiza un movimiento articular a las coordenadas especificadas y muestra la posición actual."""
     print(f"Moviendo a la posición articular: {q}")
     con_ctr.moveJ(q, speed, acceleration)  # Movimiento articular
-    time.sleep(WAIT_TIME)  # Esperar para estabilización
+    wait_until_settled(con_rcv, q, joint_space=True)  # Esperar a que llegue y se pare
     current_pose = con_rcv.getActualTCPPose()  # Obtener la posición actual
     print(f"Posición actual del robot: {current_pose}")
     return current_pose  # Retorna la posición actual
@@ -3,6 +3,11 @@ import numpy as np
 import glob
 import os
 import json
+import sys
+
+# Undistorter compartido con el código principal (FinalCode/undistorter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FinalCode"))
+from undistorter import Undistorter
 
 CHECKERBOARD = (10, 7)
 SQUARE_SIZE = 0.025
@@ -53,9 +58,9 @@ if objpoints:
     with open("intrinsic_calibration_data.json", "w") as f:
         json.dump({"camera_matrix": K.tolist(), "dist_coeffs": dist.tolist()}, f, indent=4)
 
+    # Mapas calculados una sola vez para todas las imágenes (misma resolución)
+    undistorter = Undistorter(K, dist)
     for fname in images:
         img = cv2.imread(fname)
-        h, w = img.shape[:2]
-        newcameramtx, _ = cv2.getOptimalNewCameraMatrix(K, dist, (w, h), 1, (w, h))
-        undistorted = cv2.undistort(img, K, dist)
+        undistorted = undistorter.undistort(img)
         cv2.imwrite(f"output/sin_distorsion/{os.path.basename(fname)}", undistorted)
\ No newline at end of file
@@ -1,4 +1,5 @@
 import sys
+import os
 import cv2
 import numpy as np
 import json
@@ -8,6 +9,10 @@ from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtCore import QTimer
 from sklearn.linear_model import LinearRegression
 
+# Undistorter compartido con el código principal (FinalCode/undistorter.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "FinalCode"))
+from undistorter import Undistorter
+
 JSON_PATH = "calibracion_ur3.json"
 INTRINSIC_PATH = "intrinsic_calibration_data.json"
 Z_FIJA = 0.24130077681581635
@@ -19,10 +24,9 @@ def cargar_intrinsecos():
         dist_coeffs = np.array(data["dist_coeffs"])
     return camera_matrix, dist_coeffs
 
-def desdistorsionar(imagen, camera_matrix, dist_coeffs):
-    h, w = imagen.shape[:2]
-    new_camera_matrix, _ = cv2.getOptimalNewCameraMatrix(camera_matrix, dist_coeffs, (w, h), 1)
-    return cv2.undistort(imagen, camera_matrix, dist_coeffs, None, new_camera_matrix)
+def desdistorsionar(imagen, undistorter):
+    # Los mapas de remapeo (alpha=1) se calculan una vez por resolución y se reutilizan en cada frame
+    return undistorter.undistort(imagen)
 
 def detectar_tapones(imagen, umbral_area=500):
     hsv = cv2.cvtColor(imagen, cv2.COLOR_BGR2HSV)
@@ -130,13 +134,15 @@ class DetectorGUI(QMainWindow):
 
         self.modelo = None
         self.camera_matrix, self.dist_coeffs = cargar_intrinsecos()
+        self.undistorter = Undistorter(self.camera_matrix, self.dist_coeffs, alpha=1,
+                                       cache_dir=os.path.dirname(os.path.abspath(INTRINSIC_PATH)))
 
     def actualizar_frame(self):
         ret, frame = self.cap.read()
         if not ret:
             return
 
-        frame = desdistorsionar(frame, self.camera_matrix, self.dist_coeffs)
+        frame = desdistorsionar(frame, self.undistorter)
         centros = detectar_tapones(frame)
 
         for i, (color, u, v) in enumerate(centros):
@@ -0,0 +1,73 @@
+# benchmarkCapSelection.py
+"""
+Tiempo de selección de tapones (CapDecisionMaker.select_top_caps y plan_picks, con la holgura
+como término de la puntuación) sobre bandejas sintéticas densas, y de la holgura por el índice de
+rejilla de spatialIndex.py frente a la de todos los pares (N×N), para ajustar GRID_MIN_DETECTIONS.
+Comprueba también que ambas dan la misma holgura por debajo del radio de la rejilla.
+
+Disposición: tapones de 40-60 px en una rejilla hexagonal de paso 60-85 px con
+posiciones con ruido, como una bandeja llena; parte de ellos por debajo de los umbrales de validez.
+
+Uso: python3 benchmarkCapSelection.py [repeticiones]
+"""
+import sys
+import time
+import numpy as np
+
+from decisionMaker import CapDecisionMaker
+from spatialIndex import IndiceRejilla
+from detectionSet import DetectionSet
+from detectionMetrics import percentiles_latencia
+
+SIZES = [25, 100, 400, 1000, 2500]
+REPEATS = 20
+SEED = 0
+
+
+def bandeja_densa(n, rng):
+    """DetectionSet con n tapones empaquetados en una rejilla hexagonal con ruido."""
+    lado = rng.uniform(40, 60, size=n)
+    paso = 60 + 25 * rng.random()
+    columnas = int(np.ceil(np.sqrt(n)))
+    fila, columna = np.divmod(np.arange(n), columnas)
+    cx = columna * paso + (fila % 2) * paso / 2 + rng.normal(0, 4, n)
+    cy = fila * paso * 0.87 + rng.normal(0, 4, n)
+    ancho = lado * rng.uniform(0.9, 1.1, n)
+    boxes = np.stack([cx - ancho / 2, cy - lado / 2, cx + ancho / 2, cy + lado / 2], axis=1).round()
+    confidence = rng.uniform(0.5, 1.0, n)
+    return DetectionSet(boxes, confidence, rng.integers(0, 6, n))
+
+
+def medir(funcion, repeticiones):
+    latencias = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        latencias.append(time.perf_counter() - t0)
+    return percentiles_latencia(latencias)
+
+
+if __name__ == "__main__":
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+    rng = np.random.default_rng(SEED)
+    decision_maker = CapDecisionMaker(min_area=2000, min_confidence=0.7)
+    radio = decision_maker.clearance_radius_px
+
+    print(f"{'tapones':>8}{'rejilla ms':>12}{'N×N ms':>10}{'speedup':>9}{'selección ms':>14}"
+          f"{'plan ms':>9}{'aislados':>10}")
+    for n in SIZES:
+        ds = bandeja_densa(n, rng)
+        rejilla = IndiceRejilla(ds.boxes, radio).holguras()
+        completa = CapDecisionMaker.compute_clearance(ds)
+        if not np.array_equal(np.where(completa < radio, completa, np.inf), rejilla):
+            print(f"ERROR: La holgura por rejilla no coincide con la de todos los pares (N={n}).")
+            sys.exit(1)
+
+        t_rejilla = medir(lambda: IndiceRejilla(ds.boxes, radio).holguras(), repeticiones)
+        t_completa = medir(lambda: CapDecisionMaker.compute_clearance(ds), max(1, repeticiones // 4))
+        t_seleccion = medir(lambda: decision_maker.select_top_caps(ds, k=1), repeticiones)
+        t_plan = medir(lambda: decision_maker.plan_picks(ds), repeticiones)
+        aislados = int(np.sum(rejilla >= decision_maker.min_clearance_px))
+        print(f"{n:>8}{t_rejilla['p50']:>12.2f}{t_completa['p50']:>10.2f}"
+              f"{t_completa['p50'] / t_rejilla['p50']:>8.1f}x{t_seleccion['p50']:>14.2f}"
+              f"{t_plan['p50']:>9.2f}{aislados:>10}")
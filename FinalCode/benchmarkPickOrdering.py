@@ -0,0 +1,70 @@
+# benchmarkPickOrdering.py
+"""
+Ahorro estimado del orden de recogida optimizado (pickOrdering.py) sobre disposiciones aleatorias
+de tapones en la bandeja, sin robot: las pre-recogidas se aproximan con ik_aproximada desde la
+posición de captura y los tiempos con el perfil trapezoidal de los moveJ de main.py.
+
+Compara, por número de tapones del plan:
+  - vía aproximación: orden de puntuación pasando por PICK_APPROACH_JOINTS tras cada depósito.
+  - puntuación: orden de puntuación con moveJ directo del depósito a la pre-recogida.
+  - optimizado: vecino más cercano + 2-opt.
+
+Uso: python3 benchmarkPickOrdering.py [disposiciones_por_tamaño] [max_tapones]
+"""
+import sys
+import time
+import numpy as np
+
+from robotPositions import (DEPOSIT_POSITIONS, IMAGE_CAPTURE_POSITION_JOINTS, PICK_APPROACH_JOINTS,
+                            DEFAULT_CALIBRATION, pixel_a_robot)
+from pickOrdering import OptimizadorOrden, ik_aproximada, tiempo_move_joint
+
+SPEED, ACCEL = 3, 8                    # Los moveJ de main.py
+TRAY_PX = (80, 40, 560, 440)           # Zona de la bandeja en el frame (x1, y1, x2, y2)
+CAPTURE_PX = (320, 240)                # Píxel bajo el TCP en la posición de captura (aprox.)
+LAYOUTS = 200
+MAX_PICKS = 5                          # MAX_PICKS_PER_CAPTURE de main.py
+SEED = 0
+
+
+def tiempo_via_aproximacion(prepick, colores, start):
+    """Ciclo como antes de optimizar: cada recogida tras un depósito pasa por PICK_APPROACH_JOINTS."""
+    t = lambda a, b: tiempo_move_joint(a, b, SPEED, ACCEL)
+    total, actual = 0.0, start
+    for i, (q, color) in enumerate(zip(prepick, colores)):
+        if i > 0:
+            total += t(actual, PICK_APPROACH_JOINTS)
+            actual = PICK_APPROACH_JOINTS
+        deposito = DEPOSIT_POSITIONS[color]
+        total += t(actual, q) + t(q, deposito)
+        actual = deposito
+    return total + t(actual, start)
+
+
+if __name__ == "__main__":
+    layouts = int(sys.argv[1]) if len(sys.argv) > 1 else LAYOUTS
+    rng = np.random.default_rng(SEED)
+    max_picks = int(sys.argv[2]) if len(sys.argv) > 2 else MAX_PICKS
+    pixel_to_robot = lambda px, py: pixel_a_robot(DEFAULT_CALIBRATION, px, py)
+    ik = ik_aproximada(IMAGE_CAPTURE_POSITION_JOINTS, pixel_to_robot(*CAPTURE_PX))
+    optimizador = OptimizadorOrden(DEPOSIT_POSITIONS, ik, speed=SPEED, accel=ACCEL)
+    nombres = list(DEPOSIT_POSITIONS)
+
+    print(f"{'tapones':>8}{'vía aprox. s':>14}{'puntuación s':>14}{'optimizado s':>14}"
+          f"{'ahorro %':>10}{'total %':>9}{'ms':>7}")
+    for n in range(2, max(max_picks, 2) + 1):
+        via, base, opt, dur = [], [], [], []
+        for _ in range(layouts):
+            px = rng.uniform(TRAY_PX[:2], TRAY_PX[2:], size=(n, 2))
+            caps = [{"robot_xyz": pixel_to_robot(x, y)} for x, y in px]
+            colores = list(rng.choice(nombres, size=n))
+            t0 = time.perf_counter()
+            orden, informe = optimizador.ordenar(caps, colores, IMAGE_CAPTURE_POSITION_JOINTS)
+            dur.append(time.perf_counter() - t0)
+            via.append(tiempo_via_aproximacion([ik(c["robot_xyz"]) for c in caps], colores,
+                                               IMAGE_CAPTURE_POSITION_JOINTS))
+            base.append(informe["tiempo_original_s"])
+            opt.append(informe["tiempo_optimizado_s"])
+        via, base, opt = np.mean(via), np.mean(base), np.mean(opt)
+        print(f"{n:>8}{via:>14.2f}{base:>14.2f}{opt:>14.2f}{100 * (base - opt) / base:>10.1f}"
+              f"{100 * (via - opt) / via:>9.1f}{1000 * np.mean(dur):>7.2f}")
@@ -0,0 +1,107 @@
+# benchmarkRoiInference.py
+"""
+Latencia frente a recall del detector de tapones para distintos ajustes de ROI, resolución y
+teselado (TaponesDetector(..., roi=..., imgsz=..., tile_size=...)), sobre frames grabados y
+etiquetados (formato YOLO).
+
+Para cada ajuste se infiere sobre todas las imágenes y se mide:
+  - recall y precisión en el punto de trabajo (conf 0.25, IoU 0.5), con las cajas ya devueltas
+    en píxeles del frame completo. Los tapones etiquetados fuera del ROI cuentan como perdidos.
+  - tapones perdidos respecto al ajuste de referencia (el primero de SETTINGS).
+  - percentiles de latencia de analizar_imagen (recorte + inferencia + extracción).
+
+Sirve para elegir DETECTOR_ROI, DETECTOR_IMGSZ y DETECTOR_TILE_SIZE de main.py: el ajuste más
+rápido que no pierde tapones.
+
+Uso: python3 benchmarkRoiInference.py [backend] [patrón_de_imágenes]
+"""
+import sys
+import glob
+import time
+import cv2
+import numpy as np
+
+from capDetection import TaponesDetector
+from detectionMetrics import EvaluadorDetecciones, cargar_etiquetas_yolo, percentiles_latencia
+
+MODEL_PATH = "train3/weights/best.pt"
+BACKEND = "ultralytics"
+IMAGES_GLOB = "dataset/valid/images/*.jpg"   # Frames grabados con labels/*.txt
+NUM_CLASSES = 6
+TRAY_ROI = [120, 60, 400, 360]               # [x, y, w, h] de la bandeja (ajustar a la célula)
+# (nombre, roi, imgsz, tile_size). El primero es la referencia (frame entero a la resolución de
+# entrenamiento). Los ajustes con teselas solo aportan si los frames son mayores que la tesela.
+SETTINGS = [
+    ("completo_640", None, 640, None),
+    ("completo_480", None, 480, None),
+    ("completo_320", None, 320, None),
+    ("roi_640", TRAY_ROI, 640, None),
+    ("roi_416", TRAY_ROI, 416, None),
+    ("roi_320", TRAY_ROI, 320, None),
+    ("roi_256", TRAY_ROI, 256, None),
+    ("teselas_640", None, 640, 640),
+    ("teselas_480", None, 480, 480),
+]
+TILE_OVERLAP = 96
+WARMUP = 3
+
+
+def evaluar_ajuste(nombre, roi, imgsz, tile_size, frames, backend):
+    detector = TaponesDetector(MODEL_PATH, backend=backend, imgsz=imgsz, roi=roi,
+                               tile_size=tile_size, tile_overlap=TILE_OVERLAP)
+    for image, _, _ in frames[:WARMUP]:
+        detector.analizar_imagen(image)
+
+    evaluador = EvaluadorDetecciones(NUM_CLASSES)
+    latencias, detectados = [], []
+    for image, gt_boxes, gt_cls in frames:
+        t0 = time.perf_counter()
+        _, detections = detector.analizar_imagen(image)
+        latencias.append(time.perf_counter() - t0)
+
+        boxes = np.array([d["bounding_box"] for d in detections], dtype=float).reshape(-1, 4)
+        conf = np.array([d["confidence"] for d in detections], dtype=float)
+        cls = np.array([d["class"] for d in detections], dtype=int)
+        evaluador.agregar(boxes, conf, cls, gt_boxes, gt_cls)
+        detectados.append(len(detections))
+
+    metricas = evaluador.resultados()
+    # Tapones reales sin detección de ninguna clase (fila de la matriz de confusión -> fondo)
+    perdidos = int(evaluador.confusion[:NUM_CLASSES, NUM_CLASSES].sum())
+    return {"nombre": nombre, "roi": roi, "imgsz": imgsz, "tile_size": tile_size, "recall": metricas["recall"],
+            "precision": metricas["precision"], "perdidos": perdidos,
+            "detecciones": int(np.sum(detectados)), **percentiles_latencia(latencias)}
+
+
+if __name__ == "__main__":
+    backend = sys.argv[1] if len(sys.argv) > 1 else BACKEND
+    patron = sys.argv[2] if len(sys.argv) > 2 else IMAGES_GLOB
+
+    frames = []
+    for fname in sorted(glob.glob(patron)):
+        image = cv2.imread(fname)
+        if image is None:
+            continue
+        frames.append((image, *cargar_etiquetas_yolo(fname, image.shape)))
+    if not frames:
+        print(f"ERROR: No hay imágenes en '{patron}'.")
+        sys.exit(2)
+    n_gt = sum(len(gt_cls) for _, _, gt_cls in frames)
+    print(f"INFO: {len(frames)} frames, {n_gt} tapones etiquetados, motor '{backend}'.")
+
+    filas = [evaluar_ajuste(nombre, roi, imgsz, tile_size, frames, backend)
+             for nombre, roi, imgsz, tile_size in SETTINGS]
+    ref = filas[0]
+
+    print(f"{'ajuste':<14}{'imgsz':>6}{'recall':>8}{'prec.':>8}{'perdidos':>10}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'speedup':>9}")
+    for f in filas:
+        print(f"{f['nombre']:<14}{f['imgsz']:>6}{f['recall']:>8.3f}{f['precision']:>8.3f}"
+              f"{f['perdidos'] - ref['perdidos']:>+10d}{f['p50']:>9.1f}{f['p90']:>9.1f}{f['p99']:>9.1f}"
+              f"{ref['p50'] / f['p50']:>8.2f}x")
+
+    sin_perdidas = [f for f in filas if f["perdidos"] <= ref["perdidos"]]
+    mejor = min(sin_perdidas, key=lambda f: f["p50"])
+    print(f"--- Ajuste más rápido sin perder tapones: {mejor['nombre']} "
+          f"(DETECTOR_ROI = {mejor['roi']}, DETECTOR_IMGSZ = {mejor['imgsz']}, "
+          f"DETECTOR_TILE_SIZE = {mejor['tile_size']}) ---")
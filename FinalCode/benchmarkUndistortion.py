@@ -0,0 +1,140 @@
+# benchmarkUndistortion.py
+"""
+Compara los dos caminos de desdistorsión del ciclo de main.py:
+  - "imagen": se desdistorsiona el frame completo (cv2.remap) y se detecta sobre él.
+  - "puntos": se detecta sobre el frame crudo y solo se desdistorsionan las coordenadas
+    detectadas (cv2.undistortPoints), como con UNDISTORT_DETECTIONS_ONLY = True.
+
+Precisión: las esquinas del tablero de CameraCalibration/calib_images hacen de "detecciones"
+con posición conocida; se comparan en píxeles y en metros a través de RobotController.pixel_to_robot.
+Latencia: coste por ciclo de cada camino. Si el modelo YOLO y capturas reales están disponibles
+(CAP_IMAGES_GLOB), también se mide el ciclo completo con TaponesDetector.
+"""
+import os
+import glob
+import json
+import time
+import cv2
+import numpy as np
+
+from undistorter import Undistorter
+from robotControl import RobotController
+
+INTRINSIC_PATH = "intrinsic_calibration_data.json"
+EXTRINSIC_PATH = "calibracion_ur3.json"
+CALIB_IMAGES_GLOB = os.path.join("..", "CameraCalibration", "calib_images", "calib_img_*.png")
+CHECKERBOARD = (10, 7)
+CAP_IMAGES_GLOB = "captures/*.jpg"     # Capturas reales de la bandeja (opcional)
+MODEL_PATH = "train3/weights/best.pt"  # Opcional
+REPEATS = 20
+criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+
+def detectar_esquinas(imagen):
+    gray = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
+    ret, corners = cv2.findChessboardCorners(gray, CHECKERBOARD, None)
+    if not ret:
+        return None
+    return cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria).reshape(-1, 2)
+
+
+def tiempo_medio_ms(func, repeats=REPEATS):
+    func() # Calentamiento (mapas, cachés)
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - t0) / repeats * 1000.0
+
+
+def imprimir_estadisticas(nombre, valores, unidad):
+    valores = np.asarray(valores)
+    print(f"{nombre}: media={np.mean(valores):.4f} {unidad}, "
+          f"p95={np.percentile(valores, 95):.4f} {unidad}, max={np.max(valores):.4f} {unidad}")
+
+
+def benchmark_tablero(undistorter, robot):
+    errores_px, errores_m = [], []
+    lat_imagen, lat_puntos = [], []
+
+    for fname in sorted(glob.glob(CALIB_IMAGES_GLOB)):
+        img = cv2.imread(fname)
+        h, w = img.shape[:2]
+
+        # Camino "imagen": remap del frame completo y detección sobre la imagen corregida
+        esquinas_ref = detectar_esquinas(undistorter.undistort(img))
+        # Camino "puntos": detección sobre el frame crudo y corrección de las coordenadas
+        esquinas_crudas = detectar_esquinas(img)
+        if esquinas_ref is None or esquinas_crudas is None:
+            print(f"[!] Tablero no detectado en {fname}")
+            continue
+        esquinas_corr = undistorter.undistort_points(esquinas_crudas, (w, h))
+
+        errores_px.extend(np.linalg.norm(esquinas_corr - esquinas_ref, axis=1))
+        for (u_ref, v_ref), (u, v) in zip(esquinas_ref, esquinas_corr):
+            x_ref, y_ref, _ = robot.pixel_to_robot(u_ref, v_ref)
+            x, y, _ = robot.pixel_to_robot(u, v)
+            errores_m.append(np.hypot(x - x_ref, y - y_ref))
+
+        lat_imagen.append(tiempo_medio_ms(lambda: undistorter.undistort(img)))
+        lat_puntos.append(tiempo_medio_ms(lambda: undistorter.undistort_points(esquinas_crudas, (w, h))))
+
+    if not errores_px:
+        print("No se pudo evaluar ninguna imagen de calibración.")
+        return
+
+    print(f"--- Tablero ({len(lat_imagen)} imágenes, {CHECKERBOARD[0] * CHECKERBOARD[1]} puntos/imagen) ---")
+    imprimir_estadisticas("Diferencia puntos vs imagen", errores_px, "px")
+    imprimir_estadisticas("Diferencia en posición de picking", np.asarray(errores_m) * 1000.0, "mm")
+    imprimir_estadisticas("Latencia desdistorsión imagen", lat_imagen, "ms")
+    imprimir_estadisticas("Latencia desdistorsión puntos", lat_puntos, "ms")
+
+
+def benchmark_ciclo_yolo(undistorter, robot):
+    imagenes = sorted(glob.glob(CAP_IMAGES_GLOB))
+    if not imagenes or not os.path.exists(MODEL_PATH):
+        print(f"--- Ciclo YOLO omitido (sin capturas en '{CAP_IMAGES_GLOB}' o sin modelo '{MODEL_PATH}') ---")
+        return
+    from capDetection import TaponesDetector
+    detector = TaponesDetector(MODEL_PATH)
+
+    lat_imagen, lat_puntos, errores_m = [], [], []
+    for fname in imagenes:
+        img = cv2.imread(fname)
+        h, w = img.shape[:2]
+
+        t0 = time.perf_counter()
+        _, det_ref = detector.analizar_imagen(undistorter.undistort(img))
+        t1 = time.perf_counter()
+        _, det_crudas = detector.analizar_imagen(img)
+        det_corr = undistorter.undistort_detections(det_crudas, (w, h))
+        t2 = time.perf_counter()
+        lat_imagen.append((t1 - t0) * 1000.0)
+        lat_puntos.append((t2 - t1) * 1000.0)
+
+        # Emparejar cada detección de referencia con el centroide corregido más cercano
+        if det_ref and det_corr:
+            corr = np.array([d["centroid"] for d in det_corr], dtype=float)
+            for d in det_ref:
+                u_ref, v_ref = d["centroid"]
+                u, v = corr[np.argmin(np.linalg.norm(corr - [u_ref, v_ref], axis=1))]
+                x_ref, y_ref, _ = robot.pixel_to_robot(u_ref, v_ref)
+                x, y, _ = robot.pixel_to_robot(u, v)
+                errores_m.append(np.hypot(x - x_ref, y - y_ref))
+
+    print(f"--- Ciclo YOLO ({len(imagenes)} capturas) ---")
+    imprimir_estadisticas("Latencia ciclo (imagen)", lat_imagen, "ms")
+    imprimir_estadisticas("Latencia ciclo (puntos)", lat_puntos, "ms")
+    if errores_m:
+        imprimir_estadisticas("Diferencia en posición de picking", np.asarray(errores_m) * 1000.0, "mm")
+
+
+if __name__ == "__main__":
+    undistorter = Undistorter.from_json(INTRINSIC_PATH)
+    calibration = None
+    if os.path.exists(EXTRINSIC_PATH):
+        with open(EXTRINSIC_PATH, "r") as f:
+            calibration = json.load(f)
+    robot = RobotController(robot_ip="", calibration=calibration) # Sin conexión: solo pixel_to_robot
+
+    benchmark_tablero(undistorter, robot)
+    benchmark_ciclo_yolo(undistorter, robot)
@@ -1,17 +1,114 @@
 # cameraControl.py
 import cv2
+import os
+import glob
 import time # Necesario para el delay
+import json
+import threading
+from collections import deque
 
 class Camara:
-    def __init__(self, index=0, warmup_time=1.5): # warmup_time en segundos
+    # Valores de CAP_PROP_AUTO_EXPOSURE con el backend V4L2
+    V4L2_EXPOSURE_MANUAL = 1
+    V4L2_EXPOSURE_AUTO = 3
+    # Controles que se guardan/aplican en un perfil (nombre en el JSON -> propiedad OpenCV)
+    PROFILE_CONTROLS = {
+        "exposure": cv2.CAP_PROP_EXPOSURE,
+        "gain": cv2.CAP_PROP_GAIN,
+        "wb_temperature": cv2.CAP_PROP_WB_TEMPERATURE,
+        "brightness": cv2.CAP_PROP_BRIGHTNESS,
+    }
+
+    # Perfil de captura por defecto: MJPG 640x480 a 30 fps (resolución de la calibración intrínseca)
+    DEFAULT_CAPTURE_PROFILE = {"fourcc": "MJPG", "width": 640, "height": 480, "fps": 30, "roi": None}
+
+    def __init__(self, index=0, warmup_time=1.5, streaming=False, buffer_size=4,
+                 adaptive_warmup=False, profile=None, capture_profile=None): # warmup_time en segundos
         """
         Inicializa la cámara.
         warmup_time: Tiempo (s) para permitir que la cámara ajuste la exposición.
+                     Con adaptive_warmup es el tiempo máximo de espera.
+        streaming: Si es True, la cámara se mantiene abierta y un hilo en segundo plano
+                   lee frames continuamente (ver iniciar_streaming()).
+        buffer_size: Número de frames recientes que se guardan en el buffer circular.
+        adaptive_warmup: Si es True, abrir() termina en cuanto el brillo medio y la nitidez
+                         (varianza del Laplaciano) de los frames se estabilizan.
+        profile: Perfil de controles (dict o ruta a JSON, ver guardar_perfil()). Si se indica,
+                 se aplica al abrir con exposición y balance de blancos manuales y no hay calentamiento.
+        capture_profile: Formato negociado al abrir ({"fourcc", "width", "height", "fps", "roi"}).
+                         Las claves omitidas toman DEFAULT_CAPTURE_PROFILE. "roi" = [x, y, w, h]
+                         recorta cada frame a la zona de trabajo (bandeja) nada más capturarlo;
+                         el desplazamiento queda en roi_offset para volver a píxeles del frame completo.
         """
         self.index = index
         self.cap = None
         self.warmup_time = warmup_time
 
+        # Modo streaming: hilo capturador + buffer circular de (timestamp, frame)
+        self.streaming = streaming
+        self._frames = deque(maxlen=max(1, buffer_size))
+        self._frame_cond = threading.Condition()
+        self._grabber = None
+        self._stop_event = threading.Event()
+        self.reopen_delay = 0.5 # Espera (s) antes de reabrir el dispositivo tras un error
+
+        # Calentamiento adaptativo: convergencia de brillo y nitidez
+        self.adaptive_warmup = adaptive_warmup
+        self.brightness_tol = 1.5     # Variación máxima del brillo medio (niveles de gris) entre frames
+        self.sharpness_tol = 0.05     # Variación relativa máxima de la nitidez entre frames
+        self.stable_frames = 3        # Frames consecutivos estables para dar por convergida la imagen
+
+        # Perfil de controles V4L2 bloqueado (exposición, ganancia, balance de blancos)
+        self.profile = self.cargar_perfil(profile) if isinstance(profile, str) else profile
+
+        # Perfil de captura (formato, resolución, fps y ROI de la zona de trabajo)
+        self.capture_profile = {**self.DEFAULT_CAPTURE_PROFILE, **(capture_profile or {})}
+        self.frame_size = None # Frame completo (w, h) antes del recorte
+        self._roi = None # (x, y, w, h) ajustado al frame real
+        self._ajustar_tamano((self.capture_profile["width"], self.capture_profile["height"]))
+
+    @property
+    def roi_offset(self):
+        """Desplazamiento (x, y) del ROI respecto al frame completo ((0, 0) sin ROI)."""
+        return (self._roi[0], self._roi[1]) if self._roi else (0, 0)
+
+    def _negociar_formato(self):
+        """Fija FOURCC, resolución y fps en el dispositivo y lee los valores que realmente acepta."""
+        perfil = self.capture_profile
+        if perfil.get("fourcc"):
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*perfil["fourcc"]))
+        if perfil.get("width") and perfil.get("height"):
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, perfil["width"])
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, perfil["height"])
+        if perfil.get("fps"):
+            self.cap.set(cv2.CAP_PROP_FPS, perfil["fps"])
+
+        w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or perfil.get("width")
+        h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or perfil.get("height")
+        if (w, h) != (perfil.get("width"), perfil.get("height")):
+            print(f"WARN: La cámara {self.index} trabaja a {w}x{h} en lugar de {perfil.get('width')}x{perfil.get('height')}.")
+        self._ajustar_tamano((w, h))
+
+    def _ajustar_tamano(self, size):
+        """Actualiza frame_size y recalcula el ROI recortado a los límites del frame."""
+        self.frame_size = size
+        roi = self.capture_profile.get("roi")
+        if not roi:
+            self._roi = None
+            return
+        x, y, rw, rh = (int(v) for v in roi)
+        x, y = max(0, min(x, size[0] - 1)), max(0, min(y, size[1] - 1))
+        self._roi = (x, y, min(rw, size[0] - x), min(rh, size[1] - y))
+
+    def _recortar(self, frame):
+        """Recorta el frame al ROI de trabajo (vista sin copia) antes de cualquier procesado."""
+        if frame.shape[1::-1] != tuple(self.frame_size):
+            self._ajustar_tamano(frame.shape[1::-1])
+        if self._roi is None:
+            return frame
+        x, y, w, h = self._roi
+        return frame[y:y + h, x:x + w]
+
     def abrir(self):
         """Abre el dispositivo de vídeo y espera para el ajuste."""
         # Usando el índice 2 y CAP_V4L2 como en tu archivo
@@ -22,24 +119,216 @@ class Camara:
             self.cap = cv2.VideoCapture(self.index) # Prueba con el índice original y API por defecto
             if not self.cap.isOpened():
                 raise RuntimeError(f"No se pudo abrir la cámara con índice {self.index} (intentado con V4L2 y API por defecto)")
+        self._negociar_formato()
 
-        if self.warmup_time > 0:
+        if self.profile:
+            self.aplicar_perfil(self.profile)
+            print(f"INFO: Cámara {self.index} abierta con perfil de controles bloqueado (sin calentamiento).")
+        elif self.adaptive_warmup and self.warmup_time > 0:
+            t0 = time.monotonic()
+            convergida = self._esperar_convergencia(self.warmup_time)
+            estado = "convergida" if convergida else "sin converger (tiempo máximo)"
+            print(f"INFO: Cámara {self.index} abierta. Exposición {estado} en {time.monotonic() - t0:.2f}s.")
+        elif self.warmup_time > 0:
             print(f"INFO: Cámara {self.index} abierta. Esperando {self.warmup_time}s para ajuste de exposición...")
             time.sleep(self.warmup_time)
         else:
             print(f"INFO: Cámara {self.index} abierta.")
 
+    @staticmethod
+    def estadisticas_frame(frame):
+        """Devuelve (brillo medio, nitidez) de un frame; la nitidez es la varianza del Laplaciano."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        gray = cv2.resize(gray, (gray.shape[1] // 4, gray.shape[0] // 4), interpolation=cv2.INTER_AREA)
+        return float(gray.mean()), float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    def _esperar_convergencia(self, max_time):
+        """Lee frames hasta que brillo y nitidez se estabilizan o se agota max_time. Devuelve si convergió."""
+        deadline = time.monotonic() + max_time
+        previas = None
+        estables = 0
+        while time.monotonic() < deadline:
+            ret, frame = self.cap.read()
+            if not ret:
+                continue
+            brillo, nitidez = self.estadisticas_frame(frame)
+            if previas is not None:
+                d_brillo = abs(brillo - previas[0])
+                d_nitidez = abs(nitidez - previas[1]) / max(previas[1], 1e-6)
+                if d_brillo <= self.brightness_tol and d_nitidez <= self.sharpness_tol:
+                    estables += 1
+                    if estables >= self.stable_frames:
+                        return True
+                else:
+                    estables = 0
+            previas = (brillo, nitidez)
+        return False
+
+    # --- Perfil de controles V4L2 ---
+
+    def leer_controles(self):
+        """Lee del dispositivo abierto los valores actuales de los controles del perfil."""
+        if self.cap is None:
+            raise RuntimeError("La cámara no está abierta.")
+        return {name: self.cap.get(prop) for name, prop in self.PROFILE_CONTROLS.items()}
+
+    def aplicar_perfil(self, profile):
+        """Pone exposición y balance de blancos en manual y aplica los valores del perfil."""
+        self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, self.V4L2_EXPOSURE_MANUAL)
+        self.cap.set(cv2.CAP_PROP_AUTO_WB, 0)
+        for name, prop in self.PROFILE_CONTROLS.items():
+            if profile.get(name) is not None and not self.cap.set(prop, profile[name]):
+                print(f"WARN: La cámara {self.index} no acepta el control '{name}'={profile[name]}.")
+
+    def bloquear_controles(self):
+        """
+        Congela los valores que ha alcanzado el ajuste automático (exposición, ganancia, balance
+        de blancos) y los fija en manual. Las siguientes aperturas no necesitan calentamiento.
+        Devuelve el perfil resultante. Llamar antes de iniciar_streaming(); si el hilo capturador
+        está activo se detiene mientras tanto (VideoCapture no admite get/set durante read()).
+        """
+        en_streaming = self._grabber is not None
+        self.detener_streaming()
+        self.profile = self.leer_controles()
+        self.aplicar_perfil(self.profile)
+        if en_streaming:
+            self.iniciar_streaming()
+        return self.profile
 
-    def cerrar(self): # Sin cambios
-        """Libera el dispositivo de vídeo."""
+    def desbloquear_controles(self):
+        """Vuelve a exposición y balance de blancos automáticos (detiene el streaming mientras tanto)."""
+        self.profile = None
+        en_streaming = self._grabber is not None
+        self.detener_streaming()
+        if self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, self.V4L2_EXPOSURE_AUTO)
+            self.cap.set(cv2.CAP_PROP_AUTO_WB, 1)
+        if en_streaming:
+            self.iniciar_streaming()
+
+    def guardar_perfil(self, ruta_archivo="camera_profile.json"):
+        """Guarda en JSON el perfil de controles bloqueado."""
+        if not self.profile:
+            raise RuntimeError("No hay perfil de controles bloqueado (ver bloquear_controles()).")
+        with open(ruta_archivo, "w") as f:
+            json.dump(self.profile, f, indent=4)
+
+    @staticmethod
+    def cargar_perfil(ruta_archivo="camera_profile.json"):
+        """Carga un perfil de controles guardado con guardar_perfil()."""
+        with open(ruta_archivo, "r") as f:
+            return json.load(f)
+
+
+    def cerrar(self):
+        """Detiene el streaming (si está activo) y libera el dispositivo de vídeo."""
+        self.detener_streaming()
+        self._liberar()
+
+    def _liberar(self):
         if self.cap:
             self.cap.release()
             self.cap = None
 
-    def tomar_foto(self, ruta_archivo="fotoActual.jpg"): # Modificada para usar el nuevo abrir()
+    # --- Modo streaming ---
+
+    def iniciar_streaming(self):
+        """
+        Abre la cámara una sola vez (con calentamiento) y lanza el hilo que lee frames
+        continuamente. Así la exposición queda ajustada y el driver no acumula frames viejos.
+        """
+        if self._grabber is not None and self._grabber.is_alive():
+            return
+        if self.cap is None or not self.cap.isOpened():
+            self.abrir()
+        self._stop_event.clear()
+        self._grabber = threading.Thread(target=self._grab_loop, name="CamaraGrabber", daemon=True)
+        self._grabber.start()
+
+    def detener_streaming(self):
+        """Detiene el hilo capturador y vacía el buffer (no libera el dispositivo)."""
+        if self._grabber is None:
+            return
+        self._stop_event.set()
+        self._grabber.join(timeout=2.0)
+        self._grabber = None
+        with self._frame_cond:
+            self._frames.clear()
+
+    def _grab_loop(self):
+        """Bucle del hilo capturador. Solo reabre el dispositivo si la lectura falla."""
+        while not self._stop_event.is_set():
+            ret, frame = (False, None)
+            try:
+                if self.cap is not None:
+                    ret, frame = self.cap.read()
+            except cv2.error as e:
+                print(f"ERROR: Excepción leyendo de la cámara {self.index}: {e}")
+
+            if ret:
+                frame = self._recortar(frame)
+                with self._frame_cond:
+                    self._frames.append((time.monotonic(), frame))
+                    self._frame_cond.notify_all()
+                continue
+            if self._fuente_agotada():
+                print(f"INFO: Fuente de la cámara {self.index} agotada. Hilo de captura detenido.")
+                break
+
+            print(f"WARN: Fallo de lectura en la cámara {self.index}. Reabriendo dispositivo...")
+            self._liberar()
+            if self._stop_event.wait(self.reopen_delay):
+                break
+            try:
+                self.abrir()
+            except RuntimeError as e:
+                print(f"ERROR: {e}")
+
+    def _fuente_agotada(self):
+        """Un dispositivo físico nunca se agota; las fuentes de replay sí (ver CamaraReplay)."""
+        return False
+
+    def get_latest_frame(self, timeout=2.0, newer_than=None):
+        """
+        Devuelve el frame más reciente del buffer (o None si no llega ninguno a tiempo).
+
+        Args:
+            timeout: Tiempo máximo (s) de espera por un frame válido.
+            newer_than: Marca de tiempo (time.monotonic()) a partir de la cual el frame
+                        se considera fresco. Útil para descartar frames tomados mientras
+                        el robot aún se estaba moviendo.
         """
-        Abre la cámara (con calentamiento), captura un frame y lo guarda.
+        if self._grabber is None:
+            self.iniciar_streaming()
+
+        deadline = time.monotonic() + timeout
+        with self._frame_cond:
+            while True:
+                if self._frames:
+                    stamp, frame = self._frames[-1]
+                    if newer_than is None or stamp > newer_than:
+                        return frame.copy()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._frame_cond.wait(remaining)
+
+    def capturar_frame(self):
         """
+        Captura un frame y lo devuelve en memoria (array BGR de NumPy), o None si falla.
+        En modo streaming toma el primer frame posterior a la llamada sin reabrir la cámara;
+        en caso contrario abre la cámara (con calentamiento), captura y la cierra.
+        """
+        if self.streaming:
+            try:
+                frame = self.get_latest_frame(newer_than=time.monotonic())
+            except Exception as e:
+                print(f"ERROR: Excepción en capturar_frame: {e}")
+                return None
+            if frame is None:
+                print("ERROR: No se recibió ningún frame del hilo de captura.")
+            return frame
+
         try:
             self.abrir() # abrir() ahora incluye el tiempo de calentamiento
 
@@ -50,21 +339,194 @@ class Camara:
             ret, frame = self.cap.read()
             if not ret:
                 print("ERROR: No se pudo capturar el frame después del calentamiento.")
-                return False
-
-            exito = cv2.imwrite(ruta_archivo, frame)
-            if not exito:
-                print(f"ERROR: No se pudo guardar la foto en {ruta_archivo}.")
-                return False
-
-            print(f"INFO: Foto guardada en {ruta_archivo}")
-            return True
+                return None
+            return self._recortar(frame).copy()
         except Exception as e:
-            print(f"ERROR: Excepción en tomar_foto: {e}")
-            return False
+            print(f"ERROR: Excepción en capturar_frame: {e}")
+            return None
         finally:
             self.cerrar()
 
+    def tomar_foto(self, ruta_archivo="fotoActual.jpg"):
+        """
+        Captura un frame (ver capturar_frame()) y lo guarda en disco.
+        """
+        frame = self.capturar_frame()
+        if frame is None:
+            return False
+
+        exito = cv2.imwrite(ruta_archivo, frame)
+        if not exito:
+            print(f"ERROR: No se pudo guardar la foto en {ruta_archivo}.")
+            return False
+
+        print(f"INFO: Foto guardada en {ruta_archivo}")
+        return True
+
+
+class _ReplayCapture:
+    """
+    Imita la interfaz de cv2.VideoCapture (read/grab/get/set/release/isOpened) sobre
+    una secuencia de imágenes o un vídeo grabado, con ritmo (fps) y bucle configurables.
+    """
+    IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+    def __init__(self, source, fps=None, loop=True):
+        self.fps = fps
+        self.loop = loop
+        self.exhausted = False
+        self._next_due = None
+        self._pos = 0
+        self._video = None
+        self._files = []
+
+        if os.path.isdir(source):
+            self._files = sorted(f for f in glob.glob(os.path.join(source, "*"))
+                                 if f.lower().endswith(self.IMAGE_EXTENSIONS))
+        elif any(c in source for c in "*?["):
+            self._files = sorted(glob.glob(source))
+        elif os.path.isfile(source) and source.lower().endswith(self.IMAGE_EXTENSIONS):
+            self._files = [source]
+        else:
+            self._video = cv2.VideoCapture(source)
+            if not self._video.isOpened():
+                raise RuntimeError(f"No se pudo abrir el vídeo de replay '{source}'")
+        if self._video is None and not self._files:
+            raise RuntimeError(f"No hay imágenes que reproducir en '{source}'")
+        self._last_shape = None
+
+    def isOpened(self):
+        return not self.exhausted
+
+    def _esperar_turno(self):
+        if not self.fps:
+            return
+        now = time.monotonic()
+        if self._next_due is not None and now < self._next_due:
+            time.sleep(self._next_due - now)
+            now = self._next_due
+        self._next_due = now + 1.0 / self.fps
+
+    def _siguiente(self):
+        if self._video is not None:
+            ret, frame = self._video.read()
+            if not ret and self.loop:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self._video.read()
+            return ret, frame
+
+        if self._pos >= len(self._files):
+            if not self.loop:
+                return False, None
+            self._pos = 0
+        frame = cv2.imread(self._files[self._pos])
+        self._pos += 1
+        return frame is not None, frame
+
+    def read(self):
+        if self.exhausted:
+            return False, None
+        self._esperar_turno()
+        ret, frame = self._siguiente()
+        if not ret:
+            self.exhausted = True
+            return False, None
+        self._last_shape = frame.shape
+        return True, frame
+
+    def grab(self):
+        return self.read()[0]
+
+    def get(self, prop):
+        if self._video is not None and prop in (cv2.CAP_PROP_FRAME_COUNT, cv2.CAP_PROP_POS_FRAMES):
+            return self._video.get(prop)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self._files))
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._pos)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps or 0.0)
+        if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) and self._last_shape is not None:
+            return float(self._last_shape[1] if prop == cv2.CAP_PROP_FRAME_WIDTH else self._last_shape[0])
+        return 0.0
+
+    def set(self, prop, value):
+        return False # Los controles del sensor no aplican a una grabación
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+        self.exhausted = True
+
+
+class CamaraReplay(Camara):
+    """
+    Sustituto de Camara que reproduce un directorio de imágenes (p. ej.
+    CameraCalibration/calib_images o capturas archivadas), un patrón glob o un vídeo.
+    Mantiene la misma interfaz (tomar_foto, capturar_frame, get_latest_frame, streaming),
+    así que el ciclo de main.py puede ejecutarse y perfilarse sin hardware.
+    """
+
+    def __init__(self, source, fps=None, loop=True, streaming=False, buffer_size=4, warmup_time=0.0,
+                 capture_profile=None):
+        """
+        source: Directorio, patrón glob, imagen o vídeo a reproducir.
+        fps: Ritmo de entrega de frames. None = un frame de la secuencia por petición
+             (get_latest_frame / capturar_frame), sin hilo capturador: cada ciclo recibe el
+             frame siguiente de forma reproducible.
+        loop: Volver al principio al terminar la secuencia.
+        capture_profile: Solo se usa "roi"; el tamaño del frame se toma de la propia grabación.
+        """
+        super().__init__(index=source, warmup_time=warmup_time, streaming=streaming, buffer_size=buffer_size,
+                         capture_profile=capture_profile)
+        self.source = source
+        self.fps = fps
+        self.loop = loop
+        self._replay = None
+        self._lectura_lock = threading.Lock()
+
+    def abrir(self):
+        """Abre la fuente (la posición de reproducción se conserva entre aperturas)."""
+        if self._replay is None:
+            self._replay = _ReplayCapture(self.source, fps=self.fps, loop=self.loop)
+        if self._replay.exhausted:
+            raise RuntimeError(f"La fuente de replay '{self.source}' se ha agotado")
+        self.cap = self._replay
+        if self.warmup_time > 0:
+            time.sleep(self.warmup_time)
+
+    def iniciar_streaming(self):
+        """Con fps lanza el hilo capturador; sin fps solo abre la fuente (un frame por petición)."""
+        if self.fps:
+            super().iniciar_streaming()
+        elif self.cap is None:
+            self.abrir()
+
+    def get_latest_frame(self, timeout=2.0, newer_than=None):
+        """Con fps, el frame más reciente del hilo capturador; sin fps, el siguiente de la secuencia."""
+        if self.fps:
+            return super().get_latest_frame(timeout, newer_than)
+        with self._lectura_lock:
+            if self.cap is None:
+                self.abrir()
+            ret, frame = self.cap.read()
+        return self._recortar(frame).copy() if ret else None
+
+    def _liberar(self):
+        # Solo se suelta la referencia: la fuente sigue en la misma posición
+        self.cap = None
+
+    def _fuente_agotada(self):
+        return self._replay is not None and self._replay.exhausted
+
+    def cerrar_fuente(self):
+        """Cierra definitivamente la fuente de replay."""
+        self.cerrar()
+        if self._replay is not None:
+            self._replay.release()
+            self._replay = None
+
 
 # Ejemplo de uso (sin cambios)
 if __name__ == "__main__":
@@ -73,4 +535,4 @@ if __name__ == "__main__":
     if exito:
         print("¡Captura completada!")
     else:
-        print("La captura falló.")
\ No newline at end of file
+        print("La captura falló.")
@@ -1,34 +1,219 @@
 import cv2
 import json
+import numpy as np
 import matplotlib.pyplot as plt
-from ultralytics import YOLO
+from concurrent.futures import ThreadPoolExecutor
+from inferenceBackends import crear_backend, leer_imagen, nms_por_clase, ResultadoNativo
+from detectionSet import DetectionSet
+
+TILE_BORDER_PX = 2 # Cajas a esta distancia de un borde interior de tesela se consideran cortadas
+
+def desplazar_detecciones(detections, offset):
+    """
+    Devuelve una copia de `detections` con cajas y centroides desplazados `offset` (x, y) píxeles,
+    p. ej. para pasar de coordenadas de un ROI a coordenadas del frame completo.
+    """
+    dx, dy = (int(v) for v in offset)
+    if dx == 0 and dy == 0:
+        return [dict(det) for det in detections]
+    desplazadas = []
+    for det in detections:
+        x1, y1, x2, y2 = det["bounding_box"]
+        cx, cy = det["centroid"]
+        new_det = dict(det)
+        new_det["bounding_box"] = [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+        new_det["centroid"] = [cx + dx, cy + dy]
+        desplazadas.append(new_det)
+    return desplazadas
+
+def generar_teselas(shape, tile_size, overlap):
+    """
+    Rectángulos [x, y, w, h] de teselas de lado tile_size que cubren una imagen de forma `shape`
+    solapándose al menos `overlap` píxeles (la última de cada fila/columna se alinea al borde).
+    """
+    h, w = shape[:2]
+    def inicios(length):
+        if length <= tile_size:
+            return [0]
+        step = max(1, tile_size - overlap)
+        starts = list(range(0, length - tile_size, step))
+        return starts + [length - tile_size]
+    return [[x, y, min(tile_size, w), min(tile_size, h)] for y in inicios(h) for x in inicios(w)]
 
 class TaponesDetector:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-
-    def analizar_imagen(self, image_path):
-        results = self.model(image_path)[0]
-        detections = []
-
-        for box in results.boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            confidence = float(box.conf[0])
-            cls = int(box.cls[0]) if box.cls is not None else -1
-            cx, cy = int((x1 + x2) / 2), int((y1 + y2) / 2)
-            area = (x2 - x1) * (y2 - y1)
-
-            detections.append({
-                "bounding_box": [x1, y1, x2, y2],
-                "centroid": [cx, cy],
-                "area": area,
-                "confidence": round(confidence, 4),
-                "class": cls
-            })
-
-        return results, detections
+    def __init__(self, model_path, backend="ultralytics", imgsz=640, roi=None, servidor=None,
+                 tile_size=None, tile_overlap=96, tile_iou=0.5, tile_workers=2):
+        """
+        backend: 'ultralytics' (PyTorch) o un motor nativo de CPU ('onnxruntime', 'openvino',
+                 'opencv'); ver inferenceBackends.py. Los nativos exportan el .pt una sola vez
+                 y devuelven exactamente el mismo formato de detecciones.
+        imgsz: Tamaño del letterbox de inferencia (640 en el entrenamiento). Valores menores
+               (múltiplos de 32) reducen el coste a cambio de resolución.
+        roi: [x, y, w, h] de la bandeja en la imagen recibida. Solo se infiere sobre ese recorte
+             y las detecciones se devuelven en píxeles de la imagen completa.
+        servidor: ServidorInferencia ya iniciado (inferenceServer.py). Si se indica, el detector es
+                  un cliente ligero: no carga el modelo y envía los frames al proceso servidor.
+        tile_size: Si se indica, inferencia por teselas de ese lado (píxeles de la imagen) para
+                   frames de alta resolución; con imgsz == tile_size se infiere a resolución nativa
+                   y no se pierden los tapones pequeños. tile_overlap (px) debe superar el tamaño
+                   de un tapón: las cajas cortadas por un borde interior se descartan porque la
+                   tesela vecina las ve enteras. Las detecciones se fusionan con NMS por clase (tile_iou).
+        tile_workers: Hilos para los motores nativos concurrentes (onnxruntime, openvino); el resto infiere
+                      las teselas una tras otra y ultralytics todas en un lote.
+        """
+        self.backend = backend
+        self.imgsz = imgsz
+        self.roi = roi
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_iou = tile_iou
+        self.tile_workers = tile_workers
+        self._pool = None
+        self.model = None
+        self.engine = None
+        self.servidor = servidor
+        if servidor is not None:
+            return
+        if backend == "ultralytics":
+            from ultralytics import YOLO # Importación pesada (torch): solo si se usa este motor
+            self.model = YOLO(model_path)
+        else:
+            self.engine = crear_backend(backend, model_path, imgsz=imgsz)
+
+    @property
+    def tamano_variable(self):
+        """True si el motor admite un imgsz distinto en cada llamada (los exportados tienen entrada fija)."""
+        if self.servidor is not None:
+            return self.servidor.tamano_variable
+        return self.engine is None
+
+    @property
+    def nombres_clases(self):
+        if self.servidor is not None:
+            return self.servidor.nombres_clases
+        return self.model.names if self.engine is None else self.engine.names
+
+    def _inferir(self, imagen, imgsz=None):
+        if self.servidor is not None:
+            imagen = leer_imagen(imagen)
+            xyxy, conf, cls = self.servidor.inferir(imagen, imgsz)
+            return ResultadoNativo(imagen, xyxy, conf, cls, self.servidor.nombres_clases)
+        if self.engine is not None:
+            return self.engine.predict(imagen)
+        return self.model(imagen, imgsz=imgsz or self.imgsz)[0]
+
+    def _inferir_teselas(self, imagen, imgsz=None):
+        """Infiere por teselas solapadas y fusiona las cajas en un único resultado de la imagen completa."""
+        imagen = leer_imagen(imagen)
+        rects = generar_teselas(imagen.shape, self.tile_size, self.tile_overlap)
+        if len(rects) == 1:
+            return self._inferir(imagen, imgsz)
+        tiles = [imagen[y:y + h, x:x + w] for x, y, w, h in rects]
+        if self.model is not None:
+            results_list = self.model(tiles, imgsz=imgsz or self.imgsz) # Todas las teselas en un lote
+        elif self.engine is None or not self.engine.concurrente or self.tile_workers <= 1:
+            results_list = [self._inferir(tile, imgsz) for tile in tiles]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.tile_workers, thread_name_prefix="teselas")
+            results_list = list(self._pool.map(lambda tile: self._inferir(tile, imgsz), tiles))
+
+        H, W = imagen.shape[:2]
+        boxes, confs, classes = [], [], []
+        for (x, y, w, h), results in zip(rects, results_list):
+            xyxy, conf, cls = self.arrays_detecciones(results)
+            keep = np.ones(len(xyxy), dtype=bool)
+            if x > 0:
+                keep &= xyxy[:, 0] > TILE_BORDER_PX
+            if y > 0:
+                keep &= xyxy[:, 1] > TILE_BORDER_PX
+            if x + w < W:
+                keep &= xyxy[:, 2] < w - TILE_BORDER_PX
+            if y + h < H:
+                keep &= xyxy[:, 3] < h - TILE_BORDER_PX
+            boxes.append(xyxy[keep] + [x, y, x, y])
+            confs.append(conf[keep])
+            classes.append(cls[keep])
+        xyxy, conf, cls = np.concatenate(boxes), np.concatenate(confs), np.concatenate(classes)
+        keep = nms_por_clase(xyxy, conf, cls, self.tile_iou)
+        return ResultadoNativo(imagen, xyxy[keep], conf[keep], cls[keep], self.nombres_clases)
+
+    def _recortar_roi(self, imagen, roi=None):
+        """Devuelve (imagen recortada al ROI, desplazamiento (x, y)); sin ROI, la imagen tal cual."""
+        roi = roi if roi is not None else self.roi
+        if not roi:
+            return imagen, (0, 0)
+        imagen = leer_imagen(imagen)
+        h, w = imagen.shape[:2]
+        x, y, rw, rh = (int(v) for v in roi)
+        x, y = max(0, min(x, w - 1)), max(0, min(y, h - 1))
+        return imagen[y:min(y + rh, h), x:min(x + rw, w)], (x, y)
+
+    def analizar_imagen(self, imagen, roi=None, imgsz=None):
+        """
+        Ejecuta el modelo sobre `imagen`, que puede ser una ruta de archivo o un
+        frame BGR en memoria (array de NumPy, p. ej. el devuelto por Camara.capturar_frame()).
+        roi / imgsz: Sustituyen para esta llamada al ROI y tamaño configurados (p. ej. para
+                     re-inferir solo una zona, ver sceneCache.py).
+        Devuelve (results, detections), con detections como lista de dicts.
+        """
+        recorte, offset = self._recortar_roi(imagen, roi)
+        results = self._inferir_teselas(recorte, imgsz) if self.tile_size else self._inferir(recorte, imgsz)
+        return results, desplazar_detecciones(self.extraer_detecciones(results), offset)
+
+    def analizar_lote(self, imagenes, batch_size=None):
+        """
+        Analiza una lista de frames (o rutas) con una sola llamada al modelo por lote.
+        batch_size: Tamaño máximo de cada lote (None = todas las imágenes a la vez).
+        Devuelve (lista de results, lista de listas de detecciones), en el orden de entrada.
+        """
+        imagenes = list(imagenes)
+        if not imagenes:
+            return [], []
+        recortes, offsets = zip(*(self._recortar_roi(imagen) for imagen in imagenes))
+        if self.tile_size:
+            # Cada frame ya se divide en un lote de teselas
+            results_list = [self._inferir_teselas(recorte) for recorte in recortes]
+        elif self.model is None:
+            # Los modelos exportados tienen batch fijo de 1 (y el servidor atiende frame a frame)
+            results_list = [self._inferir(recorte) for recorte in recortes]
+        else:
+            step = batch_size or len(recortes)
+            results_list = []
+            for i in range(0, len(recortes), step):
+                results_list.extend(self.model(list(recortes[i:i + step]), imgsz=self.imgsz))
+        return results_list, [desplazar_detecciones(self.extraer_detecciones(results), offset)
+                              for results, offset in zip(results_list, offsets)]
+
+    @staticmethod
+    def arrays_detecciones(results):
+        """
+        Extrae de un resultado de YOLO todas las cajas de una vez como arrays de NumPy:
+        (xyxy int (N, 4), confianzas float (N,), clases int (N,)).
+        """
+        if hasattr(results, "arrays"): # ResultadoNativo (motores de inferencia nativos)
+            return results.arrays()
+        boxes = results.boxes
+        if boxes is None or len(boxes) == 0:
+            return np.empty((0, 4), dtype=int), np.empty(0, dtype=float), np.empty(0, dtype=int)
+        xyxy = boxes.xyxy.cpu().numpy().astype(int) # Trunca como int() en la versión por caja
+        conf = boxes.conf.cpu().numpy().astype(float)
+        cls = boxes.cls.cpu().numpy().astype(int) if boxes.cls is not None else np.full(len(conf), -1)
+        return xyxy, conf, cls
+
+    @classmethod
+    def conjunto_detecciones(cls, results):
+        """Convierte un resultado de YOLO en un DetectionSet (columnas de NumPy, ver detectionSet.py)."""
+        return DetectionSet.from_arrays(*cls.arrays_detecciones(results))
+
+    @classmethod
+    def extraer_detecciones(cls, results):
+        """Convierte un resultado de YOLO en la lista de dicts de detección (cálculo vectorizado)."""
+        return cls.conjunto_detecciones(results).to_dicts()
 
     def guardar_json(self, detections, output_path="detecciones_tapones.json"):
+        if isinstance(detections, DetectionSet):
+            detections = detections.to_dicts()
         with open(output_path, 'w') as f:
             json.dump(detections, f, indent=4)
 
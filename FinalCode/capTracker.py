@@ -0,0 +1,187 @@
+# capTracker.py
+"""
+Modelo persistente de la bandeja: asigna a cada tapón un ID estable entre ciclos emparejando
+las detecciones nuevas con las anteriores (IoU o distancia entre centroides) y conserva su
+historial: votos de clase, confianza suavizada, intentos de recogida fallidos y coordenadas
+del robot ya calculadas.
+
+La clase que se usa para elegir depósito es la más votada (votos ponderados por confianza) a lo
+largo de todas las vistas, no la de la última detección, lo que reduce los depósitos erróneos.
+"""
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+from detectionMetrics import iou_matrix
+
+
+class TrackedCap:
+    """Estado de un tapón seguido entre capturas."""
+
+    def __init__(self, track_id: int, detection: Dict, cycle: int):
+        self.track_id = track_id
+        self.class_votes: Dict[int, float] = {}
+        self.views = 0
+        self.confidence = float(detection["confidence"])
+        self.failed_picks = 0
+        self.robot_xyz: Optional[List[float]] = None
+        self._robot_centroid = None
+        self.first_seen = cycle
+        self.missed = 0
+        self.detection_index: Optional[int] = None
+        self.actualizar(detection, cycle)
+
+    def actualizar(self, detection: Dict, cycle: int, alpha: float = 0.5):
+        self.bounding_box = list(detection["bounding_box"])
+        self.centroid = list(detection["centroid"])
+        self.area = detection["area"]
+        cls = int(detection["class"])
+        self.class_votes[cls] = self.class_votes.get(cls, 0.0) + float(detection["confidence"])
+        if self.views:
+            self.confidence = alpha * float(detection["confidence"]) + (1 - alpha) * self.confidence
+        self.views += 1
+        self.last_seen = cycle
+        self.missed = 0
+
+    @property
+    def cls(self) -> int:
+        """Clase más votada en todas las vistas."""
+        return max(self.class_votes, key=self.class_votes.get)
+
+    @property
+    def class_agreement(self) -> float:
+        """Fracción del voto total que respalda la clase elegida (1.0 = todas las vistas coinciden)."""
+        total = sum(self.class_votes.values())
+        return self.class_votes[self.cls] / total if total > 0 else 0.0
+
+    def to_detection(self) -> Dict:
+        """Dict con el mismo esquema que TaponesDetector (más el estado del seguimiento)."""
+        return {
+            "bounding_box": list(self.bounding_box),
+            "centroid": list(self.centroid),
+            "area": self.area,
+            "confidence": self.confidence,
+            "class": self.cls,
+            "track_id": self.track_id,
+            "views": self.views,
+            "class_agreement": self.class_agreement,
+            "failed_picks": self.failed_picks,
+            "robot_xyz": self.robot_xyz,
+            "detection_index": self.detection_index,
+        }
+
+
+class CapTracker:
+    def __init__(self, iou_threshold: float = 0.3, max_distance: float = 40.0, max_missed: int = 2,
+                 max_failed_picks: int = 3, pixel_to_robot: Optional[Callable] = None, robot_tolerance_px: float = 2.0):
+        """
+        iou_threshold / max_distance: Una detección continúa un track si su IoU supera el umbral
+                                      o su centroide está a menos de max_distance píxeles.
+        max_missed: Ciclos seguidos sin ver un tapón antes de olvidarlo.
+        max_failed_picks: Intentos fallidos a partir de los cuales el tapón deja de ser candidato.
+        pixel_to_robot: Conversión píxel -> [X, Y, Z] (RobotController.pixel_to_robot). Solo se
+                        recalcula si el centroide se mueve más de robot_tolerance_px.
+        """
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.max_failed_picks = max_failed_picks
+        self.pixel_to_robot = pixel_to_robot
+        self.robot_tolerance_px = robot_tolerance_px
+        self.tracks: Dict[int, TrackedCap] = {}
+        self.cycle = 0
+        self._next_id = 1
+
+    def _emparejar(self, tracks: List[TrackedCap], detections: List[Dict]):
+        """Emparejamiento voraz por IoU descendente (y distancia como desempate). Devuelve [(track, índice)]."""
+        if not tracks or not detections:
+            return []
+        t_boxes = np.array([t.bounding_box for t in tracks], dtype=float)
+        d_boxes = np.array([d["bounding_box"] for d in detections], dtype=float)
+        ious = iou_matrix(t_boxes, d_boxes)
+        t_cent = np.array([t.centroid for t in tracks], dtype=float)
+        d_cent = np.array([d["centroid"] for d in detections], dtype=float)
+        dist = np.linalg.norm(t_cent[:, None, :] - d_cent[None, :, :], axis=2)
+
+        validos = np.argwhere((ious >= self.iou_threshold) | (dist <= self.max_distance))
+        orden = sorted(validos.tolist(), key=lambda ij: (-ious[ij[0], ij[1]], dist[ij[0], ij[1]]))
+        usados_t, usados_d, parejas = set(), set(), []
+        for i, j in orden:
+            if i in usados_t or j in usados_d:
+                continue
+            usados_t.add(i)
+            usados_d.add(j)
+            parejas.append((tracks[i], j))
+        return parejas
+
+    def _actualizar_robot(self, track: TrackedCap):
+        if self.pixel_to_robot is None:
+            return
+        if (track._robot_centroid is None or
+                np.hypot(*np.subtract(track.centroid, track._robot_centroid)) > self.robot_tolerance_px):
+            track.robot_xyz = list(self.pixel_to_robot(*track.centroid))
+            track._robot_centroid = list(track.centroid)
+
+    def actualizar(self, detections: List[Dict]) -> List[TrackedCap]:
+        """
+        Incorpora las detecciones de una nueva captura (píxeles del frame completo, ya
+        desdistorsionadas). Devuelve los tracks vistos en esta captura.
+        """
+        self.cycle += 1
+        tracks = list(self.tracks.values())
+        for track in tracks:
+            track.detection_index = None
+        parejas = self._emparejar(tracks, detections)
+        emparejadas = set()
+        for track, j in parejas:
+            track.actualizar(detections[j], self.cycle)
+            track.detection_index = j
+            emparejadas.add(j)
+
+        for j, det in enumerate(detections):
+            if j not in emparejadas:
+                track = TrackedCap(self._next_id, det, self.cycle)
+                track.detection_index = j
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+
+        for track_id, track in list(self.tracks.items()):
+            if track.last_seen != self.cycle:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    del self.tracks[track_id]
+            else:
+                self._actualizar_robot(track)
+        return self.visibles()
+
+    def visibles(self) -> List[TrackedCap]:
+        """Tracks vistos en la última captura."""
+        return [t for t in self.tracks.values() if t.last_seen == self.cycle]
+
+    def get(self, track_id: int) -> Optional[TrackedCap]:
+        return self.tracks.get(track_id)
+
+    def candidatos(self) -> List[Dict]:
+        """
+        Detecciones (dicts) de los tapones visibles que aún se pueden intentar recoger, con la
+        clase suavizada por votos. Es la entrada de CapDecisionMaker.select_best_cap().
+        """
+        return [t.to_detection() for t in self.visibles() if t.failed_picks < self.max_failed_picks]
+
+    def descartados(self) -> List[Dict]:
+        """
+        Detecciones de los tapones visibles descartados por intentos fallidos: siguen en la bandeja
+        y estorban a sus vecinos (obstacles de CapDecisionMaker.plan_picks).
+        """
+        return [t.to_detection() for t in self.visibles() if t.failed_picks >= self.max_failed_picks]
+
+    def marcar_recogido(self, track_id: int):
+        """El tapón ya no está en la bandeja: se olvida su track."""
+        self.tracks.pop(track_id, None)
+
+    def marcar_fallo(self, track_id: int):
+        track = self.tracks.get(track_id)
+        if track is None:
+            return
+        track.failed_picks += 1
+        if track.failed_picks >= self.max_failed_picks:
+            print(f"AVISO: Tapón {track_id} descartado tras {track.failed_picks} intentos fallidos.")
@@ -0,0 +1,88 @@
+# checkBackendParity.py
+"""
+Comprueba que un motor de inferencia nativo (ONNX Runtime / OpenVINO / OpenCV DNN) da las
+mismas detecciones que el camino de referencia con ultralytics/PyTorch.
+
+Para cada imagen se empareja cada detección de referencia con la detección nativa de la misma
+clase y mayor IoU. Se considera paridad si todas se emparejan con IoU >= MIN_IOU y diferencia
+de confianza <= MAX_CONF_DIFF. El script termina con código 1 si alguna imagen falla.
+
+Uso: python3 checkBackendParity.py [backend] [patrón_de_imágenes]
+"""
+import sys
+import glob
+import time
+import numpy as np
+
+from capDetection import TaponesDetector
+
+MODEL_PATH = "train3/weights/best.pt"
+BACKEND = "onnxruntime"
+IMAGES_GLOB = "captures/*.jpg"
+MIN_IOU = 0.9
+MAX_CONF_DIFF = 0.02
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def comparar(referencia, nativas):
+    """Devuelve la lista de discrepancias entre dos listas de detecciones."""
+    errores = []
+    if len(referencia) != len(nativas):
+        errores.append(f"número de detecciones {len(referencia)} (ref) vs {len(nativas)} (nativo)")
+    usadas = set()
+    for det in referencia:
+        candidatas = [(iou(det["bounding_box"], n["bounding_box"]), i) for i, n in enumerate(nativas)
+                      if n["class"] == det["class"] and i not in usadas]
+        if not candidatas:
+            errores.append(f"sin pareja para clase {det['class']} en {det['bounding_box']}")
+            continue
+        mejor_iou, i = max(candidatas)
+        usadas.add(i)
+        diff_conf = abs(det["confidence"] - nativas[i]["confidence"])
+        if mejor_iou < MIN_IOU or diff_conf > MAX_CONF_DIFF:
+            errores.append(f"{det['bounding_box']} vs {nativas[i]['bounding_box']}: "
+                           f"IoU={mejor_iou:.3f}, Δconf={diff_conf:.4f}")
+    return errores
+
+
+if __name__ == "__main__":
+    backend = sys.argv[1] if len(sys.argv) > 1 else BACKEND
+    patron = sys.argv[2] if len(sys.argv) > 2 else IMAGES_GLOB
+    imagenes = sorted(glob.glob(patron))
+    if not imagenes:
+        print(f"ERROR: No hay imágenes en '{patron}'.")
+        sys.exit(2)
+
+    referencia = TaponesDetector(MODEL_PATH, backend="ultralytics")
+    nativo = TaponesDetector(MODEL_PATH, backend=backend)
+
+    fallos = 0
+    t_ref, t_nat = [], []
+    for fname in imagenes:
+        t0 = time.perf_counter()
+        _, det_ref = referencia.analizar_imagen(fname)
+        t1 = time.perf_counter()
+        _, det_nat = nativo.analizar_imagen(fname)
+        t2 = time.perf_counter()
+        t_ref.append(t1 - t0)
+        t_nat.append(t2 - t1)
+
+        errores = comparar(det_ref, det_nat)
+        if errores:
+            fallos += 1
+            print(f"[X] {fname}:")
+            for e in errores:
+                print(f"      {e}")
+        else:
+            print(f"[OK] {fname}: {len(det_ref)} detecciones")
+
+    print(f"--- {backend} vs ultralytics: {len(imagenes) - fallos}/{len(imagenes)} imágenes con paridad ---")
+    print(f"Latencia media: ultralytics {np.mean(t_ref) * 1000:.1f} ms, {backend} {np.mean(t_nat) * 1000:.1f} ms")
+    sys.exit(1 if fallos else 0)
@@ -0,0 +1,96 @@
+# checkPickRoutine.py
+"""
+Comprueba la rutina de recogida en el controlador (pickRoutine.py) contra el controlador
+simulado (fakeController.py), sin robot:
+
+  - el URScript generado está bien anidado y lleva una entrada por posición de la tabla;
+  - cada recogida recorre las fases en orden y deja la ventosa desactivada;
+  - una recogida sin contacto termina en FASE_SIN_CONTACTO sin pasar por el depósito;
+  - detener la rutina vuelve a dejar el script de control de ur_rtde;
+  - la rutina no se puede subir con sendCustomScript (bloquea hasta el timeout);
+  - un movimiento asíncrono no se da por terminado antes de arrancar (MotionHandle.done).
+
+Termina con código 1 si alguna comprobación falla.
+
+Uso: python3 checkPickRoutine.py
+"""
+import sys
+import time
+
+import pickRoutine as rutina
+from fakeController import conectar_falso, comprobar_anidamiento
+from robotControl import RobotController
+
+JOINT_TARGETS = {
+    "aproximacion": [1.3783, -1.7762, 1.3979, -1.1838, -1.5225, -0.5920],
+    "captura":      [1.3783, -1.7762, 1.3979, -1.1838, -1.5225, -0.5920],
+    "Rojo":         [-2.6074, -1.6234, 1.5751, -1.5021, -1.5576, -0.4385],
+    "Azul":         [-1.9798, -1.2401, 1.1354, -1.4571, -1.5457, 0.1901],
+}
+FASES_RECOGIDA = [rutina.FASE_APROXIMACION, rutina.FASE_DESCENSO, rutina.FASE_PRESION, rutina.FASE_SUBIDA,
+                  rutina.FASE_DEPOSITO, rutina.FASE_SOLTAR, rutina.FASE_OK]
+FASES_SIN_CONTACTO = [rutina.FASE_APROXIMACION, rutina.FASE_DESCENSO, rutina.FASE_SUBIDA, rutina.FASE_SIN_CONTACTO]
+
+
+def fases_de(estado, seq):
+    return [f for f, s in estado.fases if s == seq]
+
+
+if __name__ == "__main__":
+    errores = []
+    script = rutina.generar_script(list(JOINT_TARGETS.values()), 0, 0.2413)
+    comprobar_anidamiento(script)
+    if script.count("i == ") != len(JOINT_TARGETS):
+        errores.append("la tabla de posiciones del script no tiene una entrada por posición")
+
+    robot = RobotController(robot_ip=None)
+    # Sin contacto con x < 0.1 m; fases más largas que el periodo de lectura para que el progreso las vea todas
+    estado = conectar_falso(robot, contacto=lambda x, y: x >= 0.1, tiempo_fase=0.03)
+
+    # -1 antes de arrancar no es "terminado": wait() debe cubrir retardo_inicio + duracion_async
+    motion = robot.move_joint_async(JOINT_TARGETS["captura"], 3, 8)
+    if motion.done():
+        errores.append("movimiento asíncrono dado por terminado antes de arrancar")
+    motion.wait()
+    duracion = motion.t_start + estado.retardo_inicio + estado.duracion_async
+    if time.perf_counter() < duracion:
+        errores.append("wait() volvió con el movimiento asíncrono en marcha")
+    robot.upload_pick_routine(JOINT_TARGETS, "aproximacion")
+    if robot.prepick_joints([0.2, -0.2, 0.24], [0, 3.14, 0]) is not None:
+        errores.append("la IK no debe usarse con la rutina cargada")
+
+    robot.scripted_move_joint("captura")
+    fases_vistas = []
+    recogido = robot.scripted_pick(100, 100, "Rojo", progress=fases_vistas.append)
+    seq = robot.pick_routine._seq
+    if not recogido or fases_de(estado, seq) != FASES_RECOGIDA:
+        errores.append(f"recogida con contacto: {recogido}, fases {fases_de(estado, seq)}")
+    if fases_vistas != [rutina.NOMBRES_FASES[f] for f in FASES_RECOGIDA[:-1]]:
+        errores.append(f"progreso no notificado: {fases_vistas}")
+    if estado.digital_out.get(robot.digital_output_pin):
+        errores.append("la ventosa sigue activada tras soltar")
+    if estado.q != [float(robot.pick_routine.nombres["Rojo"])] * 6:
+        errores.append("el tapón no terminó en el depósito pedido")
+
+    # pixel_to_robot(600, 400) cae en x < 0.1 m con la calibración por defecto
+    recogido = robot.scripted_pick(600, 400, "Azul", via_approach=True)
+    seq = robot.pick_routine._seq
+    if recogido or fases_de(estado, seq) != FASES_SIN_CONTACTO:
+        errores.append(f"recogida sin contacto: {recogido}, fases {fases_de(estado, seq)}")
+
+    robot.stop_pick_routine()
+    if estado.script_activo or robot.pick_routine is not None:
+        errores.append("la rutina sigue activa tras detenerla")
+
+    try:
+        robot.con_ctrl.sendCustomScript(script)
+        errores.append("sendCustomScript no debe volver con una rutina que no termina")
+    except RuntimeError:
+        pass
+    robot.con_ctrl.stopScript()
+
+    for error in errores:
+        print(f"ERROR: {error}")
+    if errores:
+        sys.exit(1)
+    print("INFO: Rutina de recogida correcta contra el controlador simulado.")
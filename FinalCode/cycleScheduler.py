@@ -0,0 +1,98 @@
+# cycleScheduler.py
+"""
+Planificador del ciclo de RobotWorker por etapas con recursos en exclusiva.
+
+Recursos: "brazo" (RTDE, solo desde el hilo del worker), "camara" y "cpu" (desdistorsión,
+inferencia, decisión). Cada etapa declara los recursos que posee mientras dura:
+
+    with planificador.etapa("recogida", "brazo"): ...
+    futuro = planificador.lanzar(funcion)      # en un hilo aparte (p. ej. captura + visión)
+
+Dos etapas sin recursos en común pueden ir en paralelo (visión del ciclo N+1 mientras el brazo
+deposita el tapón N); si comparten alguno, la segunda espera. Cada etapa queda registrada
+(inicio, fin, recursos) y `informe` da la ocupación de cada recurso y los solapes entre etapas
+en una ventana de tiempo.
+"""
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+RECURSOS = ("brazo", "camara", "cpu")
+
+
+def _union(intervalos):
+    """Duración de la unión de intervalos [(t0, t1)]."""
+    total, fin = 0.0, None
+    for t0, t1 in sorted(intervalos):
+        if fin is None or t0 > fin:
+            total += t1 - t0
+            fin = t1
+        elif t1 > fin:
+            total += t1 - fin
+            fin = t1
+    return total
+
+
+class PlanificadorCiclo:
+    def __init__(self, max_workers=1):
+        """max_workers: Hilos para las etapas lanzadas en segundo plano (una visión en vuelo basta)."""
+        self._locks = {r: threading.Lock() for r in RECURSOS}
+        self._registro_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="EtapaCiclo")
+        self.registros = [] # (nombre, recursos, t0, t1)
+
+    @contextmanager
+    def etapa(self, nombre, *recursos):
+        """Ejecuta el bloque con los recursos en exclusiva (se adquieren en orden fijo: sin interbloqueos)."""
+        recursos = tuple(sorted(recursos, key=RECURSOS.index))
+        for r in recursos:
+            self._locks[r].acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            for r in reversed(recursos):
+                self._locks[r].release()
+            with self._registro_lock:
+                self.registros.append((nombre, recursos, t0, t1))
+
+    def lanzar(self, funcion, *args):
+        """Ejecuta `funcion` en segundo plano (sus etapas marcan los recursos). Devuelve un Future."""
+        return self._executor.submit(funcion, *args)
+
+    def informe(self, desde=None, hasta=None):
+        """
+        Ocupación por recurso (fracción del tiempo de la ventana) y segundos de solape entre
+        etapas distintas, con los registros recortados a [desde, hasta].
+        """
+        hasta = hasta if hasta is not None else time.perf_counter()
+        with self._registro_lock:
+            registros = [(n, r, max(t0, desde if desde is not None else t0), min(t1, hasta))
+                         for n, r, t0, t1 in self.registros]
+        registros = [reg for reg in registros if reg[3] > reg[2]]
+        if not registros:
+            return {"duracion_s": 0.0, "ocupacion": {}, "solapes_s": {}}
+        inicio = desde if desde is not None else min(reg[2] for reg in registros)
+        duracion = max(hasta - inicio, 1e-9)
+
+        ocupacion = {r: _union([(t0, t1) for _, rs, t0, t1 in registros if r in rs]) / duracion
+                     for r in RECURSOS}
+        solapes = defaultdict(float)
+        for i, (n_a, _, a0, a1) in enumerate(registros):
+            for n_b, _, b0, b1 in registros[i + 1:]:
+                comun = min(a1, b1) - max(a0, b0)
+                if comun > 0 and n_a != n_b:
+                    solapes[" + ".join(sorted((n_a, n_b)))] += comun
+        return {"duracion_s": duracion, "ocupacion": ocupacion, "solapes_s": dict(solapes)}
+
+    @staticmethod
+    def formatear(informe):
+        ocupacion = " ".join(f"{r} {100 * f:.0f}%" for r, f in informe["ocupacion"].items())
+        solapes = ", ".join(f"{k} {v:.2f} s" for k, v in informe["solapes_s"].items()) or "ninguno"
+        return f"{informe['duracion_s']:.2f} s | ocupación: {ocupacion} | solapes: {solapes}"
+
+    def cerrar(self):
+        self._executor.shutdown(wait=True)
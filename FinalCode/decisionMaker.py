@@ -1,16 +1,33 @@
 # decisionMaker.py
 import json
-import cv2
-from typing import List, Tuple, Dict, Optional
+import numpy as np
+from typing import List, Tuple, Dict, Optional, Union
+from detectionSet import DetectionSet
+from spatialIndex import IndiceRejilla, hueco_cajas
+
+GRID_MIN_DETECTIONS = 64 # Con menos detecciones la matriz de todos los pares es más rápida que la rejilla
 
 class CapDecisionMaker:
-    def __init__(self, json_path: str, min_area: float = 1000.0, min_confidence: float = 0.9): # Como en tu archivo
+    def __init__(self, json_path: Optional[str] = None, min_area: float = 1000.0, min_confidence: float = 0.9, # Como en tu archivo
+                 min_clearance_px: float = 30.0, clearance_radius_px: float = 60.0, clearance_weight: float = 0.3):
+        # json_path es opcional: si se pasan las detecciones en memoria a select_best_cap()
+        # no hace falta leer ningún archivo.
+        # min_clearance_px: hueco libre mínimo (píxeles entre cajas) para que un tapón se considere
+        # aislado y pueda entrar en un plan de varias recogidas (plan_picks).
+        # clearance_radius_px / clearance_weight: la puntuación suma clearance_weight * hueco / radio
+        # (saturado en 1): los tapones rodeados de otros fallan más la ventosa y desordenan la bandeja.
         self.json_path = json_path
         self.min_area = min_area
         self.min_confidence = min_confidence
+        self.min_clearance_px = min_clearance_px
+        self.clearance_radius_px = max(clearance_radius_px, min_clearance_px)
+        self.clearance_weight = clearance_weight
         # self.detections = self.load_detections() # Cargar bajo demanda
 
     def load_detections(self) -> List[Dict]: # Como en tu archivo
+        if self.json_path is None:
+            print("ERROR: No hay detecciones en memoria ni archivo de detecciones configurado.")
+            return []
         try:
             with open(self.json_path, 'r') as f:
                 data = json.load(f)
@@ -37,32 +54,103 @@ class CapDecisionMaker:
             return 0.0
         return 1.0 - abs(width - height) / max(width, height)
 
-    def select_best_cap(self) -> Optional[Dict]: # Como en tu archivo
-        self.detections = self.load_detections() # Carga las detecciones más recientes
-        best_score = -1.0  # Inicializar con un valor que cualquier tapón válido pueda superar
-        best_cap = None
-
-        valid_detections = [det for det in self.detections if self.is_valid(det)]
-        if not valid_detections:
+    def compute_scores(self, detection_set: DetectionSet, clearance: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Puntuación de todas las detecciones a la vez (mismos criterios que is_valid/compute_squareness).
+        clearance: Hueco libre de cada detección (compute_clearance); None no puntúa la holgura.
+        """
+        # Criterio principal: "cuadratura" del bounding box
+        # Tapones más cuadrados suelen ser mejores detecciones frontales.
+        scores = detection_set.squareness()
+        scores += detection_set.confidence * 0.2 # Darle un peso a la confianza
+        scores += (detection_set.areas / 10000) * 0.1 # Darle un peso al área (normalizada)
+        if "failed_picks" in detection_set.extras: # Penalizar intentos fallidos (ver capTracker.py)
+            scores -= detection_set.extras["failed_picks"] * 0.3
+        if clearance is not None: # Graspabilidad: hueco libre alrededor del tapón
+            scores += np.minimum(clearance / self.clearance_radius_px, 1.0) * self.clearance_weight
+        return scores
+
+    def select_top_caps(self, detections: Union[List[Dict], DetectionSet, None] = None, k: Optional[int] = 1,
+                        obstacles: Union[List[Dict], DetectionSet, None] = None) -> List[int]:
+        """
+        Índices de las k detecciones válidas con mejor puntuación, de mejor a peor (k=None: todas).
+        obstacles: Detecciones que siguen en la bandeja pero no se pueden recoger (p. ej. tapones
+                   descartados por el seguimiento): solo cuentan para la holgura.
+        """
+        self.detections = detections if detections is not None else self.load_detections()
+        detection_set = DetectionSet.from_dicts(self.detections)
+        if len(detection_set) == 0:
+            return []
+        # Se calcula sobre todas las detecciones: un vecino no válido también estorba a la ventosa
+        obstacle_boxes = DetectionSet.from_dicts(obstacles).boxes if obstacles else None
+        self.clearance = self.compute_clearance(detection_set, self.clearance_radius_px, obstacle_boxes)
+        self.scores = self.compute_scores(detection_set, self.clearance)
+        valid = detection_set.mascara_validas(self.min_area, self.min_confidence)
+        return detection_set.top_k(self.scores, len(detection_set) if k is None else k, valid).tolist()
+
+    def select_best_cap(self, detections: Union[List[Dict], DetectionSet, None] = None) -> Optional[Dict]:
+        """
+        Devuelve la mejor detección. Si se pasan `detections` (lista de dicts devuelta por
+        TaponesDetector.analizar_imagen, o un DetectionSet) se usan directamente; si no, se leen de json_path.
+        """
+        best = self.select_top_caps(detections, k=1)
+        if not best:
             return None
+        i = best[0]
+        print(self.scores[i])
+        if isinstance(self.detections, DetectionSet):
+            return self.detections[i].to_dicts()[0]
+        return self.detections[i] # El propio dict de entrada (conserva sus claves extra)
 
-        for det in valid_detections:
-            # Criterio principal: "cuadratura" del bounding box
-            # Tapones más cuadrados suelen ser mejores detecciones frontales.
-            score = self.compute_squareness(det['bounding_box'])
-            score += det['confidence'] * 0.2 # Darle un peso a la confianza
-            score += (det['area'] / 10000) * 0.1 # Darle un peso al área (normalizada)
-
-            if score > best_score:
-                best_score = score
-                best_cap = det
 
-        print(best_score)
-        return best_cap
-
-
-    def get_best_cap_info(self) -> Optional[Tuple[Tuple[int, int], Tuple[int, int, int, int], str]]: # Como en tu archivo
-        best = self.select_best_cap()
+    @staticmethod
+    def compute_clearance(detection_set: DetectionSet, radius: float = np.inf,
+                          obstacle_boxes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Hueco libre (píxeles) entre la caja de cada detección y la caja más cercana de las demás
+        (y de obstacle_boxes, cajas (M, 4) que estorban pero no se puntúan).
+        Con `radius` finito los huecos >= radius se devuelven como inf y, en bandejas con muchas
+        detecciones, solo se comparan las vecinas en el índice de rejilla (spatialIndex.py).
+        """
+        n = len(detection_set)
+        boxes = detection_set.boxes
+        if obstacle_boxes is not None and len(obstacle_boxes):
+            boxes = np.concatenate([boxes, np.asarray(obstacle_boxes).reshape(-1, 4)])
+        total = len(boxes)
+        if total < 2:
+            return np.full(n, np.inf)
+        if np.isfinite(radius) and total > GRID_MIN_DETECTIONS:
+            return IndiceRejilla(boxes, radius).holguras()[:n]
+        b = boxes.astype(np.float64)
+        i, j = np.triu_indices(total, k=1)
+        gaps = np.full((total, total), np.inf)
+        gaps[i, j] = gaps[j, i] = hueco_cajas(b[i], b[j])
+        clearance = gaps[:n].min(axis=1)
+        return np.where(clearance < radius, clearance, np.inf)
+
+    def plan_picks(self, detections: Union[List[Dict], DetectionSet, None] = None, max_picks: Optional[int] = None,
+                   obstacles: Union[List[Dict], DetectionSet, None] = None) -> List[Dict]:
+        """
+        Plan de recogidas a partir de una sola imagen: el mejor tapón (como select_best_cap)
+        seguido de los demás tapones válidos que están aislados (hueco >= min_clearance_px con
+        cualquier otra detección, válida o no, y con los obstacles), por puntuación. Recoger un
+        tapón no puede mover a uno aislado, así que el plan se ejecuta sin volver a capturar salvo
+        que falle una recogida.
+        """
+        order = self.select_top_caps(detections, k=None, obstacles=obstacles)
+        if not order:
+            return []
+        aislados = self.clearance >= self.min_clearance_px # Calculado en select_top_caps
+        plan = [order[0]] + [i for i in order[1:] if aislados[i]]
+        if max_picks is not None:
+            plan = plan[:max_picks]
+        print(f"INFO: Plan de recogida: {len(plan)} tapón(es) de {len(order)} válidos.")
+        if isinstance(self.detections, DetectionSet):
+            return self.detections[np.asarray(plan)].to_dicts()
+        return [self.detections[i] for i in plan]
+
+    def get_best_cap_info(self, detections: Optional[List[Dict]] = None) -> Optional[Tuple[Tuple[int, int], Tuple[int, int, int, int], str]]: # Como en tu archivo
+        best = self.select_best_cap(detections)
         if best is None:
             return None
         centroid = tuple(best['centroid'])
@@ -72,39 +160,6 @@ class CapDecisionMaker:
         return centroid, bounding_box, cap_identifier
 
 
-    def draw_selected_on_image(self, base_image: cv2.typing.MatLike, selected_cap_data: Optional[Dict]) -> Optional[cv2.typing.MatLike]:
-        """
-        Dibuja el tapón seleccionado (bounding box y centroide) en una COPIA de la imagen base.
-        Si no hay tapón seleccionado, devuelve la imagen base sin modificar.
-
-        Args:
-            base_image: La imagen original (objeto NumPy de OpenCV) donde dibujar.
-            selected_cap_data: El diccionario de la detección del tapón seleccionado.
-
-        Returns:
-            Una nueva imagen con el tapón seleccionado dibujado, o la imagen original si no hay selección.
-        """
-        if base_image is None:
-            print("ERROR: draw_selected_on_image recibió una imagen base nula.")
-            return None
-
-        image_to_draw_on = base_image.copy() # Siempre trabajar sobre una copia
-
-        if selected_cap_data:
-            try:
-                x1, y1, x2, y2 = selected_cap_data['bounding_box']
-                cx, cy = selected_cap_data['centroid']
-
-                # Dibujar el bounding box del tapón seleccionado (e.g., azul brillante)
-                cv2.rectangle(image_to_draw_on, (x1, y1), (x2, y2), (255, 128, 0), 2) # BGR, grosor 2
-                # Dibujar el centroide (e.g., punto rojo)
-                cv2.circle(image_to_draw_on, (cx, cy), 5, (0, 0, 255), -1) # BGR, círculo relleno
-            except KeyError as e:
-                print(f"ERROR: Faltan datos en selected_cap_data para dibujar: {e}")
-                return image_to_draw_on # Devuelve la copia sin dibujar si faltan datos
-        
-        return image_to_draw_on
-
     # La función resize_to_fit_screen y el ejemplo de uso en __main__ pueden eliminarse o adaptarse,
     # ya que el dimensionamiento principal para la GUI lo hará Qt y el flujo es desde main.py
     # def resize_to_fit_screen(...): #
@@ -0,0 +1,170 @@
+# detectionMetrics.py
+"""
+Métricas de detección en NumPy (sin torch) para comparar variantes del detector de tapones:
+mAP50 / mAP50-95, precisión/recall, matriz de confusión por clase y percentiles de latencia.
+Las etiquetas de referencia usan el formato YOLO de ultralytics (labels/*.txt).
+"""
+import os
+import numpy as np
+
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def cargar_etiquetas_yolo(image_path, image_shape):
+    """
+    Lee las etiquetas YOLO (cls cx cy w h normalizados) de una imagen siguiendo la convención
+    de ultralytics (.../images/x.jpg -> .../labels/x.txt). Devuelve (xyxy (N, 4), cls (N,)) en píxeles.
+    """
+    base = os.path.splitext(image_path)[0]
+    parts = base.split(os.sep)
+    if "images" in parts:
+        parts[len(parts) - 1 - parts[::-1].index("images")] = "labels"
+    label_path = os.sep.join(parts) + ".txt"
+    if not os.path.exists(label_path):
+        return np.empty((0, 4)), np.empty(0, dtype=int)
+
+    data = np.loadtxt(label_path, ndmin=2)
+    if data.size == 0:
+        return np.empty((0, 4)), np.empty(0, dtype=int)
+    h, w = image_shape[:2]
+    cls = data[:, 0].astype(int)
+    cx, cy, bw, bh = data[:, 1] * w, data[:, 2] * h, data[:, 3] * w, data[:, 4] * h
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1), cls
+
+
+def iou_matrix(a, b):
+    """IoU entre todas las cajas xyxy de a (N, 4) y b (M, 4) -> (N, M)."""
+    a, b = np.asarray(a, dtype=float).reshape(-1, 4), np.asarray(b, dtype=float).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def emparejar(pred_boxes, pred_conf, pred_cls, gt_boxes, gt_cls, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Marca como verdadero positivo cada predicción (por confianza descendente) que encuentra una
+    caja real libre de su misma clase con IoU >= umbral. Devuelve tp booleano (N_pred, N_umbrales).
+    """
+    tp = np.zeros((len(pred_boxes), len(iou_thresholds)), dtype=bool)
+    if len(pred_boxes) == 0 or len(gt_boxes) == 0:
+        return tp
+    ious = iou_matrix(pred_boxes, gt_boxes)
+    ious[np.asarray(pred_cls)[:, None] != np.asarray(gt_cls)[None, :]] = 0.0
+    order = np.argsort(-np.asarray(pred_conf), kind="stable")
+    for t, thr in enumerate(iou_thresholds):
+        libres = np.ones(len(gt_boxes), dtype=bool)
+        for i in order:
+            candidatos = np.where(libres & (ious[i] >= thr))[0]
+            if candidatos.size:
+                j = candidatos[np.argmax(ious[i, candidatos])]
+                libres[j] = False
+                tp[i, t] = True
+    return tp
+
+
+def average_precision(recall, precision):
+    """AP con interpolación de 101 puntos (como ultralytics) a partir de las curvas recall/precisión."""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    y = np.interp(x, mrec, mpre)
+    return float(np.sum((y[1:] + y[:-1]) / 2 * np.diff(x))) # Regla del trapecio
+
+
+class EvaluadorDetecciones:
+    """Acumula predicciones y etiquetas imagen a imagen y calcula las métricas al final."""
+
+    def __init__(self, num_classes, conf_threshold=0.25, confusion_iou=0.45):
+        self.num_classes = num_classes
+        self.conf_threshold = conf_threshold
+        self.confusion_iou = confusion_iou
+        self._tp, self._conf, self._cls = [], [], []
+        self._gt_cls = []
+        # Filas = clase real, columnas = clase predicha; el último índice es "fondo"
+        self.confusion = np.zeros((num_classes + 1, num_classes + 1), dtype=int)
+
+    def agregar(self, pred_boxes, pred_conf, pred_cls, gt_boxes, gt_cls):
+        pred_boxes, pred_conf = np.asarray(pred_boxes, dtype=float).reshape(-1, 4), np.asarray(pred_conf, dtype=float)
+        pred_cls, gt_cls = np.asarray(pred_cls, dtype=int), np.asarray(gt_cls, dtype=int)
+        self._tp.append(emparejar(pred_boxes, pred_conf, pred_cls, gt_boxes, gt_cls))
+        self._conf.append(pred_conf)
+        self._cls.append(pred_cls)
+        self._gt_cls.append(gt_cls)
+        self._agregar_confusion(pred_boxes[pred_conf >= self.conf_threshold],
+                                pred_cls[pred_conf >= self.conf_threshold], gt_boxes, gt_cls)
+
+    def _agregar_confusion(self, pred_boxes, pred_cls, gt_boxes, gt_cls):
+        fondo = self.num_classes
+        if len(gt_boxes) == 0:
+            for c in pred_cls:
+                self.confusion[fondo, c] += 1
+            return
+        if len(pred_boxes) == 0:
+            for c in gt_cls:
+                self.confusion[c, fondo] += 1
+            return
+        ious = iou_matrix(gt_boxes, pred_boxes)
+        libres = np.ones(len(pred_boxes), dtype=bool)
+        for g in np.argsort(-ious.max(axis=1)):
+            # Mejor predicción aún sin emparejar (si la mejor ya está usada, se prueba la siguiente)
+            p = int(np.argmax(np.where(libres, ious[g], -1.0)))
+            if libres[p] and ious[g, p] >= self.confusion_iou:
+                libres[p] = False
+                self.confusion[gt_cls[g], pred_cls[p]] += 1
+            else:
+                self.confusion[gt_cls[g], fondo] += 1
+        for p in np.flatnonzero(libres):
+            self.confusion[fondo, pred_cls[p]] += 1
+
+    def resultados(self):
+        """Devuelve dict con precision, recall (a conf_threshold), mAP50, mAP50-95 y AP por clase."""
+        tp = np.concatenate(self._tp) if self._tp else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+        conf = np.concatenate(self._conf) if self._conf else np.empty(0)
+        cls = np.concatenate(self._cls) if self._cls else np.empty(0, dtype=int)
+        gt_cls = np.concatenate(self._gt_cls) if self._gt_cls else np.empty(0, dtype=int)
+
+        ap = np.zeros((self.num_classes, len(IOU_THRESHOLDS)))
+        precisiones, recalls = [], []
+        clases_presentes = []
+        for c in range(self.num_classes):
+            n_gt = int(np.sum(gt_cls == c))
+            sel = cls == c
+            if n_gt == 0:
+                continue
+            clases_presentes.append(c)
+            order = np.argsort(-conf[sel], kind="stable")
+            tp_c = tp[sel][order]
+            tpc = np.cumsum(tp_c, axis=0)
+            fpc = np.cumsum(~tp_c, axis=0)
+            recall = tpc / n_gt
+            precision = tpc / np.maximum(tpc + fpc, 1)
+            for t in range(len(IOU_THRESHOLDS)):
+                ap[c, t] = average_precision(recall[:, t], precision[:, t]) if len(tp_c) else 0.0
+
+            # Precisión y recall en el punto de trabajo (conf_threshold, IoU 0.5)
+            at_thr = conf[sel][order] >= self.conf_threshold
+            n_tp = int(np.sum(tp_c[at_thr, 0]))
+            n_pred = int(np.sum(at_thr))
+            precisiones.append(n_tp / n_pred if n_pred else 0.0)
+            recalls.append(n_tp / n_gt)
+
+        presentes = ap[clases_presentes] if clases_presentes else np.zeros((1, len(IOU_THRESHOLDS)))
+        return {
+            "precision": float(np.mean(precisiones)) if precisiones else 0.0,
+            "recall": float(np.mean(recalls)) if recalls else 0.0,
+            "mAP50": float(np.mean(presentes[:, 0])),
+            "mAP50-95": float(np.mean(presentes)),
+            "ap50_por_clase": {c: float(ap[c, 0]) for c in clases_presentes},
+        }
+
+
+def percentiles_latencia(latencias_s, percentiles=(50, 90, 99)):
+    """Percentiles de latencia en milisegundos a partir de tiempos en segundos."""
+    lat_ms = np.asarray(latencias_s, dtype=float) * 1000.0
+    if lat_ms.size == 0:
+        return {f"p{p}": float("nan") for p in percentiles}
+    return {f"p{p}": float(np.percentile(lat_ms, p)) for p in percentiles}
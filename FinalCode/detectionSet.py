@@ -0,0 +1,129 @@
+# detectionSet.py
+"""
+Conjunto de detecciones en columnas (struct-of-arrays de NumPy) compartido por el detector y
+el decisor. Equivale a la lista de dicts de TaponesDetector.extraer_detecciones
+({"bounding_box", "centroid", "area", "confidence", "class"}), pero el filtrado, la puntuación
+y la selección de los mejores se hacen vectorizados, sin bucles de Python por detección.
+
+Se convierte sin pérdidas a/desde la lista de dicts, JSON (mismo formato que guardar_json) y .npz.
+Las claves extra que faltan en alguna detección vuelven como None en esa detección.
+"""
+import json
+from typing import Dict, List, Optional
+import numpy as np
+
+BASE_KEYS = ("bounding_box", "centroid", "area", "confidence", "class")
+
+
+class DetectionSet:
+    def __init__(self, boxes, confidence, classes, centroids=None, areas=None, extras: Optional[Dict] = None):
+        """
+        boxes: xyxy enteros (N, 4). confidence (N,). classes (N,).
+        centroids / areas: Si no se dan, se calculan como en TaponesDetector.extraer_detecciones.
+        extras: Columnas adicionales {nombre: array (N,)}, p. ej. track_id o failed_picks. Las que no
+                son numéricas en todas las filas (robot_xyz, valores None...) son arrays de objetos.
+        """
+        self.boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float64).reshape(-1)
+        self.classes = np.asarray(classes, dtype=np.int64).reshape(-1)
+        self.centroids = ((self.boxes[:, :2] + self.boxes[:, 2:]) // 2 if centroids is None
+                          else np.asarray(centroids, dtype=np.int64).reshape(-1, 2))
+        self.areas = (np.prod(self.boxes[:, 2:] - self.boxes[:, :2], axis=1) if areas is None
+                      else np.asarray(areas, dtype=np.int64).reshape(-1))
+        self.extras = {k: np.asarray(v) for k, v in (extras or {}).items()}
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __getitem__(self, index):
+        """Subconjunto por máscara booleana o índices (siempre devuelve un DetectionSet)."""
+        index = np.atleast_1d(index) if not isinstance(index, slice) else index
+        return DetectionSet(self.boxes[index], self.confidence[index], self.classes[index],
+                            self.centroids[index], self.areas[index],
+                            {k: v[index] for k, v in self.extras.items()})
+
+    # --- Construcción y conversión ---
+
+    @classmethod
+    def vacio(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_arrays(cls, xyxy, conf, classes):
+        """Desde los arrays de TaponesDetector.arrays_detecciones (confianza redondeada a 4 decimales)."""
+        return cls(xyxy, np.round(np.asarray(conf, dtype=np.float64), 4), classes)
+
+    @classmethod
+    def from_dicts(cls, detections: List[Dict]):
+        if isinstance(detections, DetectionSet):
+            return detections
+        if not detections:
+            return cls.vacio()
+        extras = {}
+        keys = dict.fromkeys(k for d in detections for k in d if k not in BASE_KEYS) # Todas, en orden
+        for key in keys:
+            values = [d.get(key) for d in detections]
+            if all(isinstance(v, (bool, int, float, np.number)) for v in values):
+                extras[key] = np.asarray(values)
+            else:
+                extras[key] = np.empty(len(values), dtype=object) # Sin convertir listas en columnas 2D
+                extras[key][:] = values
+        return cls([d["bounding_box"] for d in detections], [d["confidence"] for d in detections],
+                   [d["class"] for d in detections], [d["centroid"] for d in detections],
+                   [d["area"] for d in detections], extras)
+
+    def to_dicts(self) -> List[Dict]:
+        extras = {k: v.tolist() for k, v in self.extras.items()}
+        detections = []
+        for i, (box, centroid, area, confidence, class_id) in enumerate(zip(
+                self.boxes.tolist(), self.centroids.tolist(), self.areas.tolist(),
+                self.confidence.tolist(), self.classes.tolist())):
+            det = {"bounding_box": box, "centroid": centroid, "area": area,
+                   "confidence": confidence, "class": class_id}
+            for key, values in extras.items():
+                det[key] = values[i]
+            detections.append(det)
+        return detections
+
+    def guardar_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dicts(), f, indent=4)
+
+    @classmethod
+    def cargar_json(cls, path):
+        with open(path, "r") as f:
+            return cls.from_dicts(json.load(f))
+
+    def guardar_npz(self, path):
+        np.savez_compressed(path, boxes=self.boxes, confidence=self.confidence, classes=self.classes,
+                            centroids=self.centroids, areas=self.areas,
+                            **{f"extra_{k}": v for k, v in self.extras.items()})
+
+    @classmethod
+    def cargar_npz(cls, path):
+        with np.load(path, allow_pickle=True) as data: # Los extras no numéricos se guardan como objetos
+            extras = {k[len("extra_"):]: data[k] for k in data.files if k.startswith("extra_")}
+            return cls(data["boxes"], data["confidence"], data["classes"], data["centroids"], data["areas"], extras)
+
+    # --- Operaciones vectorizadas ---
+
+    def mascara_validas(self, min_area, min_confidence):
+        return (self.areas >= min_area) & (self.confidence >= min_confidence)
+
+    def squareness(self):
+        """1 - |ancho - alto| / max(ancho, alto) por caja (0 si alguna dimensión no es positiva)."""
+        wh = (self.boxes[:, 2:] - self.boxes[:, :2]).astype(np.float64)
+        lado = wh.max(axis=1)
+        valida = (wh > 0).all(axis=1)
+        return np.where(valida, 1.0 - np.abs(wh[:, 0] - wh[:, 1]) / np.where(valida, lado, 1.0), 0.0)
+
+    def top_k(self, scores, k, mask=None):
+        """Índices de las k mejores puntuaciones (descendente, estable ante empates) dentro de `mask`."""
+        candidatos = np.flatnonzero(mask) if mask is not None else np.arange(len(scores))
+        if candidatos.size == 0 or k <= 0:
+            return np.empty(0, dtype=int)
+        if k < candidatos.size:
+            # Conservar todos los empatados con el k-ésimo para desempatar por índice, como un bucle
+            kth = np.partition(scores[candidatos], candidatos.size - k)[candidatos.size - k]
+            candidatos = candidatos[scores[candidatos] >= kth]
+        return candidatos[np.lexsort((candidatos, -scores[candidatos]))][:k]
@@ -0,0 +1,244 @@
+# fakeController.py
+"""
+Controlador UR simulado para probar RobotController y la rutina de recogida (pickRoutine.py) sin
+robot. Imita las tres interfaces de ur_rtde (control, receive, IO) sobre un estado compartido:
+
+  - moveJ/moveL llegan al objetivo al instante (velocidades nulas); movePath no se simula.
+    Los asíncronos se notifican como en ur_rtde: getAsyncOperationProgress() vale -1 durante
+    `retardo_inicio`, 0 durante `duracion_async` y -1 de nuevo al terminar.
+  - el envío por la interfaz secundaria (RobotController.script_sender) comprueba que el URScript
+    está bien anidado (def/if/while ... end) y ejecuta en un hilo el mismo protocolo de registros
+    que el script real, con `tiempo_fase` por fase.
+  - sendCustomScript, como en ur_rtde, espera a que el script señale el fin del comando: con un
+    programa que no termina agota `timeout_script` y lanza RuntimeError.
+  - `contacto(x, y)` decide si el descenso encuentra tapón (por defecto, siempre).
+
+Uso: robot = RobotController(robot_ip=None); conectar_falso(robot)
+"""
+import re
+import threading
+import time
+
+import pickRoutine as rutina
+
+
+class EstadoFalso:
+    def __init__(self, contacto=None, tiempo_fase=0.005, timeout_script=0.5, retardo_inicio=0.02,
+                 duracion_async=0.05):
+        self.q = [0.0] * 6
+        self.tcp = [0.2, -0.2, 0.2413, 0.0, 3.1416, 0.0]
+        self.in_int = {}
+        self.in_double = {}
+        self.out_int = {}
+        self.digital_out = {}
+        self.contacto = contacto or (lambda x, y: True)
+        self.tiempo_fase = tiempo_fase
+        self.timeout_script = timeout_script
+        self.retardo_inicio = retardo_inicio
+        self.duracion_async = duracion_async
+        self.t_async = None # Instante del último movimiento asíncrono
+        self.fases = [] # Historial (fase, seq) para las comprobaciones
+        self.script_activo = False
+        self.hilo = None
+
+
+def comprobar_anidamiento(script):
+    """Error si los bloques de URScript no cierran: cada def/if/while abre, cada end cierra."""
+    profundidad = 0
+    for n, linea in enumerate(script.splitlines(), 1):
+        palabra = linea.strip().split(" ")[0].rstrip(":")
+        if palabra in ("def", "if", "while"):
+            profundidad += 1
+        elif palabra == "end":
+            profundidad -= 1
+        if profundidad < 0:
+            raise ValueError(f"URScript: 'end' sin bloque en la línea {n}")
+    if profundidad != 0:
+        raise ValueError(f"URScript: {profundidad} bloque(s) sin cerrar")
+
+
+class FakeControl:
+    def __init__(self, estado):
+        self.estado = estado
+
+    def isConnected(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def stopScript(self):
+        self.estado.script_activo = False
+        if self.estado.hilo is not None:
+            self.estado.hilo.join(1.0)
+
+    def _lanzar(self, asynchronous):
+        if asynchronous:
+            self.estado.t_async = time.perf_counter()
+
+    def moveJ(self, q, speed=1.05, accel=1.4, asynchronous=False):
+        self.estado.q = list(q)
+        self._lanzar(asynchronous)
+        return True
+
+    def moveL(self, pose, speed=0.25, accel=1.2, asynchronous=False):
+        self.estado.tcp = list(pose)
+        self._lanzar(asynchronous)
+        return True
+
+    def movePath(self, path, asynchronous=False):
+        self._lanzar(asynchronous) # Los rtde_control.Path no se pueden inspeccionar: no se simula el recorrido
+        return True
+
+    def getAsyncOperationProgress(self):
+        e = self.estado
+        if e.t_async is None:
+            return -1
+        t = time.perf_counter() - e.t_async
+        return 0 if e.retardo_inicio <= t < e.retardo_inicio + e.duracion_async else -1
+
+    def stopJ(self, a=2.0, asynchronous=False):
+        self.estado.t_async = None
+        return True
+
+    def stopL(self, a=10.0, asynchronous=False):
+        self.estado.t_async = None
+        return True
+
+    def moveUntilContact(self, xd):
+        return self.estado.contacto(*self.estado.tcp[:2])
+
+    def getForwardKinematics(self, q=None, tcp_offset=None):
+        return list(self.estado.tcp)
+
+    def getInverseKinematics(self, pose, qnear=None):
+        return list(qnear) if qnear else list(self.estado.q)
+
+    def reuploadScript(self):
+        if self.estado.hilo is not None:
+            self.estado.hilo.join(1.0)
+        self.estado.script_activo = False
+        return True
+
+    def sendCustomScript(self, script):
+        """Como ur_rtde: para el script de control, ejecuta el programa y espera a que termine."""
+        self.stopScript()
+        self.enviar_programa(script)
+        if self.estado.hilo is not None:
+            self.estado.hilo.join(self.estado.timeout_script)
+            if self.estado.hilo.is_alive():
+                raise RuntimeError("sendCustomScript: el script no señaló el fin del comando.")
+        return True
+
+    def enviar_programa(self, script):
+        """Interfaz secundaria: arranca el programa y vuelve sin esperar."""
+        comprobar_anidamiento(script)
+        if not script.startswith(f"def {rutina.ROUTINE_NAME}():"):
+            return # El controlador real tampoco avisa: la carga no se confirma
+        n_posiciones = len(re.findall(r"^\s+(?:if|elif) i == \d+:", script, re.M))
+        self.estado.script_activo = True
+        self.estado.hilo = threading.Thread(target=self._rutina, args=(n_posiciones,), daemon=True)
+        self.estado.hilo.start()
+        return True
+
+    def _rutina(self, n_posiciones):
+        """Mismo protocolo de registros que SCRIPT_TEMPLATE (las posiciones son índices simbólicos)."""
+        e = self.estado
+
+        def fase(f):
+            e.out_int[rutina.REG_OUT_FASE] = f
+            e.fases.append((f, ultimo))
+            time.sleep(e.tiempo_fase)
+
+        ultimo = e.in_int.get(rutina.REG_SEQ, 0)
+        e.out_int[rutina.REG_OUT_SEQ] = ultimo
+        e.out_int[rutina.REG_OUT_FASE] = rutina.FASE_LISTA
+        while e.script_activo:
+            seq = e.in_int.get(rutina.REG_SEQ, 0)
+            if seq != ultimo:
+                ultimo = seq
+                cmd, arg = e.in_int.get(rutina.REG_CMD, 0), e.in_int.get(rutina.REG_ARG, 0)
+                if cmd == rutina.CMD_EXIT:
+                    break
+                if not 0 <= arg < n_posiciones: # El script real devolvería tabla(0): mejor fallar aquí
+                    print(f"ERROR: Posición {arg} fuera de la tabla ({n_posiciones}).")
+                    break
+                elif cmd == rutina.CMD_MOVEJ:
+                    fase(rutina.FASE_MOVIMIENTO)
+                    e.q = [float(arg)] * 6
+                    fase(rutina.FASE_OK)
+                elif cmd == rutina.CMD_PICK:
+                    x, y = e.in_double.get(rutina.REG_X, 0.0), e.in_double.get(rutina.REG_Y, 0.0)
+                    fase(rutina.FASE_APROXIMACION)
+                    e.tcp[:3] = [x, y, e.tcp[2]]
+                    fase(rutina.FASE_DESCENSO)
+                    if e.contacto(x, y):
+                        e.digital_out[4] = True
+                        for f in (rutina.FASE_PRESION, rutina.FASE_SUBIDA, rutina.FASE_DEPOSITO, rutina.FASE_SOLTAR):
+                            fase(f)
+                        e.q = [float(arg)] * 6
+                        e.digital_out[4] = False
+                        fase(rutina.FASE_OK)
+                    else:
+                        fase(rutina.FASE_SUBIDA)
+                        fase(rutina.FASE_SIN_CONTACTO)
+                e.out_int[rutina.REG_OUT_SEQ] = ultimo
+            time.sleep(0.002) # sync()
+        e.out_int[rutina.REG_OUT_FASE] = rutina.FASE_LISTA
+
+
+class FakeReceive:
+    def __init__(self, estado):
+        self.estado = estado
+
+    def isConnected(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def getActualQ(self):
+        return list(self.estado.q)
+
+    def getActualQd(self):
+        return [0.0] * 6
+
+    def getActualTCPPose(self):
+        return list(self.estado.tcp)
+
+    def getActualTCPSpeed(self):
+        return [0.0] * 6
+
+    def getOutputIntRegister(self, output_id):
+        return self.estado.out_int.get(output_id, 0)
+
+
+class FakeIO:
+    def __init__(self, estado):
+        self.estado = estado
+
+    def isConnected(self):
+        return True
+
+    def disconnect(self):
+        pass
+
+    def setStandardDigitalOut(self, pin, value):
+        self.estado.digital_out[pin] = value
+        return True
+
+    def setInputIntRegister(self, input_id, value):
+        self.estado.in_int[input_id] = int(value)
+        return True
+
+    def setInputDoubleRegister(self, input_id, value):
+        self.estado.in_double[input_id] = float(value)
+        return True
+
+
+def conectar_falso(robot, contacto=None, tiempo_fase=0.005):
+    """Sustituye las interfaces RTDE y el envío de programas de un RobotController por los simulados. Devuelve el estado."""
+    estado = EstadoFalso(contacto, tiempo_fase)
+    robot.con_ctrl, robot.con_recv, robot.con_io = FakeControl(estado), FakeReceive(estado), FakeIO(estado)
+    robot.script_sender = robot.con_ctrl.enviar_programa
+    return estado
@@ -2,7 +2,7 @@
 import sys
 import os
 from PyQt5.QtWidgets import QApplication, QWidget, QStackedWidget, QLabel, QLineEdit
-from PyQt5.QtGui import QPixmap, QPainter, QFont
+from PyQt5.QtGui import QPixmap, QPainter, QFont, QImage
 from PyQt5.QtCore import Qt
 
 # Constantes (si RESOURCES_PATH no está definido globalmente, definirlo aquí para __main__)
@@ -131,6 +131,13 @@ class MainScreen(QWidget): #
             self.camera_label.setText(f"Imagen no encontrada:\n{os.path.basename(image_path)}")
             print(f"ERROR GUI: Imagen en {image_path} no encontrada para mostrar.")
 
+    def update_camera_image_from_qimage(self, qimage: QImage): # Imagen ya compuesta por OverlayRenderer
+        pixmap = QPixmap.fromImage(qimage) # La QImage ya es una copia (OverlayRenderer.a_qimage)
+        if pixmap.width() > self.camera_label.width() or pixmap.height() > self.camera_label.height():
+            pixmap = pixmap.scaled(self.camera_label.width(), self.camera_label.height(),
+                                   Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.camera_label.setPixmap(pixmap)
+
     def clear_camera_image(self): # Como en tu gui.py
         self.camera_label.clear()
         self.camera_label.setText("Esperando imagen del sistema...") # Texto actualizado
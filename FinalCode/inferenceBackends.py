@@ -0,0 +1,248 @@
+# inferenceBackends.py
+"""
+Motores de inferencia en CPU alternativos a ultralytics/PyTorch para el detector de tapones.
+El modelo .pt se exporta una sola vez (ONNX u OpenVINO IR) y el artefacto queda cacheado
+junto a los pesos. El preprocesado (letterbox) y el postprocesado (NMS) se hacen con
+NumPy/OpenCV, así que no se importa torch en tiempo de ejecución.
+"""
+import os
+import ast
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+import cv2
+import numpy as np
+
+BACKENDS = ("ultralytics", "onnxruntime", "openvino", "opencv")
+
+
+def leer_imagen(imagen):
+    """Devuelve `imagen` si ya es un frame; si es una ruta, la lee (FileNotFoundError si no se puede)."""
+    if not isinstance(imagen, str):
+        return imagen
+    frame = cv2.imread(imagen)
+    if frame is None:
+        raise FileNotFoundError(f"No se pudo leer la imagen '{imagen}'")
+    return frame
+
+
+def letterbox(image, new_shape=640, color=(114, 114, 114)):
+    """
+    Redimensiona conservando la relación de aspecto y rellena hasta new_shape (como ultralytics).
+    Devuelve (imagen, escala, (pad_x, pad_y)).
+    """
+    if isinstance(new_shape, int):
+        new_shape = (new_shape, new_shape)
+    h, w = image.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    pad_x, pad_y = (new_shape[1] - new_w) / 2, (new_shape[0] - new_h) / 2
+
+    if (w, h) != (new_w, new_h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, r, (left, top)
+
+
+def nms_por_clase(boxes, scores, classes, iou_threshold=0.7, max_det=300):
+    """
+    NMS por clase (las cajas de clases distintas no se suprimen entre sí) sobre arrays
+    xyxy (N, 4), scores (N,), classes (N,). Devuelve los índices conservados por score descendente.
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=int)
+    # Desplazar cada clase a una región disjunta permite un único NMS para todas
+    offsets = classes.astype(np.float64)[:, None] * (boxes.max() + 1.0)
+    b = boxes.astype(np.float64) + offsets
+    areas = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(b[i, 0], b[rest, 0])
+        yy1 = np.maximum(b[i, 1], b[rest, 1])
+        xx2 = np.minimum(b[i, 2], b[rest, 2])
+        yy2 = np.minimum(b[i, 3], b[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=int)
+
+
+def postprocesar_yolov8(output, scale, pad, orig_shape, conf_threshold=0.25, iou_threshold=0.7, max_det=300):
+    """
+    Decodifica la salida cruda de YOLOv8 (1, 4 + nc, N): cajas cx, cy, w, h en píxeles del
+    letterbox y una puntuación por clase. Devuelve (xyxy float (M, 4), conf (M,), cls (M,))
+    en píxeles de la imagen original.
+    """
+    pred = np.asarray(output)[0].T # (N, 4 + nc)
+    class_scores = pred[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    conf = class_scores[np.arange(len(cls)), cls]
+    mask = conf > conf_threshold
+    pred, conf, cls = pred[mask], conf[mask], cls[mask]
+
+    cx, cy, w, h = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    keep = nms_por_clase(boxes, conf, cls, iou_threshold, max_det)
+    boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, orig_shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, orig_shape[0])
+    return boxes, conf.astype(float), cls.astype(int)
+
+
+def exportar_modelo(model_path, formato, imgsz=640):
+    """
+    Exporta los pesos .pt a 'onnx' u 'openvino' con ultralytics y devuelve la ruta del artefacto.
+    Si el artefacto ya existe y es más reciente que los pesos, se reutiliza sin exportar.
+    La exportación se hace sobre una copia de los pesos en un directorio temporal: ultralytics
+    siempre escribe <pesos>.onnx / <pesos>_openvino_model y pisaría el artefacto de otro imgsz.
+    """
+    base = os.path.splitext(model_path)[0]
+    if imgsz != 640: # Los modelos exportados tienen tamaño de entrada fijo
+        base += f"_{imgsz}"
+    destino = base + ".onnx" if formato == "onnx" else base + "_openvino_model"
+    if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(model_path):
+        return destino
+
+    print(f"INFO: Exportando {model_path} a {formato} (solo la primera vez)...")
+    from ultralytics import YOLO # Solo hace falta para exportar
+    # Junto a los pesos: el resultado se mueve a destino sin cambiar de sistema de archivos
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(model_path))) as tmp:
+        copia = shutil.copy2(model_path, tmp)
+        exportado = str(YOLO(copia).export(format=formato, imgsz=imgsz))
+        if os.path.isdir(destino): # Exportación OpenVINO anterior (pesos viejos): os.replace no pisa directorios
+            shutil.rmtree(destino)
+        os.replace(exportado, destino)
+    return destino
+
+
+class ResultadoNativo:
+    """
+    Resultado de un motor nativo. Expone los mismos datos que TaponesDetector extrae de un
+    resultado de ultralytics (arrays()) y un plot() equivalente para la GUI.
+    """
+
+    def __init__(self, orig_img, xyxy, conf, cls, names=None):
+        self.orig_img = orig_img
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names or {}
+
+    def arrays(self):
+        return self.xyxy.astype(int), self.conf, self.cls
+
+    def plot(self):
+        image = self.orig_img.copy()
+        for (x1, y1, x2, y2), conf, cls in zip(self.xyxy.astype(int), self.conf, self.cls):
+            color = tuple(int(c) for c in np.random.default_rng(int(cls)).integers(0, 255, 3))
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(image, f"{self.names.get(int(cls), int(cls))} {conf:.2f}", (x1, max(y1 - 5, 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        return image
+
+
+class NativeBackend(ABC):
+    """Base de los motores nativos: letterbox -> inferencia -> NMS. Cada motor implementa _inferir."""
+
+    # True si _inferir admite llamadas simultáneas desde varios hilos (teselas en paralelo)
+    concurrente = False
+
+    def __init__(self, imgsz=640, conf_threshold=0.25, iou_threshold=0.7):
+        self.imgsz = imgsz
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.names = {}
+
+    @abstractmethod
+    def _inferir(self, blob):
+        """Salida cruda del modelo (1, 4 + nc, N) para un blob (1, 3, H, W) float32."""
+
+    def predict(self, image):
+        """Ejecuta el modelo sobre un frame BGR (o ruta) y devuelve un ResultadoNativo."""
+        image = leer_imagen(image)
+        padded, scale, pad = letterbox(image, self.imgsz)
+        blob = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True) # (1, 3, H, W) float32
+        output = self._inferir(blob)
+        xyxy, conf, cls = postprocesar_yolov8(output, scale, pad, image.shape[:2],
+                                              self.conf_threshold, self.iou_threshold)
+        return ResultadoNativo(image, xyxy, conf, cls, self.names)
+
+
+class OnnxRuntimeBackend(NativeBackend):
+    concurrente = True # InferenceSession.run es reentrante
+
+    def __init__(self, onnx_path, **kwargs):
+        super().__init__(**kwargs)
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        self.names = ast.literal_eval(names) if names else {}
+
+    def _inferir(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(NativeBackend):
+    concurrente = True # Una petición de inferencia por hilo (la implícita de compiled() es compartida)
+
+    def __init__(self, model_dir, **kwargs):
+        super().__init__(**kwargs)
+        import openvino as ov
+        xml = next(os.path.join(model_dir, f) for f in os.listdir(model_dir) if f.endswith(".xml"))
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(xml), "CPU")
+        self.output = self.compiled.output(0)
+        self._local = threading.local()
+        metadata = os.path.join(model_dir, "metadata.yaml")
+        if os.path.exists(metadata):
+            import yaml
+            with open(metadata, "r") as f:
+                self.names = yaml.safe_load(f).get("names", {})
+
+    def _inferir(self, blob):
+        request = getattr(self._local, "request", None)
+        if request is None:
+            request = self._local.request = self.compiled.create_infer_request()
+        return request.infer({0: blob})[self.output]
+
+
+class OpenCvDnnBackend(NativeBackend):
+    # cv2.dnn.Net guarda la entrada entre setInput y forward: no es concurrente
+
+    def __init__(self, onnx_path, **kwargs):
+        super().__init__(**kwargs)
+        self.net = cv2.dnn.readNetFromONNX(onnx_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def _inferir(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()
+
+
+def crear_backend(backend, model_path, imgsz=640, **kwargs):
+    """
+    Crea el motor nativo `backend` ('onnxruntime', 'openvino' u 'opencv') para los pesos
+    model_path (.pt, que se exporta y cachea, o el artefacto ya exportado).
+    """
+    if backend not in BACKENDS or backend == "ultralytics":
+        raise ValueError(f"Motor de inferencia nativo no soportado: {backend}")
+    if backend == "openvino":
+        path = model_path if os.path.isdir(model_path) else exportar_modelo(model_path, "openvino", imgsz)
+        return OpenVinoBackend(path, imgsz=imgsz, **kwargs)
+
+    path = model_path if model_path.endswith(".onnx") else exportar_modelo(model_path, "onnx", imgsz)
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(path, imgsz=imgsz, **kwargs)
+    return OpenCvDnnBackend(path, imgsz=imgsz, **kwargs)
@@ -0,0 +1,162 @@
+# inferenceServer.py
+"""
+Servidor de inferencia en un proceso aparte para que YOLO no comparta proceso (ni GIL) con la
+GUI de Qt ni con el bucle de 500 Hz de RobotController.descend_with_force.
+
+  - Los frames viajan por un bloque de multiprocessing.shared_memory: el cliente copia el frame
+    en el bloque y solo envía por la cola (id, forma, imgsz). Los arrays no se serializan.
+  - El servidor devuelve las cajas (xyxy, confianza, clase) como listas por otra cola.
+  - El modelo se carga una sola vez y sigue residente entre ejecuciones del ciclo (start/stop en la GUI).
+
+Uso: servidor = ServidorInferencia(MODEL_PATH, backend="ultralytics"); servidor.iniciar()
+     detector = TaponesDetector(MODEL_PATH, servidor=servidor)  # cliente ligero
+"""
+import time
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+MAX_FRAME_BYTES = 1920 * 1080 * 3
+
+
+def _proceso_servidor(model_path, backend, imgsz, shm_name, peticiones, respuestas):
+    """Bucle del proceso servidor: frame de la memoria compartida -> inferencia -> cajas por la cola."""
+    from capDetection import TaponesDetector # Torch/ONNX solo se importan en este proceso
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        detector = TaponesDetector(model_path, backend=backend, imgsz=imgsz)
+    except Exception as e:
+        respuestas.put(("error", None, f"No se pudo cargar el modelo: {e}"))
+        shm.close()
+        return
+    respuestas.put(("listo", None, dict(detector.nombres_clases or {})))
+
+    while True:
+        peticion = peticiones.get()
+        if peticion is None:
+            break
+        req_id, shape, imgsz_req = peticion
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        results = None
+        try:
+            t0 = time.perf_counter()
+            results = detector._inferir(frame, imgsz_req)
+            xyxy, conf, cls = detector.arrays_detecciones(results)
+            respuestas.put(("ok", req_id, (xyxy.tolist(), conf.tolist(), cls.tolist(), time.perf_counter() - t0)))
+        except Exception as e:
+            respuestas.put(("error", req_id, str(e)))
+        finally:
+            del frame, results # Los resultados pueden referenciar el bloque compartido
+    shm.close()
+
+
+class ServidorInferencia:
+    def __init__(self, model_path, backend="ultralytics", imgsz=640, max_frame_bytes=MAX_FRAME_BYTES,
+                 timeout=30.0, startup_timeout=180.0):
+        """
+        max_frame_bytes: Tamaño del bloque compartido (el frame BGR más grande que se enviará).
+        timeout: Espera máxima por respuesta (s). startup_timeout: espera máxima a que cargue el modelo.
+        """
+        self.model_path = model_path
+        self.backend = backend
+        self.imgsz = imgsz
+        self.max_frame_bytes = max_frame_bytes
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.nombres_clases = {}
+        self.ultima_latencia_s = None
+        self._ctx = mp.get_context("spawn") # Sin fork: el proceso padre tiene hilos de Qt y RTDE
+        self._shm = None
+        self._proceso = None
+        self._peticiones = None
+        self._respuestas = None
+        self._listo = False
+        self._req_id = 0
+        self._lock = threading.Lock() # Solo serializa los hilos del proceso cliente
+
+    @property
+    def tamano_variable(self):
+        return self.backend == "ultralytics"
+
+    def iniciar(self):
+        """Crea el bloque compartido y lanza el proceso servidor (la carga del modelo sigue en segundo plano)."""
+        if self._proceso is not None and self._proceso.is_alive():
+            return
+        self._shm = shared_memory.SharedMemory(create=True, size=self.max_frame_bytes)
+        self._peticiones = self._ctx.Queue()
+        self._respuestas = self._ctx.Queue()
+        self._proceso = self._ctx.Process(target=_proceso_servidor, name="ServidorInferencia", daemon=True,
+                                          args=(self.model_path, self.backend, self.imgsz, self._shm.name,
+                                                self._peticiones, self._respuestas))
+        self._proceso.start()
+        self._listo = False
+        print(f"INFO: Servidor de inferencia lanzado (PID {self._proceso.pid}, motor '{self.backend}').")
+
+    def _esperar_listo(self):
+        if self._listo:
+            return
+        try:
+            estado, _, payload = self._respuestas.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            raise RuntimeError("El servidor de inferencia no terminó de cargar el modelo a tiempo.")
+        if estado != "listo":
+            raise RuntimeError(f"Servidor de inferencia: {payload}")
+        self.nombres_clases = payload
+        self._listo = True
+
+    def inferir(self, imagen, imgsz=None):
+        """
+        Envía un frame BGR uint8 al servidor y espera sus cajas.
+        Devuelve (xyxy int (N, 4), conf float (N,), cls int (N,)) en píxeles de `imagen`.
+        """
+        if self._proceso is None:
+            raise RuntimeError("El servidor de inferencia no está iniciado.")
+        imagen = np.ascontiguousarray(imagen, dtype=np.uint8)
+        if imagen.nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame de {imagen.nbytes} bytes mayor que la memoria compartida ({self.max_frame_bytes}).")
+
+        with self._lock: # Un único bloque compartido: una petición en vuelo
+            self._esperar_listo()
+            destino = np.ndarray(imagen.shape, dtype=np.uint8, buffer=self._shm.buf)
+            destino[...] = imagen
+            del destino
+            self._req_id += 1
+            self._peticiones.put((self._req_id, imagen.shape, imgsz))
+
+            limite = time.monotonic() + self.timeout
+            while True:
+                if not self._proceso.is_alive():
+                    raise RuntimeError(f"El servidor de inferencia ha terminado (código {self._proceso.exitcode}).")
+                try:
+                    estado, req_id, payload = self._respuestas.get(timeout=max(0.0, min(1.0, limite - time.monotonic())))
+                except queue.Empty:
+                    if time.monotonic() >= limite:
+                        raise RuntimeError("El servidor de inferencia no responde.")
+                    continue
+                if req_id == self._req_id:
+                    break # Las respuestas de peticiones anteriores que expiraron se descartan
+
+        if estado != "ok":
+            raise RuntimeError(f"Servidor de inferencia: {payload}")
+        xyxy, conf, cls, self.ultima_latencia_s = payload
+        return (np.asarray(xyxy, dtype=int).reshape(-1, 4), np.asarray(conf, dtype=float),
+                np.asarray(cls, dtype=int))
+
+    def detener(self, timeout=5.0):
+        """Para el proceso servidor y libera la memoria compartida."""
+        if self._proceso is not None:
+            if self._proceso.is_alive():
+                self._peticiones.put(None)
+                self._proceso.join(timeout)
+                if self._proceso.is_alive():
+                    print("ADVERTENCIA: El servidor de inferencia no terminó a tiempo, forzando terminación.")
+                    self._proceso.terminate()
+                    self._proceso.join(1.0)
+            self._proceso = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self._listo = False
@@ -8,48 +8,93 @@ import cv2
 import numpy as np
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import QThread, pyqtSignal, QObject
+from PyQt5.QtGui import QImage
 
 # Importar módulos 
-from cameraControl import Camara
+from cameraControl import Camara, CamaraReplay
 from gui import MainApp as GuiMainApp
-from capDetection import TaponesDetector
+from capDetection import TaponesDetector, desplazar_detecciones
 from robotControl import RobotController
+from robotPositions import (REST_POSITION_JOINTS, IMAGE_CAPTURE_POSITION_JOINTS, PICK_APPROACH_JOINTS,
+                            FIXED_CAMERA_PARK_JOINTS, DEPOSIT_POSITIONS)
 from decisionMaker import CapDecisionMaker
+from undistorter import Undistorter
+from sceneCache import CacheEscena
+from capTracker import CapTracker
+from inferenceServer import ServidorInferencia
+from overlayRenderer import OverlayRenderer
+from pickOrdering import OptimizadorOrden, ik_aproximada
+from cycleScheduler import PlanificadorCiclo
 
 # --- CONFIGURACIÓN ---
 ROBOT_IP = "169.254.12.28"             #
 DIGITAL_OUTPUT_PIN = 4                 #
 IMAGE_PATH = "captured_image.jpg"      # Imagen original capturada
 JSON_OUTPUT_PATH = "capDetectionsFile.json" # Nombre de archivo consistente
+# El ciclo trabaja en memoria (frame -> detecciones -> decisión). Si es True, además se
+# vuelcan a disco la imagen, las detecciones y las imágenes de la GUI (para depuración).
+SAVE_DEBUG_FILES = False
+# Si es True, YOLO se ejecuta sobre el frame crudo y solo se desdistorsionan las cajas y
+# centroides detectados (cv2.undistortPoints). Ver benchmarkUndistortion.py.
+UNDISTORT_DETECTIONS_ONLY = False
 MODEL_PATH = "train3/weights/best.pt"  #
+# Motor de inferencia: "ultralytics" (PyTorch), "onnxruntime", "openvino" u "opencv".
+# Los nativos exportan MODEL_PATH una vez y cachean el artefacto junto a los pesos.
+# Para la variante INT8 (quantizeModel.py): MODEL_PATH = "train3/weights/best_int8.onnx" con "onnxruntime".
+INFERENCE_BACKEND = "ultralytics"
+# Modo ROI / resolución reducida del detector (ver benchmarkRoiInference.py). DETECTOR_ROI = [x, y, w, h]
+# de la bandeja en el frame capturado (ya recortado por CAPTURE_PROFILE["roi"]); None = frame entero.
+# DETECTOR_IMGSZ: tamaño del letterbox (múltiplo de 32; 640 = el del entrenamiento).
+DETECTOR_ROI = None
+DETECTOR_IMGSZ = 640
+# Inferencia por teselas para cámaras de alta resolución: lado de la tesela en píxeles (None = desactivada)
+# y solape (> diámetro de un tapón). Con DETECTOR_IMGSZ == DETECTOR_TILE_SIZE se infiere a resolución nativa.
+DETECTOR_TILE_SIZE = None
+DETECTOR_TILE_OVERLAP = 96
+# Si es True, las capturas se comparan con la anterior (sceneCache.py): sin cambios se reutilizan las
+# detecciones y con cambios locales solo se re-infiere sobre las zonas cambiadas.
+SCENE_CACHE = True
+# Si es True, YOLO corre en un proceso aparte (inferenceServer.py) con el modelo residente entre
+# ejecuciones; los frames se le pasan por memoria compartida y el hilo del robot solo espera las cajas.
+INFERENCE_SERVER = False
+# Perfil de controles de la cámara (exposición, ganancia, balance de blancos) bloqueados.
+# Se genera en la primera ejecución; bórralo para volver a ajustar la exposición.
+CAMERA_PROFILE_PATH = "camera_profile.json"
+# Fuente de replay (directorio de imágenes, patrón glob o vídeo) en lugar de la cámara física.
+# Ej.: "../CameraCalibration/calib_images". None usa la cámara real.
+CAMERA_REPLAY_SOURCE = None
+CAMERA_REPLAY_FPS = None               # Ritmo de entrega de frames del replay (None = un frame por captura)
+# Formato negociado con la cámara. "roi" = [x, y, w, h] de la bandeja en el frame completo
+# (ver plano de colocación); None procesa el frame entero. Las coordenadas que llegan al robot
+# siempre se expresan en píxeles del frame completo.
+CAPTURE_PROFILE = {"fourcc": "MJPG", "width": 640, "height": 480, "fps": 30, "roi": None}
+# Recogidas por captura: tras el mejor tapón se recogen los que están aislados (hueco libre de al menos
+# MIN_PICK_CLEARANCE_PX píxeles con cualquier otra detección) sin volver a la posición de captura.
+MAX_PICKS_PER_CAPTURE = 5
+MIN_PICK_CLEARANCE_PX = 30
+# Si es True, los tapones del plan se recogen en el orden que minimiza el tiempo de viaje estimado
+# (tramos depósito -> siguiente tapón, ver pickOrdering.py) en lugar del orden de puntuación.
+PICK_ORDER_OPTIMIZATION = True
+# Radio de blend (m) en los puntos de paso sin precisión (subida tras coger -> depósito, aproximación
+# a la bandeja -> tapón): el robot los recorre sin pararse. 0 = parada completa en cada punto.
+PATH_BLEND_RADIUS = 0.02
+# Si es True, cada recogida (aproximación, contacto, presión, vacío, subida, depósito y soltar) la
+# ejecuta una rutina URScript cargada una vez en el controlador (pickRoutine.py); Python solo envía
+# la XY y el depósito por registros RTDE y sigue el progreso.
+SCRIPTED_PICK = False
+# Cámara cenital fija en lugar de la cámara en la posición de captura del brazo (cycleScheduler.py):
+# el siguiente frame se captura en cuanto el TCP sale del campo de visión camino del depósito y la
+# visión del ciclo N+1 corre mientras se deposita el tapón N. Requiere la calibración píxel->robot
+# de esa cámara (RobotController.calibration).
+FIXED_OVERHEAD_CAMERA = False
+ARM_CLEAR_MARGIN_M = 0.05              # Margen (m) alrededor de la zona vista por la cámara en la mesa
+ARM_CLEAR_TIMEOUT_S = 10.0             # Espera máxima (s) a que el brazo salga de la vista antes de capturar
 RESOURCES_PATH = "resources"           #
 START_IMG_PATH = os.path.join(RESOURCES_PATH, "start.png") #
 MAIN_IMG_PATH = os.path.join(RESOURCES_PATH, "main.png")   #
 
-# Rutas para las imágenes que se mostrarán en la GUI
-ALL_DETECTIONS_DISPLAY_PATH = "gui_all_detections.jpg"
-SELECTED_CAP_DISPLAY_PATH = "gui_selected_cap.jpg"
-
-# Posiciones del Robot (de tu último main.py)
-REST_POSITION_JOINTS = [1.4567713737487793, -1.6137963734068812, 0.03687411943544561,
-                        -1.5324381862631817,  0.12954740226268768, -0.4755452314959925]
-IMAGE_CAPTURE_POSITION_JOINTS = [1.3783482313156128, -1.7762123546996058, 1.3978703657733362,
-                                 -1.1838005644134064, -1.522461239491598, -0.5920336882220667]
-
-DEPOSIT_POSITIONS = {
-    "Amarillo": [-2.2998903433429163, -1.047537164097168, 0.8475335280047815, 
-                 -1.355234370832779, -1.549577538167135, -0.12971574464906865],
-    "Azul":     [-1.97978383699526, -1.2401059430888672, 1.1353901068316858, 
-                 -1.4570641231587906, -1.545737091694967, 0.19007229804992676],
-    "Blanco":   [-1.6519644896136683, -1.7792769871153773, 1.716369930897848, 
-                 -1.5064748388579865, -1.544976059590475, 0.5171940922737122],
-    "Otro":     [-1.6237872282611292, -1.1733880204013367, 1.0451181570636194, 
-                 -1.441781000500061, -1.5430405775653284, 0.5462017059326172],
-    "Rojo":     [-2.607405487691061, -1.623392721215719, 1.5750983397113245, 
-                 -1.5021473106792946, -1.5576460997210901, -0.4384530226336878],
-    "Verde":    [-2.2127097288714808, -1.8773662052550257, 1.7805584112750452, 
-                 -1.4597972196391602, -1.5507801214801233, -0.04370767274965459]
-}
+# Imagen de la GUI (todas las detecciones + tapón seleccionado); solo se escribe con SAVE_DEBUG_FILES
+GUI_OVERLAY_DEBUG_PATH = "gui_overlay.jpg"
 
 # Mapeo de Cajas de GUI a Nombres de Color (de tu último main.py)
 COLOR_TO_BOX_MAP = {
@@ -66,34 +111,283 @@ if os.path.exists(CALIBRATION_FILE):
         data = json.load(f)
     camera_matrix = np.array(data["camera_matrix"])
     dist_coeffs = np.array(data["dist_coeffs"])
+    # Mapas de remapeo precalculados (se guardan como .npy junto al JSON de calibración)
+    undistorter = Undistorter.from_json(CALIBRATION_FILE)
 else:
     camera_matrix, dist_coeffs = None, None
+    undistorter = None
     print(f"ADVERTENCIA: Archivo de calibración '{CALIBRATION_FILE}' no encontrado. No se desdistorsionarán imágenes.")
 
 class RobotWorker(QObject):
     update_gui_signal = pyqtSignal(dict)
     processing_finished_signal = pyqtSignal(str)
-    # Señal para enviar la RUTA de la imagen que la GUI debe mostrar
-    update_gui_image_display_signal = pyqtSignal(str)
+    # Señal para enviar a la GUI la imagen ya compuesta a tamaño de pantalla (OverlayRenderer)
+    update_gui_qimage_signal = pyqtSignal(QImage)
     selected_cap_info_signal = pyqtSignal(tuple, str) # centroid_px, color_name
 
     def __init__(self):
         super().__init__()
         self.running = False
         self.robot = None
-        # Usar Camara con tiempo de calentamiento, ej. 1 segundos
-        self.cam = Camara(index=0, warmup_time=1)
+        # Camara en modo streaming: se abre una sola vez por sesión. Sin perfil guardado, el
+        # calentamiento termina cuando brillo y nitidez convergen (máx. 2 s); con perfil, no hay calentamiento.
+        if CAMERA_REPLAY_SOURCE:
+            self.cam = CamaraReplay(CAMERA_REPLAY_SOURCE, fps=CAMERA_REPLAY_FPS, loop=True, streaming=True,
+                                    capture_profile=CAPTURE_PROFILE)
+        else:
+            camera_profile = CAMERA_PROFILE_PATH if os.path.exists(CAMERA_PROFILE_PATH) else None
+            self.cam = Camara(index=0, warmup_time=2, streaming=True, adaptive_warmup=True, profile=camera_profile,
+                              capture_profile=CAPTURE_PROFILE)
         self.detector = None
+        self.scene_cache = None
+        self.tracker = None
+        self.inference_server = None # Lo asigna ApplicationController si INFERENCE_SERVER
+        # Etapas del ciclo con recursos (brazo, cámara, cpu) y visión del ciclo siguiente en vuelo
+        self.scheduler = None
+        self._vision_future = None
+        self._fase_recogida = None # Última fase notificada por la rutina del controlador
         # Mapeo de clases YOLO a colores
         self._yolo_class_to_color_map = {
             0: ("Amarillo", "#FFFF00"), 1: ("Azul", "#0000FF"), 2: ("Blanco", "#FFFFFF"),
             3: ("Otro", "#888888"), 4: ("Rojo", "#FF0000"), 5: ("Verde", "#00FF00")
         }
+        self.overlay = OverlayRenderer(display_size=(640, 480), class_styles=self._yolo_class_to_color_map)
 
     def _get_color_info_from_yolo_class(self, yolo_class_int: int) -> tuple[str, str]: #
         """Devuelve (nombre_color, hex_color) para un índice de clase YOLO."""
         return self._yolo_class_to_color_map.get(yolo_class_int, ("Desconocido", "#CCCCCC"))
 
+    def _mostrar_overlay(self, captured_cv_image, detections_list, display_cap_data):
+        # Imagen de la GUI: todas las detecciones y el tapón seleccionado, dibujados de una vez
+        # a tamaño de pantalla (coordenadas del propio frame mostrado, crudo o desdistorsionado)
+        overlay_image = self.overlay.render(captured_cv_image, detections_list, display_cap_data)
+        self.update_gui_qimage_signal.emit(OverlayRenderer.a_qimage(overlay_image)) # Enviar a GUI
+        if SAVE_DEBUG_FILES:
+            cv2.imwrite(GUI_OVERLAY_DEBUG_PATH, overlay_image)
+
+    def _ordenar_plan(self, pick_plan, ref_joints, ref_pose):
+        """
+        Reordena el plan (todos aislados salvo quizá el primero) por tiempo de viaje estimado.
+        ref_joints / ref_pose: posición sobre la bandeja (captura o aproximación) y su pose TCP.
+        """
+        for cap in pick_plan:
+            # Pre-recogida a la altura de retract() con la orientación de referencia (la que conserva move_to_pixel)
+            try:
+                cap['prepick_joints'] = self.robot.prepick_joints(cap['robot_xyz'], ref_pose[3:6], ref_joints)
+            except Exception as e: # Sin IK el tapón se ordena con ik_aproximada y se recoge por la aproximación
+                print(f"AVISO: Sin pre-recogida para el tapón en {cap['robot_xyz']}: {e}")
+                cap['prepick_joints'] = None
+        optimizador = OptimizadorOrden(DEPOSIT_POSITIONS, ik_aproximada(ref_joints, ref_pose[:3]), speed=3, accel=8)
+        colores = [self._get_color_info_from_yolo_class(cap['class'])[0] for cap in pick_plan]
+        orden, informe = optimizador.ordenar(pick_plan, colores, self.robot.con_recv.getActualQ())
+        print(f"INFO: Orden de recogida {orden}: {informe['tiempo_optimizado_s']:.2f} s estimados "
+              f"(orden por puntuación {informe['tiempo_original_s']:.2f} s, ahorro {informe['ahorro_s']:.2f} s).")
+        return [pick_plan[i] for i in orden]
+
+    def _contar_recogido(self, cap_color_name, centroid_px):
+        global cap_counts
+        if cap_color_name in cap_counts: #
+            cap_counts[cap_color_name] += 1
+        else:
+            cap_counts[cap_color_name] = 1 #
+
+        gui_update_data = {"counts": cap_counts.copy(), #
+                           "status": f"Tapón {cap_color_name} recogido.",
+                           "last_picked_color_name": cap_color_name,
+                           "last_picked_coords": centroid_px}
+        self.update_gui_signal.emit(gui_update_data)
+
+    def _capturar_y_analizar(self):
+        """
+        Etapas de visión de un ciclo: captura (cámara; con la cámara del brazo también el brazo, que debe
+        seguir quieto en la posición de captura) y desdistorsión + inferencia + seguimiento + plan (cpu).
+        Devuelve (imagen, detecciones, plan) o None si falla la captura. Puede correr en otro hilo
+        mientras el brazo deposita (el worker no toca el tracker hasta recoger el resultado).
+        """
+        with self.scheduler.etapa("captura", *(("camara",) if FIXED_OVERHEAD_CAMERA else ("brazo", "camara"))):
+            self.update_gui_signal.emit({"status": "Capturando imagen..."}) #
+            captured_cv_image = self.cam.capturar_frame() # Frame en memoria posterior al movimiento
+            # El frame puede venir recortado al ROI de la bandeja: roi_offset lo sitúa en el frame completo
+            roi_offset, full_size = self.cam.roi_offset, self.cam.frame_size
+        if captured_cv_image is None:
+            return None
+
+        with self.scheduler.etapa("vision", "cpu"):
+            if undistorter is not None:
+                if not UNDISTORT_DETECTIONS_ONLY:
+                    captured_cv_image = undistorter.undistort(captured_cv_image, offset=roi_offset, full_size=full_size)
+            else:
+                print("AVISO: No se pudo desdistorsionar la imagen por falta de parámetros de calibración.")
+
+            if SAVE_DEBUG_FILES:
+                cv2.imwrite(IMAGE_PATH, captured_cv_image)
+
+            self.update_gui_signal.emit({"status": "Analizando imagen (YOLO)..."}) #
+            # `analizar_imagen` devuelve `results` (objeto de YOLO) y `detections` (lista de dicts)
+            if self.scene_cache is not None:
+                _, detections_list = self.scene_cache.analizar(captured_cv_image)
+            else:
+                _, detections_list = self.detector.analizar_imagen(captured_cv_image) #
+            # Detecciones en píxeles del frame completo y desdistorsionadas, para la decisión y el robot
+            pick_detections = desplazar_detecciones(detections_list, roi_offset)
+            if undistorter is not None and UNDISTORT_DETECTIONS_ONLY:
+                pick_detections = undistorter.undistort_detections(pick_detections, full_size)
+            if SAVE_DEBUG_FILES:
+                self.detector.guardar_json(detections_list, JSON_OUTPUT_PATH) #
+
+            self.update_gui_signal.emit({"status": "Seleccionando tapón..."}) #
+            # min_area y min_confidence de tu último main.py
+            decision_maker = CapDecisionMaker(min_area=2000, min_confidence=0.7, min_clearance_px=MIN_PICK_CLEARANCE_PX)
+            self.tracker.actualizar(pick_detections)
+            # Candidatos con clase suavizada por votos y sin los descartados por fallos repetidos (que
+            # siguen contando como vecinos para la holgura).
+            # El plan empieza por el mejor tapón y sigue con los aislados: se recogen todos sin
+            # volver a capturar salvo que falle una recogida.
+            pick_plan = decision_maker.plan_picks(self.tracker.candidatos(), max_picks=MAX_PICKS_PER_CAPTURE,
+                                                  obstacles=self.tracker.descartados())
+        return captured_cv_image, detections_list, pick_plan
+
+    def _brazo_fuera_de_vista(self):
+        """True si el TCP está fuera de la zona de la mesa que ve la cámara fija (más ARM_CLEAR_MARGIN_M)."""
+        w, h = self.cam.frame_size
+        xs, ys, _ = zip(*(self.robot.pixel_to_robot(px, py) for px, py in ((0, 0), (w, 0), (0, h), (w, h))))
+        x, y = self.robot.con_recv.getActualTCPPose()[:2]
+        m = ARM_CLEAR_MARGIN_M
+        return not (min(xs) - m <= x <= max(xs) + m and min(ys) - m <= y <= max(ys) + m)
+
+    def _esperar_brazo_fuera(self, terminado):
+        """
+        Espera a que el TCP salga de la vista de la cámara fija o a que termine el movimiento al depósito
+        (como mucho ARM_CLEAR_TIMEOUT_S, y nada si se detiene el proceso).
+        """
+        limite = time.monotonic() + ARM_CLEAR_TIMEOUT_S
+        while self.running and time.monotonic() < limite and not terminado() and not self._brazo_fuera_de_vista():
+            time.sleep(0.01)
+        if not self._brazo_fuera_de_vista():
+            print("AVISO: El brazo sigue en la vista de la cámara fija al llegar al depósito.")
+
+    def _capturar_con_brazo_fuera(self, terminado):
+        self._esperar_brazo_fuera(terminado)
+        if not self.running:
+            return None
+        return self._capturar_y_analizar()
+
+    def _adelantar_vision(self, motion=None):
+        """
+        Lanza la visión del ciclo siguiente en cuanto el brazo deja libre la vista de la cámara fija.
+        motion: movimiento al depósito (recogida desde Python). Sin él (rutina en el controlador) el
+        progreso solo avisa al cambiar de fase, así que la espera se hace en el hilo de la visión
+        hasta que la rutina sale de la fase de depósito.
+        """
+        if self._vision_future is not None:
+            return
+        if motion is not None:
+            self._esperar_brazo_fuera(motion.done)
+            self._vision_future = self.scheduler.lanzar(self._capturar_y_analizar)
+        else:
+            self._vision_future = self.scheduler.lanzar(self._capturar_con_brazo_fuera,
+                                                        lambda: self._fase_recogida != "depósito")
+
+    def _recoger_tapon(self, selected_cap_data, captured_cv_image, detections_list, desde_deposito=False,
+                       adelantar_vision=False):
+        """
+        Recoge y deposita un tapón del plan. Devuelve True si se recogió, False si falló la
+        recogida (hay que volver a capturar) y None si se omitió (clase desconocida).
+        desde_deposito: el robot viene de soltar otro tapón y primero vuelve sobre la bandeja.
+        adelantar_vision: último tapón del plan con cámara fija: capturar y analizar el ciclo
+                          siguiente mientras el brazo va al depósito.
+        """
+        display_cap_data = detections_list[selected_cap_data['detection_index']]
+        centroid_px = tuple(selected_cap_data['centroid']) #
+        yolo_class_index = selected_cap_data['class']      #
+        px, py = centroid_px                               #
+        track_id = selected_cap_data['track_id']
+
+        cap_color_name, _ = self._get_color_info_from_yolo_class(yolo_class_index) #
+
+        if cap_color_name == "Desconocido": #
+            self._mostrar_overlay(captured_cv_image, detections_list, display_cap_data)
+            self.update_gui_signal.emit({"status": f"Clase YOLO desconocida ({yolo_class_index}). Ignorando tapón."}) #
+            self.tracker.marcar_fallo(track_id)
+            # La imagen con las detecciones ya se mostró. No hacer nada más con este tapón.
+            time.sleep(1) # Pausa para que el mensaje sea visible
+            return None
+
+        # --- Lógica del Robot ---
+        if self.robot.pick_routine is not None and cap_color_name in DEPOSIT_POSITIONS:
+            self._mostrar_overlay(captured_cv_image, detections_list, display_cap_data)
+            self.selected_cap_info_signal.emit(centroid_px, cap_color_name) #
+            # Recogida completa en el controlador: un solo disparo por tapón
+            def progreso(fase):
+                self._fase_recogida = fase
+                self.update_gui_signal.emit({"status": f"Tapón {cap_color_name}: {fase}..."})
+                if adelantar_vision and fase == "depósito": # El brazo ya subió y gira hacia el depósito
+                    self.tracker.marcar_recogido(track_id) # Antes de que la visión adelantada use el tracker
+                    self._adelantar_vision()
+            try:
+                recogido = self.robot.scripted_pick(px, py, cap_color_name, via_approach=desde_deposito,
+                                                    progress=progreso)
+            finally:
+                self._fase_recogida = None # Libera la espera de la visión adelantada aunque la rutina falle
+            if recogido:
+                if self._vision_future is None: # Con visión adelantada ya se marcó (su hilo usa el tracker)
+                    self.tracker.marcar_recogido(track_id)
+                self._contar_recogido(cap_color_name, centroid_px)
+                return True
+            self.update_gui_signal.emit({"status": "Error: No se detectó contacto al coger."})
+            self.tracker.marcar_fallo(track_id)
+            return False
+
+        # Los movimientos se lanzan sin bloquear: la GUI se actualiza mientras el brazo viaja
+        if desde_deposito and selected_cap_data.get('prepick_joints'):
+            # IK del tapón: el moveJ va directo a su pre-recogida (ya sobre el píxel)
+            motion = self.robot.move_joint_async(selected_cap_data['prepick_joints'], speed=3, accel=8)
+        elif desde_deposito:
+            # Volver sobre la bandeja y bajar al tapón con la orientación de la aproximación, sin parar entre ambos
+            motion = self.robot.move_path_async([("J", PICK_APPROACH_JOINTS, 3, 8, PATH_BLEND_RADIUS),
+                                                 ("L", self.robot.pixel_pose(px, py, PICK_APPROACH_JOINTS), 0.25, 0.35, 0.0)])
+        else:
+            motion = self.robot.move_linear_async(self.robot.pixel_pose(px, py), speed=0.25, accel=0.35) #
+        self.update_gui_signal.emit({"status": f"Moviendo robot a tapón {cap_color_name} en ({px},{py})..."}) #
+        self._mostrar_overlay(captured_cv_image, detections_list, display_cap_data)
+        self.selected_cap_info_signal.emit(centroid_px, cap_color_name) #
+        motion.wait()
+
+        if self.robot.descend_until_contact(): #
+            self.update_gui_signal.emit({"status": "Contacto detectado. Ventosa activada."})
+            self.robot.descend_with_force(duration=0.75, force=15.0)
+            self.update_gui_signal.emit({"status": "Vacío generado. Tapón sujeto."})
+            deposit_target_pose = DEPOSIT_POSITIONS.get(cap_color_name) #
+            if deposit_target_pose: #
+                self.update_gui_signal.emit({"status": f"Depositando tapón {cap_color_name}..."}) #
+                # Subida y moveJ al depósito en un solo path: el giro empieza al acabar la subida, sin parar
+                motion = self.robot.move_path_async([("L", self.robot.retract_pose(), 0.5, 0.5, PATH_BLEND_RADIUS),
+                                                     ("J", deposit_target_pose, 3, 8, 0.0)])
+            else:
+                motion = self.robot.move_linear_async(self.robot.retract_pose(), speed=0.5, accel=0.5)
+            # Contadores y GUI mientras el brazo sube y gira hacia el depósito
+            self.tracker.marcar_recogido(track_id)
+            self._contar_recogido(cap_color_name, centroid_px)
+            if adelantar_vision and deposit_target_pose:
+                self._adelantar_vision(motion)
+            motion.wait()
+
+            if deposit_target_pose: #
+                self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False) # Soltar
+                time.sleep(0.5) #
+            else: #
+                self.update_gui_signal.emit({"status": f"Advertencia: Depósito no definido para {cap_color_name}."})
+                self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False)
+                time.sleep(0.5)
+            self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False) # Asegurar desactivación
+            return True
+        else:
+            self.update_gui_signal.emit({"status": "Error: No se detectó contacto al coger."}) #
+            self.robot.retract(dz=0.05) # Retraer un poco
+            self.tracker.marcar_fallo(track_id)
+            return False
+        # --- Fin Lógica del Robot ---
+
     def run_process(self):
         self.running = True
         global cap_counts
@@ -105,122 +399,88 @@ class RobotWorker(QObject):
                 self.running = False; return
 
             self.update_gui_signal.emit({"status": "Inicializando componentes..."}) #
-            self.detector = TaponesDetector(MODEL_PATH) #
+            self.detector = TaponesDetector(MODEL_PATH, backend=INFERENCE_BACKEND,
+                                            imgsz=DETECTOR_IMGSZ, roi=DETECTOR_ROI,
+                                            servidor=self.inference_server,
+                                            tile_size=DETECTOR_TILE_SIZE, tile_overlap=DETECTOR_TILE_OVERLAP) #
+            self.scene_cache = CacheEscena(self.detector) if SCENE_CACHE else None
+            if self.cam.profile is None and not CAMERA_REPLAY_SOURCE:
+                # Abrir (exposición convergida) y fijarla antes de que el hilo capturador use el dispositivo:
+                # colores más estables entre ciclos
+                self.cam.abrir()
+                self.cam.bloquear_controles()
+                self.cam.guardar_perfil(CAMERA_PROFILE_PATH)
+            self.cam.iniciar_streaming() # Mantiene la cámara abierta y con la exposición ajustada
 
             self.update_gui_signal.emit({"status": "Conectando al robot..."}) #
             self.robot = RobotController(robot_ip=ROBOT_IP, digital_output_pin=DIGITAL_OUTPUT_PIN) #
             self.robot.connect() #
+            # Seguimiento de tapones entre ciclos (IDs estables, votos de clase, intentos fallidos)
+            self.tracker = CapTracker(pixel_to_robot=self.robot.pixel_to_robot)
+            self.scheduler = PlanificadorCiclo()
+            self._vision_future = None
 
             self.update_gui_signal.emit({"status": "Robot conectado. Moviendo a reposo..."}) #
             self.robot.move_joint(REST_POSITION_JOINTS, speed=0.8, accel=1.2) #
+            # Referencia sobre la bandeja para ordenar el plan: con la cámara fija no hay posición de captura
+            ref_joints = PICK_APPROACH_JOINTS if FIXED_OVERHEAD_CAMERA else IMAGE_CAPTURE_POSITION_JOINTS
+            ref_pose = self.robot.forward_kinematics(ref_joints)
+            if SCRIPTED_PICK:
+                self.robot.upload_pick_routine({"aproximacion": PICK_APPROACH_JOINTS,
+                                                "captura": IMAGE_CAPTURE_POSITION_JOINTS,
+                                                "aparcamiento": FIXED_CAMERA_PARK_JOINTS, **DEPOSIT_POSITIONS},
+                                               "aproximacion", joint_speed=3, joint_accel=8, blend=PATH_BLEND_RADIUS)
 
             while self.running:
-                self.update_gui_signal.emit({"status": "Moviendo a posición de captura..."}) #
-                self.robot.move_joint(IMAGE_CAPTURE_POSITION_JOINTS, speed=3, accel=8) #
+                t_ciclo = time.perf_counter()
+                if self._vision_future is not None:
+                    # Visión ya hecha durante el último depósito (cámara fija)
+                    vision = self._vision_future.result()
+                    self._vision_future = None
+                else:
+                    destino = "aparcamiento" if FIXED_OVERHEAD_CAMERA else "captura"
+                    with self.scheduler.etapa(f"a_{destino}", "brazo"):
+                        self.update_gui_signal.emit({"status": f"Moviendo a posición de {destino}..."}) #
+                        if self.robot.pick_routine is not None:
+                            self.robot.scripted_move_joint(destino)
+                        elif FIXED_OVERHEAD_CAMERA:
+                            self.robot.move_joint(FIXED_CAMERA_PARK_JOINTS, speed=3, accel=8)
+                        else:
+                            ref_pose = self.robot.move_joint(IMAGE_CAPTURE_POSITION_JOINTS, speed=3, accel=8) #
+                    vision = self._capturar_y_analizar()
 
-                self.update_gui_signal.emit({"status": "Capturando imagen (con calentamiento)..."}) #
-                if not self.cam.tomar_foto(IMAGE_PATH): # tomar_foto ahora incluye calentamiento
+                if vision is None:
                     self.update_gui_signal.emit({"status": "Error al capturar imagen. Reintentando..."}) #
                     if self.running: time.sleep(2)
                     continue
-
-                # Cargar la imagen capturada con OpenCV para poder pasarla a decisionMaker
-                captured_cv_image = cv2.imread(IMAGE_PATH)
-
-                if camera_matrix is not None and dist_coeffs is not None:
-                    captured_cv_image = cv2.undistort(captured_cv_image, camera_matrix, dist_coeffs)
-                    cv2.imwrite(IMAGE_PATH, captured_cv_image)  # Sobrescribimos la imagen ya desdistorsionada
-                else:
-                    print("AVISO: No se pudo desdistorsionar la imagen por falta de parámetros de calibración.")
-
-                if captured_cv_image is None:
-                    self.update_gui_signal.emit({"status": "Error crítico: No se pudo leer la imagen capturada del disco."})
-                    continue
-
-                self.update_gui_signal.emit({"status": "Analizando imagen (YOLO)..."}) #
-                # `analizar_imagen` devuelve `results` (objeto de YOLO) y `detections` (lista de dicts)
-                yolo_results_obj, detections_list = self.detector.analizar_imagen(IMAGE_PATH) #
-                self.detector.guardar_json(detections_list, JSON_OUTPUT_PATH) #
-
-                # Guardar imagen con TODAS las detecciones para la GUI
-                # `guardar_imagen_resultado` usa `results.plot()`
-                self.detector.guardar_imagen_resultado(yolo_results_obj, ALL_DETECTIONS_DISPLAY_PATH)
-                self.update_gui_image_display_signal.emit(ALL_DETECTIONS_DISPLAY_PATH) # Enviar a GUI
-
-                self.update_gui_signal.emit({"status": "Seleccionando tapón..."}) #
-                # min_area y min_confidence de tu último main.py
-                decision_maker = CapDecisionMaker(JSON_OUTPUT_PATH, min_area=2000, min_confidence=0.7)
-                selected_cap_data = decision_maker.select_best_cap() # Devuelve el diccionario del mejor tapón
-
-                if selected_cap_data and self.running:
-                    centroid_px = tuple(selected_cap_data['centroid']) #
-                    yolo_class_index = selected_cap_data['class']      #
-                    px, py = centroid_px                               #
-
-                    cap_color_name, _ = self._get_color_info_from_yolo_class(yolo_class_index) #
-
-                    if cap_color_name == "Desconocido": #
-                        self.update_gui_signal.emit({"status": f"Clase YOLO desconocida ({yolo_class_index}). Ignorando tapón."}) #
-                        # La imagen con todas las detecciones ya se mostró. No hacer nada más con este tapón.
-                        time.sleep(1) # Pausa para que el mensaje sea visible
-                        continue
-
-                    self.selected_cap_info_signal.emit(centroid_px, cap_color_name) #
-                    self.update_gui_signal.emit({"status": f"Tapón {cap_color_name} en ({px},{py}). Procesando..."}) #
-
-                    # Dibujar SOLO el tapón seleccionado en la imagen original capturada
-                    image_with_only_selected = decision_maker.draw_selected_on_image(captured_cv_image, selected_cap_data)
-                    if image_with_only_selected is not None:
-                        cv2.imwrite(SELECTED_CAP_DISPLAY_PATH, image_with_only_selected)
-                        self.update_gui_image_display_signal.emit(SELECTED_CAP_DISPLAY_PATH) # Enviar a GUI
-                    else:
-                        # Si falla el dibujo, al menos mostrar la de todas las detecciones
-                        self.update_gui_image_display_signal.emit(ALL_DETECTIONS_DISPLAY_PATH)
-
-                    # --- Lógica del Robot ---
-                    self.update_gui_signal.emit({"status": f"Moviendo robot a tapón {cap_color_name}..."}) #
-                    self.robot.move_to_pixel(px, py, speed=0.25, accel=0.35) #
-
-                    if self.robot.descend_until_contact(): #
-                        self.update_gui_signal.emit({"status": "Contacto detectado. Ventosa activada."})
-                        self.robot.descend_with_force(duration=0.75, force=15.0)
-                        self.update_gui_signal.emit({"status": "Vacío generado. Tapón sujeto."})
-                        self.robot.retract(dz=0.15) # dz=0.15 de tu último main.py
-
-                        if cap_color_name in cap_counts: #
-                            cap_counts[cap_color_name] += 1
-                        else:
-                            cap_counts[cap_color_name] = 1 #
-
-                        gui_update_data = {"counts": cap_counts.copy(), #
-                                           "status": f"Tapón {cap_color_name} recogido.",
-                                           "last_picked_color_name": cap_color_name,
-                                           "last_picked_coords": centroid_px}
-                        self.update_gui_signal.emit(gui_update_data)
-
-                        deposit_target_pose = DEPOSIT_POSITIONS.get(cap_color_name) #
-                        if deposit_target_pose: #
-                            self.update_gui_signal.emit({"status": f"Depositando tapón {cap_color_name}..."}) #
-                            # move_joint para depositar según tu último main.py
-                            self.robot.move_joint(deposit_target_pose, speed=3, accel=8)
-                            self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False) # Soltar
-                            time.sleep(0.5) #
-                        else: #
-                            self.update_gui_signal.emit({"status": f"Advertencia: Depósito no definido para {cap_color_name}."})
-                            self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False)
-                            time.sleep(0.5)
-                        self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False) # Asegurar desactivación
-                    else:
-                        self.update_gui_signal.emit({"status": "Error: No se detectó contacto al coger."}) #
-                        self.robot.retract(dz=0.05) # Retraer un poco
-                     # --- Fin Lógica del Robot ---
+                captured_cv_image, detections_list, pick_plan = vision
+                if PICK_ORDER_OPTIMIZATION and len(pick_plan) > 1:
+                    with self.scheduler.etapa("orden", "cpu"):
+                        pick_plan = self._ordenar_plan(pick_plan, ref_joints, ref_pose)
+
+                if pick_plan and self.running:
+                    # Con la cámara fija siempre se llega desde fuera de la bandeja (aparcamiento o depósito)
+                    desde_deposito = FIXED_OVERHEAD_CAMERA
+                    for i, selected_cap_data in enumerate(pick_plan):
+                        if not self.running:
+                            break
+                        adelantar = FIXED_OVERHEAD_CAMERA and i == len(pick_plan) - 1
+                        with self.scheduler.etapa("recogida", "brazo"):
+                            resultado = self._recoger_tapon(selected_cap_data, captured_cv_image, detections_list,
+                                                            desde_deposito, adelantar)
+                        if resultado is False:
+                            break # Recogida fallida: la escena puede haber cambiado, volver a capturar
+                        if resultado:
+                            desde_deposito = True
 
                 elif self.running: # No hay tapones válidos y el proceso no fue detenido externamente
+                    self._mostrar_overlay(captured_cv_image, detections_list, None) # Detecciones sin selección
                     self.update_gui_signal.emit({"status": "No se detectaron tapones válidos. Finalizando ciclo."}) #
                     self.running = False # Detener el bucle
                     self.processing_finished_signal.emit("Proceso completado: No hay más tapones detectados.") #
                     break # Salir del bucle while
 
+                print(f"INFO: Ciclo: {PlanificadorCiclo.formatear(self.scheduler.informe(t_ciclo))}")
                 if not self.running: # Comprobar si se solicitó detener desde fuera del bucle
                     break
                 time.sleep(0.1) # Pequeña pausa en el bucle
@@ -231,12 +491,18 @@ class RobotWorker(QObject):
             tb_lineno = e.__traceback__.tb_lineno if e.__traceback__ else "N/A"
             self.processing_finished_signal.emit(f"Error inesperado en RobotWorker: {str(e)} (Línea: {tb_lineno})")
         finally:
+            if self.scheduler is not None:
+                self.scheduler.cerrar() # Espera a la visión adelantada antes de cerrar la cámara
+                print(f"INFO: Sesión: {PlanificadorCiclo.formatear(self.scheduler.informe())}")
+                self._vision_future = None
             if self.robot and self.robot.con_ctrl and self.robot.con_ctrl.isConnected(): #
                 self.update_gui_signal.emit({"status": "Moviendo a reposo y desconectando..."}) #
                 try:
+                    self.robot.stop_pick_routine() # Restaura el script de control antes de moverse
                     self.robot.con_io.setStandardDigitalOut(DIGITAL_OUTPUT_PIN, False) #
                     self.robot.move_joint(REST_POSITION_JOINTS, speed=0.5, accel=1.0) #
                     self.robot.stop() #
+                    print(f"INFO: Tiempos de asentamiento de los movimientos: {self.robot.settle_summary()}")
                 except Exception as e_stop: print(f"ERROR durante parada/desconexión del robot: {e_stop}")
                 finally: self.robot.disconnect() #
             if self.cam: self.cam.cerrar() #
@@ -257,13 +523,19 @@ class ApplicationController(QObject): # Basado en tu último main.py
 
         self.robot_thread_obj = QThread()
         self.robot_worker = RobotWorker()
+        self.inference_server = None
+        if INFERENCE_SERVER:
+            # Se lanza ya para que el modelo cargue mientras se muestra la pantalla de inicio
+            self.inference_server = ServidorInferencia(MODEL_PATH, backend=INFERENCE_BACKEND, imgsz=DETECTOR_IMGSZ)
+            self.inference_server.iniciar()
+            self.robot_worker.inference_server = self.inference_server
         self.robot_worker.moveToThread(self.robot_thread_obj)
 
         # Conexiones de señales
         self.robot_worker.update_gui_signal.connect(self.gui_main_app.main_screen.update_info_panel)
         self.robot_worker.processing_finished_signal.connect(self.handle_processing_finished)
         # Conectar la nueva señal para mostrar imágenes en la GUI
-        self.robot_worker.update_gui_image_display_signal.connect(self.gui_main_app.main_screen.update_camera_image_from_file)
+        self.robot_worker.update_gui_qimage_signal.connect(self.gui_main_app.main_screen.update_camera_image_from_qimage)
         self.robot_worker.selected_cap_info_signal.connect(self.gui_main_app.main_screen.update_selected_cap_details)
 
         self.robot_thread_obj.started.connect(self.robot_worker.run_process)
@@ -319,6 +591,8 @@ class ApplicationController(QObject): # Basado en tu último main.py
             if not self.robot_thread_obj.wait(3000): # Esperar máx 3 seg.
                 print("ADVERTENCIA: El hilo del robot no terminó a tiempo, forzando terminación.")
                 self.robot_thread_obj.terminate() # Usar como último recurso
+        if self.inference_server is not None:
+            self.inference_server.detener()
 
 
 if __name__ == "__main__": # Basado en tu último main.py
@@ -0,0 +1,82 @@
+# overlayRenderer.py
+"""
+Renderizado de la imagen de la GUI en un solo paso: el frame se reescala una vez a tamaño de
+pantalla dentro de un buffer preasignado y sobre él se dibujan todas las detecciones y el tapón
+seleccionado. El buffer se entrega a la GUI como QImage sin pasar por disco (sin results.plot(),
+sin JPEG intermedios y sin copias del frame a resolución completa).
+"""
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage
+
+DEFAULT_COLOR = (200, 200, 200)
+SELECTED_COLOR = (255, 128, 0) # BGR
+
+
+def hex_a_bgr(hex_color):
+    hex_color = hex_color.lstrip("#")
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+    return (b, g, r)
+
+
+class OverlayRenderer:
+    def __init__(self, display_size=(640, 480), class_styles=None, num_buffers=3):
+        """
+        display_size: (ancho, alto) del área de imagen de la GUI (MainScreen.camera_label).
+        class_styles: {clase: (nombre, color hex)}, p. ej. el mapeo de colores de RobotWorker.
+        num_buffers: Buffers en rotación para dibujar sin reasignar memoria en cada frame. Lo que se
+                     envía a la GUI es una copia (a_qimage), así que un buffer se puede reutilizar
+                     aunque la señal siga en la cola.
+        """
+        self.display_size = display_size
+        self.class_styles = {int(c): (name, hex_a_bgr(color)) for c, (name, color) in (class_styles or {}).items()}
+        self.num_buffers = num_buffers
+        self._buffers = []
+        self._frame_shape = None
+        self._index = 0
+        self.scale = 1.0
+
+    def _preparar(self, frame_shape):
+        """(Re)asigna los buffers solo si cambia el tamaño del frame."""
+        if frame_shape[:2] == self._frame_shape:
+            return
+        h, w = frame_shape[:2]
+        self.scale = min(self.display_size[0] / w, self.display_size[1] / h)
+        size = (max(1, int(round(w * self.scale))), max(1, int(round(h * self.scale))))
+        self._buffers = [np.empty((size[1], size[0], 3), dtype=np.uint8) for _ in range(self.num_buffers)]
+        self._frame_shape = frame_shape[:2]
+
+    def render(self, frame, detections, selected=None):
+        """
+        Dibuja `detections` (dicts en coordenadas de `frame`) y resalta `selected`.
+        Devuelve el buffer BGR a tamaño de pantalla (válido hasta num_buffers renderizados más).
+        """
+        self._preparar(frame.shape)
+        buffer = self._buffers[self._index]
+        self._index = (self._index + 1) % self.num_buffers
+        interpolation = cv2.INTER_AREA if self.scale < 1.0 else cv2.INTER_LINEAR
+        cv2.resize(frame, (buffer.shape[1], buffer.shape[0]), dst=buffer, interpolation=interpolation)
+
+        if detections:
+            boxes = np.rint(np.array([d["bounding_box"] for d in detections], dtype=float) * self.scale).astype(int)
+            for (x1, y1, x2, y2), det in zip(boxes.tolist(), detections):
+                name, color = self.class_styles.get(int(det["class"]), (str(det["class"]), DEFAULT_COLOR))
+                cv2.rectangle(buffer, (x1, y1), (x2, y2), color, 1)
+                cv2.putText(buffer, f"{name} {det['confidence']:.2f}", (x1, max(y1 - 4, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1, cv2.LINE_AA)
+
+        if selected:
+            x1, y1, x2, y2 = (int(round(v * self.scale)) for v in selected["bounding_box"])
+            cx, cy = (int(round(v * self.scale)) for v in selected["centroid"])
+            cv2.rectangle(buffer, (x1, y1), (x2, y2), SELECTED_COLOR, 2)
+            cv2.circle(buffer, (cx, cy), 4, (0, 0, 255), -1)
+        return buffer
+
+    @staticmethod
+    def a_qimage(buffer):
+        """
+        QImage con su propia copia del buffer (a tamaño de pantalla la copia es barata): la señal
+        encolada hacia la GUI no puede apuntar a un buffer que el worker reasigna o vuelve a dibujar.
+        """
+        h, w = buffer.shape[:2]
+        return QImage(buffer.data, w, h, buffer.strides[0], QImage.Format_BGR888).copy()
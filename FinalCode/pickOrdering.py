@@ -0,0 +1,123 @@
+# pickOrdering.py
+"""
+Orden de recogida de un plan de varios tapones que minimiza el tiempo de viaje del robot.
+
+Cada tapón tiene una posición de pre-recogida sobre la bandeja (pixel_to_robot + orientación de
+captura, convertida a articulaciones por cinemática inversa) y un depósito (DEPOSIT_POSITIONS).
+La secuencia es: inicio -> tapón 1 -> depósito 1 -> tapón 2 -> depósito 2 ... -> inicio.
+Los tramos tapón -> su depósito no dependen del orden; los tramos depósito -> siguiente tapón sí.
+
+El tiempo de cada moveJ se estima con un perfil trapezoidal de la articulación que más se mueve
+(los controladores UR sincronizan las demás con ella). El orden se construye con el vecino más
+cercano y se refina con 2-opt sobre el coste real (asimétrico) de la secuencia completa.
+"""
+import math
+from typing import Callable, Dict, List, Sequence
+import numpy as np
+
+
+def tiempo_trapezoidal(distancia, speed, accel):
+    """Tiempo de un movimiento de `distancia` con velocidad máxima `speed` y aceleración `accel`."""
+    distancia = abs(distancia)
+    if distancia <= speed * speed / accel: # No llega a velocidad de crucero (perfil triangular)
+        return 2.0 * math.sqrt(distancia / accel)
+    return distancia / speed + speed / accel
+
+
+def tiempo_move_joint(q_from, q_to, speed=3.0, accel=8.0):
+    """Estimación del tiempo de un moveJ entre dos configuraciones articulares (rad)."""
+    return tiempo_trapezoidal(np.max(np.abs(np.subtract(q_to, q_from))), speed, accel)
+
+
+def ik_aproximada(q_ref, xyz_ref):
+    """
+    Cinemática inversa aproximada para estimaciones sin robot conectado: solo gira la base
+    (articulación 0) el ángulo entre la posición de referencia y la objetivo alrededor del eje Z
+    de la base; el resto de articulaciones se mantiene como en q_ref. En la célula, el giro de la
+    base domina los tramos bandeja <-> depósitos.
+    """
+    angulo_ref = math.atan2(xyz_ref[1], xyz_ref[0])
+    def ik(xyz):
+        q = list(q_ref)
+        q[0] = q_ref[0] + math.atan2(xyz[1], xyz[0]) - angulo_ref
+        return q
+    return ik
+
+
+class OptimizadorOrden:
+    def __init__(self, deposit_joints: Dict[str, Sequence[float]], ik: Callable,
+                 speed: float = 3.0, accel: float = 8.0):
+        """
+        deposit_joints: {nombre_color: articulaciones del depósito} (DEPOSIT_POSITIONS).
+        ik: xyz -> articulaciones de pre-recogida, para los tapones sin "prepick_joints" (los que
+            no tienen solución de RobotController.prepick_joints, o todos sin robot: ik_aproximada).
+        speed / accel: Límites de los moveJ (los de main.py).
+        """
+        self.deposit_joints = deposit_joints
+        self.ik = ik
+        self.speed = speed
+        self.accel = accel
+
+    def _preparar(self, caps: List[Dict], colores: List[str]):
+        """Articulaciones de pre-recogida y de depósito de cada tapón."""
+        prepick = [np.asarray(cap["prepick_joints"]) if cap.get("prepick_joints") is not None
+                   else np.asarray(self.ik(cap["robot_xyz"])) for cap in caps]
+        deposito = [np.asarray(self.deposit_joints.get(color, prepick[i])) for i, color in enumerate(colores)]
+        return prepick, deposito
+
+    def _matrices(self, start, prepick, deposito):
+        n = len(prepick)
+        t = lambda a, b: tiempo_move_joint(a, b, self.speed, self.accel)
+        inicio = np.array([t(start, prepick[j]) for j in range(n)])
+        fijo = np.array([t(prepick[j], deposito[j]) for j in range(n)])     # tapón -> su depósito
+        transicion = np.array([[t(deposito[i], prepick[j]) for j in range(n)] for i in range(n)])
+        vuelta = np.array([t(deposito[i], start) for i in range(n)])        # último depósito -> inicio
+        return inicio, fijo, transicion, vuelta
+
+    @staticmethod
+    def _coste(orden, inicio, fijo, transicion, vuelta):
+        if not orden:
+            return 0.0
+        total = inicio[orden[0]] + fijo[orden].sum() + vuelta[orden[-1]]
+        for a, b in zip(orden[:-1], orden[1:]):
+            total += transicion[a, b]
+        return float(total)
+
+    def ordenar(self, caps: List[Dict], colores: List[str], start_joints: Sequence[float]):
+        """
+        caps: dicts con "robot_xyz" (o "prepick_joints"). colores: depósito de cada tapón.
+        Devuelve (índices en orden óptimo, informe dict con tiempos estimados en segundos).
+        El orden de entrada (el de puntuación) sirve de referencia para el ahorro.
+        """
+        n = len(caps)
+        if n == 0:
+            return [], {"tiempo_original_s": 0.0, "tiempo_optimizado_s": 0.0, "ahorro_s": 0.0}
+        prepick, deposito = self._preparar(caps, colores)
+        mats = self._matrices(np.asarray(start_joints), prepick, deposito)
+        inicio, _, transicion, _ = mats
+
+        # Vecino más cercano desde la posición inicial
+        pendientes = set(range(n))
+        orden = [int(np.argmin(inicio))]
+        pendientes.discard(orden[0])
+        while pendientes:
+            actual = orden[-1]
+            siguiente = min(pendientes, key=lambda j: transicion[actual, j])
+            orden.append(siguiente)
+            pendientes.discard(siguiente)
+
+        # 2-opt: invertir tramos mientras mejore el coste total
+        mejor = self._coste(orden, *mats)
+        mejorado = True
+        while mejorado:
+            mejorado = False
+            for i in range(n - 1):
+                for k in range(i + 1, n):
+                    candidato = orden[:i] + orden[i:k + 1][::-1] + orden[k + 1:]
+                    coste = self._coste(candidato, *mats)
+                    if coste < mejor - 1e-9:
+                        orden, mejor, mejorado = candidato, coste, True
+
+        original = self._coste(list(range(n)), *mats)
+        informe = {"tiempo_original_s": original, "tiempo_optimizado_s": mejor, "ahorro_s": original - mejor}
+        return orden, informe
@@ -0,0 +1,258 @@
+# pickRoutine.py
+"""
+Rutina de recogida ejecutada en el controlador (URScript) con un solo intercambio por tapón.
+
+En lugar de encadenar desde Python moveL, moveUntilContact, el bucle de forceMode a 500 Hz, las
+escrituras de IO, la subida y el moveJ al depósito, se sube una vez un programa URScript en bucle
+con las posiciones articulares (aproximación, captura, depósitos) y los parámetros de la recogida.
+Por cada tapón, Python solo escribe en los registros de entrada RTDE la XY del tapón, el índice
+del depósito y el comando, y después sigue el progreso por los registros de salida.
+
+Protocolo de registros (enteros/dobles "input" que escribe Python, "output" que escribe el script):
+  in int  18: secuencia (el script ejecuta un comando cada vez que cambia)
+  in int  19: comando (CMD_*)
+  in int  20: argumento (índice de la tabla de posiciones articulares)
+  in int  21: 1 = ir antes a la aproximación (se viene de un depósito)
+  in dbl  18/19: X/Y del tapón (m, base del robot)
+  out int 18: última secuencia terminada
+  out int 19: fase actual (FASE_*)
+Los números de registro son los rangos libres de ur_rtde (18-22 de entrada); ajustar si se usan
+los rangos superiores.
+
+Mientras la rutina está cargada sustituye al script de control de ur_rtde: todos los movimientos
+pasan por ella (CMD_MOVEJ) y al detenerla se vuelve a subir el script de control.
+
+El programa se envía por la interfaz secundaria del controlador (puerto 30002) y no con
+RTDEControlInterface.sendCustomScript: esa llamada espera a que el script señale el fin del
+comando en el registro de salida 0, y la rutina no termina nunca. La carga se confirma cuando el
+script copia la secuencia de entrada al registro de salida.
+"""
+import socket
+import time
+
+REG_SEQ = 18
+REG_CMD = 19
+REG_ARG = 20
+REG_VIA_APPROACH = 21
+REG_X = 18
+REG_Y = 19
+REG_OUT_SEQ = 18
+REG_OUT_FASE = 19
+
+CMD_PICK = 1
+CMD_MOVEJ = 2
+CMD_EXIT = 3
+
+FASE_LISTA = 0
+FASE_APROXIMACION = 1
+FASE_DESCENSO = 2
+FASE_PRESION = 3
+FASE_SUBIDA = 4
+FASE_DEPOSITO = 5
+FASE_SOLTAR = 6
+FASE_MOVIMIENTO = 7
+FASE_OK = 10
+FASE_SIN_CONTACTO = 11
+
+NOMBRES_FASES = {FASE_LISTA: "lista", FASE_APROXIMACION: "aproximación", FASE_DESCENSO: "descenso",
+                 FASE_PRESION: "presión", FASE_SUBIDA: "subida", FASE_DEPOSITO: "depósito",
+                 FASE_SOLTAR: "soltar", FASE_MOVIMIENTO: "movimiento", FASE_OK: "terminada",
+                 FASE_SIN_CONTACTO: "sin contacto"}
+
+ROUTINE_NAME = "recyclex_pick"
+SECONDARY_PORT = 30002
+
+SCRIPT_TEMPLATE = """def {name}():
+  def tabla(i):
+{tabla}
+    return {primera}
+  end
+  def fase(f):
+    write_output_integer_register({out_fase}, f)
+  end
+  ultimo = read_input_integer_register({seq})
+  write_output_integer_register({out_seq}, ultimo)
+  fase({f_lista})
+  textmsg("{name}: rutina cargada")
+  while True:
+    seq = read_input_integer_register({seq})
+    if seq != ultimo:
+      ultimo = seq
+      cmd = read_input_integer_register({cmd})
+      arg = read_input_integer_register({arg})
+      if cmd == {cmd_exit}:
+        break
+      elif cmd == {cmd_movej}:
+        fase({f_mov})
+        movej(tabla(arg), a={joint_accel}, v={joint_speed})
+        fase({f_ok})
+      elif cmd == {cmd_pick}:
+        fase({f_aprox})
+        aprox = get_forward_kin(tabla({approach}))
+        objetivo = p[read_input_float_register({x}), read_input_float_register({y}), {z}, aprox[3], aprox[4], aprox[5]]
+        if read_input_integer_register({via}) == 1:
+          movej(tabla({approach}), a={joint_accel}, v={joint_speed}, r={blend})
+        end
+        movel(objetivo, a={pick_accel}, v={pick_speed})
+        fase({f_desc})
+        contacto = False
+        t_contacto = 0.0
+        while not contacto and t_contacto < {max_contact_time}:
+          speedl([0, 0, -{contact_speed}, 0, 0, 0], {contact_accel}, get_steptime())
+          if tool_contact(direction=[0, 0, -1, 0, 0, 0]) > 0:
+            contacto = True
+          end
+          t_contacto = t_contacto + get_steptime()
+        end
+        stopl({contact_accel})
+        if contacto:
+          set_standard_digital_out({pin}, True)
+          fase({f_pres})
+          force_mode(get_actual_tcp_pose(), [0, 0, 1, 0, 0, 0], [0, 0, {force}, 0, 0, 0], 2, [0.1, 0.1, 0.05, 0.05, 0.05, 0.05])
+          sleep({press_time})
+          end_force_mode()
+          fase({f_sub})
+          actual = get_actual_tcp_pose()
+          movel(p[actual[0], actual[1], {z}, actual[3], actual[4], actual[5]], a={lift_accel}, v={lift_speed}, r={blend})
+          fase({f_dep})
+          movej(tabla(arg), a={joint_accel}, v={joint_speed})
+          fase({f_soltar})
+          set_standard_digital_out({pin}, False)
+          sleep({release_time})
+          fase({f_ok})
+        else:
+          fase({f_sub})
+          actual = get_actual_tcp_pose()
+          movel(p[actual[0], actual[1], {z}, actual[3], actual[4], actual[5]], a={lift_accel}, v={lift_speed})
+          fase({f_sin})
+        end
+      end
+      write_output_integer_register({out_seq}, ultimo)
+    end
+    sync()
+  end
+  fase({f_lista})
+end
+"""
+
+
+def generar_script(joint_table, approach_index, z, digital_output_pin=4, joint_speed=3.0, joint_accel=8.0,
+                   pick_speed=0.25, pick_accel=0.35, lift_speed=0.5, lift_accel=0.5, contact_speed=0.1,
+                   contact_accel=0.5, max_contact_time=3.0, force=15.0, press_time=0.75, release_time=0.5,
+                   blend=0.02):
+    """
+    URScript de la rutina. joint_table: lista de posiciones articulares (aproximación, captura,
+    depósitos...); approach_index: la posición desde la que se baja a los tapones (su orientación
+    es la de la recogida). Los valores por defecto son los de main.py / RobotController.
+    """
+    fmt = lambda q: "[" + ", ".join(f"{v:.10f}" for v in q) + "]"
+    tabla = "\n".join(f"    {'if' if i == 0 else 'elif'} i == {i}:\n      return {fmt(q)}"
+                      for i, q in enumerate(joint_table)) + "\n    end"
+    return SCRIPT_TEMPLATE.format(
+        name=ROUTINE_NAME, tabla=tabla, primera=fmt(joint_table[0]), approach=approach_index,
+        seq=REG_SEQ, cmd=REG_CMD, arg=REG_ARG, via=REG_VIA_APPROACH, x=REG_X, y=REG_Y,
+        out_seq=REG_OUT_SEQ, out_fase=REG_OUT_FASE, cmd_exit=CMD_EXIT, cmd_movej=CMD_MOVEJ, cmd_pick=CMD_PICK,
+        f_lista=FASE_LISTA, f_aprox=FASE_APROXIMACION, f_desc=FASE_DESCENSO, f_pres=FASE_PRESION,
+        f_sub=FASE_SUBIDA, f_dep=FASE_DEPOSITO, f_soltar=FASE_SOLTAR, f_mov=FASE_MOVIMIENTO,
+        f_ok=FASE_OK, f_sin=FASE_SIN_CONTACTO, z=z, pin=digital_output_pin,
+        joint_speed=joint_speed, joint_accel=joint_accel, pick_speed=pick_speed, pick_accel=pick_accel,
+        lift_speed=lift_speed, lift_accel=lift_accel, contact_speed=contact_speed, contact_accel=contact_accel,
+        max_contact_time=max_contact_time, force=force, press_time=press_time, release_time=release_time,
+        blend=blend)
+
+
+def enviar_puerto_secundario(robot_ip, script, port=SECONDARY_PORT, timeout=2.0):
+    """Envía un programa URScript a la interfaz secundaria del controlador sin esperar a que termine."""
+    with socket.create_connection((robot_ip, port), timeout=timeout) as conexion:
+        conexion.sendall((script + "\n").encode("utf-8"))
+
+
+class RutinaRecogida:
+    def __init__(self, con_ctrl, con_recv, con_io, enviar_programa, timeout=30.0, poll=0.01, timeout_carga=5.0):
+        """
+        con_ctrl / con_recv / con_io: Interfaces RTDE (las de RobotController o las de fakeController.py).
+        enviar_programa: función(script) que sube el programa sin bloquear (enviar_puerto_secundario).
+        timeout: Espera máxima por comando (s). poll: Periodo de lectura de los registros de salida.
+        timeout_carga: Espera máxima (s) a que el programa arranque tras enviarlo.
+        """
+        self.con_ctrl = con_ctrl
+        self.con_recv = con_recv
+        self.con_io = con_io
+        self.enviar_programa = enviar_programa
+        self.timeout_carga = timeout_carga
+        self.timeout = timeout
+        self.poll = poll
+        self.nombres = {}
+        self.activa = False
+        self._seq = 0
+
+    def cargar(self, joint_targets: dict, approach_name: str, z: float, **params):
+        """
+        Sube la rutina al controlador. joint_targets: {nombre: articulaciones} (aproximación, captura,
+        depósitos...). params: los de generar_script (velocidades, fuerza, tiempos, pin...).
+        """
+        self.nombres = {nombre: i for i, nombre in enumerate(joint_targets)}
+        script = generar_script(list(joint_targets.values()), self.nombres[approach_name], z, **params)
+        # Secuencia nueva: el script no ve un comando al arrancar y, al copiarla a la salida, confirma la carga
+        self._seq = self.con_recv.getOutputIntRegister(REG_OUT_SEQ) + 1
+        self.con_io.setInputIntRegister(REG_SEQ, self._seq)
+        self.con_ctrl.stopScript() # El programa enviado sustituye al script de control de ur_rtde
+        self.enviar_programa(script)
+        t0 = time.perf_counter()
+        while self.con_recv.getOutputIntRegister(REG_OUT_SEQ) != self._seq:
+            if time.perf_counter() - t0 > self.timeout_carga:
+                self.con_ctrl.reuploadScript()
+                raise RuntimeError("El controlador no arrancó la rutina de recogida.")
+            time.sleep(self.poll)
+        self.activa = True
+        print(f"INFO: Rutina de recogida cargada en el controlador ({len(self.nombres)} posiciones).")
+
+    def _enviar(self, cmd, arg=0, x=0.0, y=0.0, via_approach=False, progreso=None):
+        """Escribe un comando en los registros y espera a que el script lo termine. Devuelve la fase final."""
+        if not self.activa:
+            raise RuntimeError("La rutina de recogida no está cargada.")
+        self.con_io.setInputDoubleRegister(REG_X, x)
+        self.con_io.setInputDoubleRegister(REG_Y, y)
+        self.con_io.setInputIntRegister(REG_CMD, cmd)
+        self.con_io.setInputIntRegister(REG_ARG, arg)
+        self.con_io.setInputIntRegister(REG_VIA_APPROACH, int(via_approach))
+        self._seq += 1
+        self.con_io.setInputIntRegister(REG_SEQ, self._seq) # Disparo: el resto ya está escrito
+
+        t0 = time.perf_counter()
+        fase_anterior = None
+        while True:
+            fase = self.con_recv.getOutputIntRegister(REG_OUT_FASE)
+            if fase != fase_anterior:
+                if progreso is not None and fase not in (FASE_OK, FASE_SIN_CONTACTO, FASE_LISTA):
+                    progreso(NOMBRES_FASES.get(fase, str(fase)))
+                fase_anterior = fase
+            if self.con_recv.getOutputIntRegister(REG_OUT_SEQ) == self._seq:
+                fase = self.con_recv.getOutputIntRegister(REG_OUT_FASE)
+                print(f"INFO: Comando {cmd} de la rutina terminado en {(time.perf_counter() - t0) * 1000:.0f} ms "
+                      f"({NOMBRES_FASES.get(fase, fase)}).")
+                return fase
+            if time.perf_counter() - t0 > self.timeout:
+                raise RuntimeError(f"La rutina de recogida no terminó el comando {cmd} (fase {fase_anterior}).")
+            time.sleep(self.poll)
+
+    def recoger(self, xyz, deposit_name, via_approach=False, progreso=None) -> bool:
+        """Recoge el tapón en xyz (solo se usa la XY) y lo suelta en el depósito. False si no hubo contacto."""
+        fase = self._enviar(CMD_PICK, self.nombres[deposit_name], xyz[0], xyz[1], via_approach, progreso)
+        return fase == FASE_OK
+
+    def mover(self, nombre, progreso=None):
+        """moveJ a una posición de la tabla (p. ej. la de captura)."""
+        self._enviar(CMD_MOVEJ, self.nombres[nombre], progreso=progreso)
+
+    def detener(self):
+        """Termina el bucle del script y vuelve a subir el script de control de ur_rtde."""
+        if not self.activa:
+            return
+        self.activa = False
+        self.con_io.setInputIntRegister(REG_CMD, CMD_EXIT)
+        self._seq += 1
+        self.con_io.setInputIntRegister(REG_SEQ, self._seq)
+        time.sleep(0.1)
+        self.con_ctrl.reuploadScript()
+        print("INFO: Rutina de recogida detenida; script de control restaurado.")
@@ -0,0 +1,151 @@
+# quantizeModel.py
+"""
+Cuantización INT8 post-entrenamiento del detector de tapones (train3) y comparativa con FP32.
+
+1. Exporta best.pt a ONNX FP32 (una sola vez, ver inferenceBackends.exportar_modelo).
+2. Calibra y cuantiza a INT8 (ONNX Runtime, formato QDQ) con frames reales de la célula.
+3. Evalúa ambas variantes con el mismo motor nativo sobre un conjunto etiquetado (formato YOLO):
+   precisión, recall, mAP50, mAP50-95, matriz de confusión por clase y percentiles de latencia.
+4. Escribe REPORT_DIR/results.csv con las mismas columnas que train3/results.csv (la columna
+   "epoch" lleva el nombre de la variante) más las columnas de latencia, y una matriz de
+   confusión CSV por variante.
+
+El modelo INT8 se carga con TaponesDetector(INT8_MODEL_PATH, backend="onnxruntime").
+"""
+import os
+import csv
+import glob
+import time
+import cv2
+
+from inferenceBackends import exportar_modelo, letterbox, OnnxRuntimeBackend
+from detectionMetrics import EvaluadorDetecciones, cargar_etiquetas_yolo, percentiles_latencia
+
+MODEL_PATH = "train3/weights/best.pt"
+INT8_MODEL_PATH = "train3/weights/best_int8.onnx"
+CALIB_IMAGES_GLOB = "captures/*.jpg"              # Frames representativos de la bandeja
+VAL_IMAGES_GLOB = "dataset/valid/images/*.jpg"    # Validación etiquetada (labels/*.txt)
+MAX_CALIB_IMAGES = 200
+IMGSZ = 640
+CLASS_NAMES = ["Amarillo", "Azul", "Blanco", "Otro", "Rojo", "Verde"]
+REPORT_DIR = "quant_report"
+TRAIN_RESULTS_CSV = "train3/results.csv"          # Se copian sus columnas
+LATENCY_COLUMNS = ["latency/p50_ms", "latency/p90_ms", "latency/p99_ms"]
+
+
+class FramesCalibracion:
+    """CalibrationDataReader de ONNX Runtime: entrega los frames con el mismo preprocesado que en producción."""
+
+    def __init__(self, image_paths, input_name, imgsz=IMGSZ):
+        self.image_paths = list(image_paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.image_paths)
+
+    def get_next(self):
+        for path in self._iter:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            padded, _, _ = letterbox(image, self.imgsz)
+            return {self.input_name: cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.image_paths)
+
+
+def cuantizar_int8(fp32_path, calib_images, int8_path):
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType
+
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    reader = FramesCalibracion(calib_images, input_name)
+    print(f"INFO: Calibrando INT8 con {len(calib_images)} frames...")
+    quantize_static(fp32_path, int8_path, reader,
+                    quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    per_channel=True)
+    return int8_path
+
+
+def evaluar_variante(model_path, val_images):
+    """Métricas (conf 0.001, como la validación de ultralytics) y latencia en el punto de trabajo (conf 0.25)."""
+    backend_eval = OnnxRuntimeBackend(model_path, imgsz=IMGSZ, conf_threshold=0.001)
+    backend_prod = OnnxRuntimeBackend(model_path, imgsz=IMGSZ)
+    evaluador = EvaluadorDetecciones(len(CLASS_NAMES))
+    latencias = []
+
+    for path in val_images:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        gt_boxes, gt_cls = cargar_etiquetas_yolo(path, image.shape)
+        pred = backend_eval.predict(image)
+        evaluador.agregar(pred.xyxy, pred.conf, pred.cls, gt_boxes, gt_cls)
+
+        t0 = time.perf_counter()
+        backend_prod.predict(image)
+        latencias.append(time.perf_counter() - t0)
+
+    return evaluador.resultados(), evaluador.confusion, percentiles_latencia(latencias)
+
+
+def escribir_informe(filas):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    with open(TRAIN_RESULTS_CSV, "r") as f:
+        columnas = next(csv.reader(f)) + LATENCY_COLUMNS
+
+    with open(os.path.join(REPORT_DIR, "results.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columnas)
+        writer.writeheader()
+        for variante, metricas, latencia in filas:
+            fila = {col: "" for col in columnas}
+            fila.update({
+                "epoch": variante,
+                "metrics/precision(B)": f"{metricas['precision']:.5f}",
+                "metrics/recall(B)": f"{metricas['recall']:.5f}",
+                "metrics/mAP50(B)": f"{metricas['mAP50']:.5f}",
+                "metrics/mAP50-95(B)": f"{metricas['mAP50-95']:.5f}",
+                "latency/p50_ms": f"{latencia['p50']:.3f}",
+                "latency/p90_ms": f"{latencia['p90']:.3f}",
+                "latency/p99_ms": f"{latencia['p99']:.3f}",
+            })
+            writer.writerow(fila)
+
+
+def escribir_confusion(variante, confusion):
+    etiquetas = CLASS_NAMES + ["fondo"]
+    with open(os.path.join(REPORT_DIR, f"confusion_{variante}.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["real\\predicha"] + etiquetas)
+        for etiqueta, fila in zip(etiquetas, confusion):
+            writer.writerow([etiqueta] + fila.tolist())
+
+
+if __name__ == "__main__":
+    calib_images = sorted(glob.glob(CALIB_IMAGES_GLOB))[:MAX_CALIB_IMAGES]
+    val_images = sorted(glob.glob(VAL_IMAGES_GLOB))
+    if not calib_images or not val_images:
+        raise SystemExit(f"ERROR: Faltan imágenes de calibración ('{CALIB_IMAGES_GLOB}') o de validación ('{VAL_IMAGES_GLOB}').")
+
+    fp32_path = exportar_modelo(MODEL_PATH, "onnx", IMGSZ)
+    int8_path = cuantizar_int8(fp32_path, calib_images, INT8_MODEL_PATH)
+
+    filas = []
+    for variante, path in (("fp32", fp32_path), ("int8", int8_path)):
+        metricas, confusion, latencia = evaluar_variante(path, val_images)
+        filas.append((variante, metricas, latencia))
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        escribir_confusion(variante, confusion)
+        print(f"{variante}: mAP50={metricas['mAP50']:.4f} mAP50-95={metricas['mAP50-95']:.4f} "
+              f"P={metricas['precision']:.4f} R={metricas['recall']:.4f} | "
+              f"latencia p50={latencia['p50']:.1f} ms p90={latencia['p90']:.1f} ms p99={latencia['p99']:.1f} ms")
+        for c, ap in metricas["ap50_por_clase"].items():
+            print(f"    AP50 {CLASS_NAMES[c]}: {ap:.4f}")
+    escribir_informe(filas)
+
+    (_, m32, l32), (_, m8, l8) = filas
+    print(f"--- INT8 vs FP32: ΔmAP50-95={m8['mAP50-95'] - m32['mAP50-95']:+.4f}, "
+          f"speedup p50 x{l32['p50'] / l8['p50']:.2f}. Informe en {REPORT_DIR}/ ---")
@@ -2,6 +2,96 @@ import rtde_control
 import rtde_receive
 import rtde_io
 import time
+from pickRoutine import RutinaRecogida, enviar_puerto_secundario
+from robotPositions import DEFAULT_CALIBRATION, pixel_a_robot
+
+
+class MotionHandle:
+    """
+    Movimiento asíncrono en curso (move_joint_async / move_linear_async / move_path_async).
+    El hilo que lo lanza puede trabajar mientras el brazo se mueve y después llamar a wait().
+    """
+
+    def __init__(self, robot, kind: str, target: list, joint_space: bool, n_waypoints: int = 1):
+        self.robot = robot
+        self.kind = kind
+        self.target = target
+        self.joint_space = joint_space
+        self.n_waypoints = n_waypoints
+        self.t_start = time.perf_counter()
+        self.cancelled = False
+        self.result = None
+        self._started = False
+        self._finished = False
+        self._initial_error = self._error()
+
+    def _error(self) -> float:
+        if self.joint_space:
+            return max(abs(a - b) for a, b in zip(self.robot.con_recv.getActualQ(), self.target))
+        actual = self.robot.con_recv.getActualTCPPose()
+        return sum((a - b) ** 2 for a, b in zip(actual[:3], self.target[:3])) ** 0.5
+
+    def done(self) -> bool:
+        """
+        True cuando el controlador ya no ejecuta el movimiento (sin esperar al asentamiento).
+        getAsyncOperationProgress() vale -1 también antes de que el movimiento arranque: solo se da por
+        terminado tras verlo en marcha (>= 0), o si no llega a arrancar en robot.async_start_timeout s.
+        """
+        if self._finished:
+            return True
+        en_marcha = self.robot.con_ctrl.getAsyncOperationProgress() >= 0
+        if not self._started:
+            if en_marcha:
+                self._started = True
+            elif time.perf_counter() - self.t_start > self.robot.async_start_timeout:
+                print(f"AVISO: {self.kind} asíncrono sin arrancar tras {self.robot.async_start_timeout} s.")
+                self._finished = True
+        elif not en_marcha:
+            self._finished = True
+        return self._finished
+
+    def progress(self) -> float:
+        """Fracción completada (0-1): punto actual en paths, distancia al objetivo en movimientos simples."""
+        if self.done():
+            return 1.0
+        if self.n_waypoints > 1:
+            return min(max(self.robot.con_ctrl.getAsyncOperationProgress(), 0) / self.n_waypoints, 1.0)
+        if self._initial_error <= 0:
+            return 1.0
+        return max(0.0, 1.0 - self._error() / self._initial_error)
+
+    def wait(self, timeout: float = None) -> list:
+        """Espera al final del movimiento y a que el robot se asiente. Devuelve la pose TCP final."""
+        if self.result is not None:
+            return self.result
+        t_wait = time.perf_counter()
+        while not self.done():
+            if timeout is not None and time.perf_counter() - t_wait > timeout:
+                raise RuntimeError(f"{self.kind} asíncrono sin terminar tras {timeout} s.")
+            time.sleep(self.robot.settle_poll)
+        if not self.cancelled:
+            self.robot.wait_until_settled(self.target, self.joint_space)
+        solape = t_wait - self.t_start
+        if solape > 0.01: # Solo si se hizo trabajo mientras el brazo se movía
+            print(f"INFO: {self.kind} asíncrono en {(time.perf_counter() - self.t_start) * 1000:.0f} ms, "
+                  f"{solape * 1000:.0f} ms solapados con otro trabajo.")
+        self.result = self.robot.con_recv.getActualTCPPose()
+        if self.robot._pending_motion is self:
+            self.robot._pending_motion = None
+        return self.result
+
+    def cancel(self, decel: float = None):
+        """Detiene el movimiento (stopJ/stopL con la deceleración dada)."""
+        if self.done():
+            return
+        completado = self.progress()
+        if self.joint_space:
+            self.robot.con_ctrl.stopJ(decel or 2.0)
+        else:
+            self.robot.con_ctrl.stopL(decel or 10.0)
+        self.cancelled = True
+        self._finished = True
+        print(f"AVISO: {self.kind} cancelado al {completado * 100:.0f} %.")
 
 class RobotController:
     """
@@ -15,40 +105,51 @@ class RobotController:
     def __init__(self,
                  robot_ip: str,
                  digital_output_pin: int = 4,
-                 wait_time: float = 0.5,
-                 calibration: dict = None):
+                 wait_time: float = 0.0,
+                 calibration: dict = None,
+                 settle_tolerance_rad: float = 1e-3,
+                 settle_tolerance_m: float = 5e-4,
+                 settle_velocity: float = 2e-3,
+                 settle_timeout: float = 2.0,
+                 settle_poll: float = 0.004,
+                 async_start_timeout: float = 0.5):
         # Parámetros conexión e IO
         self.robot_ip = robot_ip
         self.digital_output_pin = digital_output_pin
+        # Fin de movimiento: tras cada moveJ/moveL se espera a que el robot esté en el objetivo
+        # (error articular <= settle_tolerance_rad, o de posición TCP <= settle_tolerance_m) y parado
+        # (velocidades <= settle_velocity), leyendo el estado RTDE cada settle_poll s y como mucho
+        # settle_timeout s. wait_time es una espera mínima opcional (antes, la espera fija).
         self.wait_time = wait_time
+        self.settle_tolerance_rad = settle_tolerance_rad
+        self.settle_tolerance_m = settle_tolerance_m
+        self.settle_velocity = settle_velocity
+        self.settle_timeout = settle_timeout
+        self.settle_poll = settle_poll
+        # Espera máxima (s) a que un movimiento asíncrono aparezca en marcha (MotionHandle.done)
+        self.async_start_timeout = async_start_timeout
+        self.settle_times = {"moveJ": [], "moveL": []}
 
         # Calibración píxeles→mundo
-        default_calib = {
-            "coef_x": [
-                -1.1385910449376894e-05,
-                -0.00043633005243403164
-            ],
-            "intercept_x": 0.20708052106818975,
-            "coef_y": [
-                -0.00043821300964726857,
-                6.478666337278747e-06
-            ],
-            "intercept_y": -0.18534086937328742,
-            "z_fija": 0.24130077681581635
-        }
-
-        self.calibration = calibration or default_calib
+        self.calibration = calibration or DEFAULT_CALIBRATION
 
         # Interfaces RTDE
         self.con_ctrl = None
         self.con_recv = None
         self.con_io = None
+        # Rutina de recogida en el controlador (upload_pick_routine); None = recogida desde Python
+        self.pick_routine = None
+        # Envío de programas URScript sin bloquear (interfaz secundaria); fakeController.py lo sustituye
+        self.script_sender = None
+        # Último movimiento asíncrono: cualquier otro comando de control espera antes a que termine
+        self._pending_motion = None
 
     def connect(self):
         """Establecer conexión RTDE con el robot."""
         self.con_ctrl = rtde_control.RTDEControlInterface(self.robot_ip)
         self.con_recv = rtde_receive.RTDEReceiveInterface(self.robot_ip)
         self.con_io   = rtde_io.RTDEIOInterface(self.robot_ip)
+        self.script_sender = lambda script: enviar_puerto_secundario(self.robot_ip, script)
 
     def disconnect(self):
         """Cerrar conexiones RTDE."""
@@ -61,26 +162,120 @@ class RobotController:
 
     def pixel_to_robot(self, px: float, py: float) -> list:
         """Convierte (px,py) en píxeles a [X,Y,Z] en metros."""
-        cx, cy = self.calibration["coef_x"], self.calibration["coef_y"]
-        x = cx[0]*px + cx[1]*py + self.calibration["intercept_x"]
-        y = cy[0]*px + cy[1]*py + self.calibration["intercept_y"]
-        z = self.calibration["z_fija"]
-        return [x, y, z]
+        return pixel_a_robot(self.calibration, px, py)
+
+    def wait_until_settled(self, target: list, joint_space: bool) -> float:
+        """
+        Espera a que el robot llegue a `target` (articulaciones o pose TCP) y esté parado.
+        Devuelve el tiempo de asentamiento en segundos y lo registra en settle_times.
+        """
+        t0 = time.perf_counter()
+        if self.wait_time > 0:
+            time.sleep(self.wait_time)
+        limite = t0 + self.settle_timeout
+        while True:
+            if joint_space:
+                actual, velocidad = self.con_recv.getActualQ(), self.con_recv.getActualQd()
+                error = max(abs(a - b) for a, b in zip(actual, target))
+                tolerancia = self.settle_tolerance_rad
+            else:
+                actual, velocidad = self.con_recv.getActualTCPPose(), self.con_recv.getActualTCPSpeed()
+                error = sum((a - b) ** 2 for a, b in zip(actual[:3], target[:3])) ** 0.5
+                tolerancia = self.settle_tolerance_m
+            if error <= tolerancia and max(abs(v) for v in velocidad) <= self.settle_velocity:
+                break
+            if time.perf_counter() >= limite:
+                print(f"AVISO: El robot no se asentó en {self.settle_timeout} s (error {error:.2e}).")
+                break
+            time.sleep(self.settle_poll)
+
+        tipo = "moveJ" if joint_space else "moveL"
+        settle_time = time.perf_counter() - t0
+        self.settle_times[tipo].append(settle_time)
+        print(f"INFO: {tipo} asentado en {settle_time * 1000:.0f} ms (error {error:.2e}).")
+        return settle_time
+
+    def settle_summary(self) -> dict:
+        """Media y máximo (ms) del tiempo de asentamiento por tipo de movimiento, para ajustar tolerancias."""
+        return {tipo: {"n": len(t), "media_ms": 1000 * sum(t) / len(t), "max_ms": 1000 * max(t)}
+                for tipo, t in self.settle_times.items() if t}
+
+    def _wait_pending(self):
+        if self._pending_motion is not None:
+            self._pending_motion.wait()
+
+    def move_joint_async(self, joints: list, speed: float, accel: float) -> MotionHandle:
+        """moveJ sin bloquear: devuelve un MotionHandle (wait/cancel/progress)."""
+        self._wait_pending()
+        self.con_ctrl.moveJ(joints, speed, accel, True)
+        self._pending_motion = MotionHandle(self, "moveJ", joints, joint_space=True)
+        return self._pending_motion
+
+    def move_linear_async(self, pose: list, speed: float, accel: float) -> MotionHandle:
+        """moveL sin bloquear: devuelve un MotionHandle (wait/cancel/progress)."""
+        self._wait_pending()
+        self.con_ctrl.moveL(pose, speed, accel, True)
+        self._pending_motion = MotionHandle(self, "moveL", pose, joint_space=False)
+        return self._pending_motion
 
     def move_joint(self, joints: list, speed: float, accel: float) -> list:
         """Movimiento en espacio articular (moveJ)."""
-        self.con_ctrl.moveJ(joints, speed, accel)
-        time.sleep(self.wait_time)
-        return self.con_recv.getActualTCPPose()
+        return self.move_joint_async(joints, speed, accel).wait()
 
     def move_linear(self, pose: list, speed: float, accel: float) -> list:
         """Movimiento lineal del TCP (moveL)."""
-        self.con_ctrl.moveL(pose, speed, accel)
-        time.sleep(self.wait_time)
-        return self.con_recv.getActualTCPPose()
+        return self.move_linear_async(pose, speed, accel).wait()
+
+    def move_path(self, waypoints: list) -> list:
+        """
+        Recorre varios puntos en una sola llamada (movePath de ur_rtde), sin parar en los intermedios.
+        waypoints: [(tipo, objetivo, speed, accel, blend)] con tipo "J" (objetivo articular, moveJ) o
+                   "L" (pose TCP, moveL). blend: radio de suavizado en ese punto (m); 0 = parada exacta.
+                   El último punto siempre es parada exacta.
+        """
+        return self.move_path_async(waypoints).wait()
+
+    def move_path_async(self, waypoints: list) -> MotionHandle:
+        """move_path sin bloquear: devuelve un MotionHandle (wait/cancel/progress)."""
+        self._wait_pending()
+        waypoints = self._limitar_blends(waypoints)
+        path = rtde_control.Path()
+        for tipo, objetivo, speed, accel, blend in waypoints:
+            if tipo == "J":
+                entry = rtde_control.PathEntry(rtde_control.PathEntry.MoveJ, rtde_control.PathEntry.PositionJoints,
+                                               list(objetivo) + [speed, accel, blend])
+            else:
+                entry = rtde_control.PathEntry(rtde_control.PathEntry.MoveL, rtde_control.PathEntry.PositionTcpPose,
+                                               list(objetivo) + [speed, accel, blend])
+            path.addEntry(entry)
+        self.con_ctrl.movePath(path, True)
+        tipo, objetivo = waypoints[-1][:2]
+        self._pending_motion = MotionHandle(self, "path", objetivo, joint_space=(tipo == "J"),
+                                            n_waypoints=len(waypoints))
+        return self._pending_motion
+
+    def _limitar_blends(self, waypoints: list) -> list:
+        """
+        El controlador rechaza radios que se solapan: entre dos moveL consecutivos el radio se limita
+        a la mitad del tramo más corto. (Con objetivos articulares no se conoce la distancia cartesiana.)
+        """
+        tramo = lambda a, b: sum((x - y) ** 2 for x, y in zip(a[:3], b[:3])) ** 0.5
+        limitados = []
+        anterior = self.con_recv.getActualTCPPose()[:3]
+        for i, (tipo, objetivo, speed, accel, blend) in enumerate(waypoints):
+            if i == len(waypoints) - 1:
+                blend = 0.0
+            elif tipo == "L" and waypoints[i + 1][0] == "L" and anterior is not None:
+                maximo = 0.5 * min(tramo(anterior, objetivo), tramo(objetivo, waypoints[i + 1][1]))
+                if blend > maximo:
+                    print(f"AVISO: Radio de blend {blend} m reducido a {maximo:.3f} m en el punto {i}.")
+                    blend = maximo
+            limitados.append((tipo, objetivo, speed, accel, blend))
+            anterior = objetivo[:3] if tipo == "L" else None
+        return limitados
 
-    def initial_moves(self):
-        """Ejecuta la secuencia articular inicial del código original."""
+    def initial_moves(self, blend: float = 0.05):
+        """Ejecuta la secuencia articular inicial del código original (sin parar en los puntos intermedios)."""
         q_list = [
             [1.4567713737487793, -1.6137963734068812, 0.03687411943544561,
              -1.5324381862631817,  0.12954740226268768, -0.4755452314959925],
@@ -89,19 +284,47 @@ class RobotController:
             [1.3783674240112305, -1.7762352428831996, 1.3978703657733362,
              -1.183793382053711, -1.5224693457232874, -0.5920613447772425]
         ]
-        for q in q_list:
-            self.move_joint(q, speed=1.0, accel=1.4)
+        self.move_path([("J", q, 1.0, 1.4, blend) for q in q_list])
+
+    def forward_kinematics(self, joints: list) -> list:
+        """Pose TCP de una configuración articular (cinemática directa del controlador)."""
+        self._wait_pending()
+        return list(self.con_ctrl.getForwardKinematics(list(joints)))
+
+    def pixel_pose(self, px: float, py: float, orientation_joints: list = None) -> list:
+        """
+        Pose TCP sobre el píxel (px,py) a la altura fija. Orientación: la actual o, si se da
+        orientation_joints, la de esa configuración (cinemática directa), para usarla en un path.
+        """
+        if orientation_joints is not None:
+            ori = self.forward_kinematics(orientation_joints)[3:6]
+        else:
+            ori = self.con_recv.getActualTCPPose()[3:6]
+        return self.pixel_to_robot(px, py) + list(ori)
 
     def move_to_pixel(self, px: float, py: float, speed: float=0.2, accel: float=0.3) -> list:
         """Convierte píxeles y mueve linealmente al objetivo."""
-        xyz = self.pixel_to_robot(px, py)
-        ori = self.con_recv.getActualTCPPose()[3:6]
-        target = xyz + ori
-        return self.move_linear(target, speed, accel)
+        return self.move_linear(self.pixel_pose(px, py), speed, accel)
+
+    def prepick_joints(self, xyz: list, orientation: list, q_near: list = None):
+        """
+        Articulaciones (IK del controlador) para el TCP en xyz con la orientación dada, próximas a
+        q_near. Devuelve None si no hay solución.
+        """
+        if self.pick_routine is not None and self.pick_routine.activa:
+            return None # El script de control de ur_rtde no está cargado
+        self._wait_pending()
+        try:
+            q = self.con_ctrl.getInverseKinematics(list(xyz) + list(orientation), q_near or [])
+        except (RuntimeError, ValueError, TypeError) as e: # Errores de ur_rtde (pybind11) y argumentos no válidos
+            print(f"AVISO: Sin cinemática inversa para {xyz}: {e}")
+            return None
+        return list(q) if q else None
 
     def descend_until_contact(self, speed_down: list=None) -> bool:
         """Desciende hasta contacto (moveUntilContact) y activa IO."""
         sd = speed_down or [0,0,-0.1,0,0,0]
+        self._wait_pending()
         contact = self.con_ctrl.moveUntilContact(sd)
         if contact:
             self.con_io.setStandardDigitalOut(self.digital_output_pin, True)
@@ -111,6 +334,7 @@ class RobotController:
         """
         Desciende aplicando fuerza controlada con forceMode, luego activa la salida digital.
         """
+        self._wait_pending()
         task_frame = self.con_recv.getActualTCPPose()
         selection_vector = [0, 0, 1, 0, 0, 0]  # solo fuerza Z
         wrench = [0, 0, force, 0, 0, 0]  # fuerza hacia abajo
@@ -127,11 +351,15 @@ class RobotController:
         return True
 
 
-    def retract(self, dz: float=0.1, speed: float=0.5, accel: float=0.5):
-        """Eleva el TCP en dz metros linealmente."""
+    def retract_pose(self) -> list:
+        """Pose actual elevada a la altura de trabajo (z_fija), para retract() o un path."""
         pose = self.con_recv.getActualTCPPose()
         pose[2] = 0.24130077681581635
-        self.move_linear(pose, speed, accel)
+        return pose
+
+    def retract(self, dz: float=0.1, speed: float=0.5, accel: float=0.5):
+        """Eleva el TCP en dz metros linealmente."""
+        self.move_linear(self.retract_pose(), speed, accel)
 
     def lateral_rotation(self, delta: float=3.14159, speed: float=1.0, accel: float=1.4):
         """Rota la primera junta en delta radianes."""
@@ -139,6 +367,35 @@ class RobotController:
         q[0] -= delta
         self.move_joint(q, speed, accel)
 
+    def upload_pick_routine(self, joint_targets: dict, approach_name: str, **params):
+        """
+        Sube la rutina de recogida URScript (pickRoutine.py) con las posiciones articulares
+        {nombre: q} (aproximación, captura, depósitos). A partir de aquí los movimientos se piden con
+        scripted_pick / scripted_move_joint hasta stop_pick_routine.
+        """
+        self._wait_pending()
+        self.pick_routine = RutinaRecogida(self.con_ctrl, self.con_recv, self.con_io, self.script_sender)
+        self.pick_routine.cargar(joint_targets, approach_name, self.calibration["z_fija"],
+                                 digital_output_pin=self.digital_output_pin, **params)
+
+    def scripted_pick(self, px: float, py: float, deposit_name: str, via_approach: bool = False, progress=None) -> bool:
+        """Recogida completa del tapón en (px,py) hasta soltarlo en deposit_name. False si no hubo contacto."""
+        return self.pick_routine.recoger(self.pixel_to_robot(px, py), deposit_name, via_approach, progress)
+
+    def scripted_move_joint(self, name: str) -> list:
+        """moveJ a una posición de la tabla de la rutina."""
+        self.pick_routine.mover(name)
+        return self.con_recv.getActualTCPPose()
+
+    def stop_pick_routine(self):
+        """Termina la rutina y restaura el script de control de ur_rtde."""
+        if self.pick_routine is not None:
+            self.pick_routine.detener()
+            self.pick_routine = None
+
     def stop(self):
         """Finaliza script RTDE."""
+        if self._pending_motion is not None:
+            self._pending_motion.cancel()
+            self._pending_motion = None
         self.con_ctrl.stopScript()
\ No newline at end of file
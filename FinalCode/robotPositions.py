@@ -0,0 +1,56 @@
+# robotPositions.py
+"""
+Posiciones articulares del puesto (reposo, captura, aproximación, depósitos) y calibración
+píxeles→robot por defecto. Sin dependencias de RTDE ni de la GUI: las usan main.py,
+robotControl.py y los benchmarks.
+"""
+
+# Posiciones del Robot (de tu último main.py)
+REST_POSITION_JOINTS = [1.4567713737487793, -1.6137963734068812, 0.03687411943544561,
+                        -1.5324381862631817,  0.12954740226268768, -0.4755452314959925]
+IMAGE_CAPTURE_POSITION_JOINTS = [1.3783482313156128, -1.7762123546996058, 1.3978703657733362,
+                                 -1.1838005644134064, -1.522461239491598, -0.5920336882220667]
+# Posición sobre la bandeja desde la que arranca cada recogida del plan tras un depósito (sin capturar).
+# Por defecto la de captura; puede sustituirse por una más cercana a la bandeja.
+PICK_APPROACH_JOINTS = IMAGE_CAPTURE_POSITION_JOINTS
+# Con FIXED_OVERHEAD_CAMERA (main.py): posición fuera de la vista de la cámara para capturar sin visión adelantada
+FIXED_CAMERA_PARK_JOINTS = REST_POSITION_JOINTS
+
+DEPOSIT_POSITIONS = {
+    "Amarillo": [-2.2998903433429163, -1.047537164097168, 0.8475335280047815, 
+                 -1.355234370832779, -1.549577538167135, -0.12971574464906865],
+    "Azul":     [-1.97978383699526, -1.2401059430888672, 1.1353901068316858, 
+                 -1.4570641231587906, -1.545737091694967, 0.19007229804992676],
+    "Blanco":   [-1.6519644896136683, -1.7792769871153773, 1.716369930897848, 
+                 -1.5064748388579865, -1.544976059590475, 0.5171940922737122],
+    "Otro":     [-1.6237872282611292, -1.1733880204013367, 1.0451181570636194, 
+                 -1.441781000500061, -1.5430405775653284, 0.5462017059326172],
+    "Rojo":     [-2.607405487691061, -1.623392721215719, 1.5750983397113245, 
+                 -1.5021473106792946, -1.5576460997210901, -0.4384530226336878],
+    "Verde":    [-2.2127097288714808, -1.8773662052550257, 1.7805584112750452, 
+                 -1.4597972196391602, -1.5507801214801233, -0.04370767274965459]
+}
+
+# Calibración píxeles→mundo por defecto (regresión lineal de la cámara en la posición de captura)
+DEFAULT_CALIBRATION = {
+    "coef_x": [
+        -1.1385910449376894e-05,
+        -0.00043633005243403164
+    ],
+    "intercept_x": 0.20708052106818975,
+    "coef_y": [
+        -0.00043821300964726857,
+        6.478666337278747e-06
+    ],
+    "intercept_y": -0.18534086937328742,
+    "z_fija": 0.24130077681581635
+}
+
+
+def pixel_a_robot(calibration: dict, px: float, py: float) -> list:
+    """Convierte (px,py) en píxeles a [X,Y,Z] en metros con la calibración dada."""
+    cx, cy = calibration["coef_x"], calibration["coef_y"]
+    x = cx[0]*px + cx[1]*py + calibration["intercept_x"]
+    y = cy[0]*px + cy[1]*py + calibration["intercept_y"]
+    z = calibration["z_fija"]
+    return [x, y, z]
@@ -0,0 +1,193 @@
+# sceneCache.py
+"""
+Detección de cambios de escena entre capturas consecutivas de la bandeja para no repetir la
+inferencia de YOLO sobre lo que no ha cambiado (p. ej. tras retirar un solo tapón o tras un
+contacto fallido).
+
+El frame se reduce (escala de grises, 1/DOWNSCALE) y se divide en una rejilla de teselas. Una
+tesela ha cambiado si su hash medio (aHash 8x8) difiere en más de HASH_THRESHOLD bits o si la
+fracción de píxeles con diferencia absoluta > DIFF_THRESHOLD supera CHANGED_FRACTION.
+  - Ninguna tesela cambiada: se reutilizan las detecciones anteriores sin inferir.
+  - Algunas: se re-infiere solo sobre cada zona cambiada (ampliada un margen para no cortar
+    tapones) y se conservan las detecciones en caché que no tocan esas zonas.
+  - Demasiadas, motor de tamaño fijo o MAX_REUSES ciclos sin refrescar: inferencia completa.
+"""
+import time
+import cv2
+import numpy as np
+
+from inferenceBackends import ResultadoNativo
+
+
+class CacheEscena:
+    def __init__(self, detector, grid=(4, 4), downscale=4, diff_threshold=25, changed_fraction=0.01,
+                 hash_threshold=6, margin=64, max_partial_area=0.5, max_reuses=10):
+        """
+        detector: TaponesDetector que hace la inferencia.
+        grid: (filas, columnas) de teselas.
+        margin: Píxeles que se amplía cada zona cambiada (>= tamaño de un tapón).
+        max_partial_area: Fracción del frame a partir de la cual se re-infiere completo.
+        max_reuses: Ciclos seguidos sin inferencia completa antes de forzarla.
+        """
+        self.detector = detector
+        self.grid = grid
+        self.downscale = downscale
+        self.diff_threshold = diff_threshold
+        self.changed_fraction = changed_fraction
+        self.hash_threshold = hash_threshold
+        self.margin = margin
+        self.max_partial_area = max_partial_area
+        self.max_reuses = max_reuses
+        self.stats = {"ciclos": 0, "omitidas": 0, "parciales": 0, "completas": 0,
+                      "teselas_reutilizadas": 0, "teselas_totales": 0, "ahorro_s": 0.0}
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Olvida el frame y las detecciones de referencia (la siguiente llamada infiere completo)."""
+        self._small = None
+        self._hashes = None
+        self._detections = []
+        self._reusos = 0
+        self._t_completa = None
+
+    def _firma(self, imagen):
+        """Frame reducido y suavizado + aHash de 64 bits por tesela (filas, columnas, 64)."""
+        gray = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY) if imagen.ndim == 3 else imagen
+        h, w = gray.shape[:2]
+        small = cv2.resize(gray, (max(1, w // self.downscale), max(1, h // self.downscale)),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (3, 3), 0)
+        hashes = np.zeros((self.grid[0], self.grid[1], 64), dtype=bool)
+        for r, c, (y0, y1, x0, x1) in self._teselas(small.shape):
+            bloque = cv2.resize(small[y0:y1, x0:x1], (8, 8), interpolation=cv2.INTER_AREA)
+            hashes[r, c] = (bloque > bloque.mean()).ravel()
+        return small, hashes
+
+    def _teselas(self, shape):
+        ys = np.linspace(0, shape[0], self.grid[0] + 1).astype(int)
+        xs = np.linspace(0, shape[1], self.grid[1] + 1).astype(int)
+        for r in range(self.grid[0]):
+            for c in range(self.grid[1]):
+                yield r, c, (ys[r], ys[r + 1], xs[c], xs[c + 1])
+
+    def teselas_cambiadas(self, small, hashes):
+        """Máscara booleana (filas, columnas) de teselas que han cambiado respecto a la referencia."""
+        diff = cv2.absdiff(small, self._small) > self.diff_threshold
+        cambiadas = (hashes != self._hashes).sum(axis=2) > self.hash_threshold
+        for r, c, (y0, y1, x0, x1) in self._teselas(small.shape):
+            if diff[y0:y1, x0:x1].mean() > self.changed_fraction:
+                cambiadas[r, c] = True
+        return cambiadas
+
+    def _zonas(self, cambiadas, shape):
+        """Rectángulos [x, y, w, h] (en píxeles del frame) que cubren cada grupo de teselas cambiadas."""
+        h, w = shape[:2]
+        ys = np.linspace(0, h, self.grid[0] + 1).astype(int)
+        xs = np.linspace(0, w, self.grid[1] + 1).astype(int)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(cambiadas.astype(np.uint8), connectivity=8)
+        zonas = []
+        for c0, r0, nc, nr, _ in stats[1:]:
+            zonas.append([int(xs[c0]), int(ys[r0]), int(xs[c0 + nc] - xs[c0]), int(ys[r0 + nr] - ys[r0])])
+        return zonas
+
+    def _ampliar(self, zona, shape):
+        x, y, zw, zh = zona
+        h, w = shape[:2]
+        x0, y0 = max(0, x - self.margin), max(0, y - self.margin)
+        x1, y1 = min(w, x + zw + self.margin), min(h, y + zh + self.margin)
+        if self.detector.roi: # No tiene sentido inferir fuera del ROI del detector
+            rx, ry, rw, rh = (int(v) for v in self.detector.roi)
+            x0, y0, x1, y1 = max(x0, rx), max(y0, ry), min(x1, rx + rw), min(y1, ry + rh)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return [x0, y0, x1 - x0, y1 - y0]
+
+    def _imgsz_zona(self, zona, shape):
+        """imgsz (múltiplo de 32) que mantiene la escala de la inferencia completa en la zona."""
+        if self.detector.tile_size:
+            return None # Por teselas ya se infiere a la escala configurada
+        h, w = shape[:2]
+        if self.detector.roi:
+            w, h = int(self.detector.roi[2]), int(self.detector.roi[3])
+        escala = self.detector.imgsz / max(w, h)
+        return max(32, int(np.ceil(max(zona[2], zona[3]) * escala / 32.0)) * 32)
+
+    @staticmethod
+    def _toca(det, zonas):
+        x1, y1, x2, y2 = det["bounding_box"]
+        return any(x1 < zx + zw and x2 > zx and y1 < zy + zh and y2 > zy for zx, zy, zw, zh in zonas)
+
+    def _resultado(self, imagen, detections):
+        """Empaqueta detecciones (reutilizadas o fusionadas) con la misma interfaz que un resultado del detector."""
+        xyxy = np.array([d["bounding_box"] for d in detections], dtype=float).reshape(-1, 4)
+        conf = np.array([d["confidence"] for d in detections], dtype=float)
+        cls = np.array([d["class"] for d in detections], dtype=int)
+        return ResultadoNativo(imagen, xyxy, conf, cls, self.detector.nombres_clases)
+
+    def analizar(self, imagen):
+        """
+        Sustituto de TaponesDetector.analizar_imagen para frames BGR en memoria.
+        Devuelve (results, detections) y deja el resumen del ciclo en self.ultimo_ciclo.
+        """
+        t0 = time.perf_counter()
+        small, hashes = self._firma(imagen)
+        n_teselas = self.grid[0] * self.grid[1]
+
+        modo, zonas = "completa", []
+        if (self._small is not None and self._small.shape == small.shape
+                and self._reusos < self.max_reuses):
+            cambiadas = self.teselas_cambiadas(small, hashes)
+            if not cambiadas.any():
+                modo = "omitida"
+            elif self.detector.tamano_variable:
+                zonas = self._zonas(cambiadas, imagen.shape)
+                area = sum(zw * zh for _, _, zw, zh in zonas) / float(imagen.shape[0] * imagen.shape[1])
+                if area <= self.max_partial_area:
+                    modo = "parcial"
+            reutilizadas = int(n_teselas - cambiadas.sum())
+        else:
+            reutilizadas = 0
+
+        if modo == "omitida":
+            detections = [dict(d) for d in self._detections]
+            results = self._resultado(imagen, detections)
+        elif modo == "parcial":
+            detections = [dict(d) for d in self._detections if not self._toca(d, zonas)]
+            for zona in zonas:
+                ampliada = self._ampliar(zona, imagen.shape)
+                if ampliada is None:
+                    continue
+                _, nuevas = self.detector.analizar_imagen(imagen, roi=ampliada,
+                                                          imgsz=self._imgsz_zona(ampliada, imagen.shape))
+                # Las del margen que no tocan la zona cambiada ya están en caché
+                detections.extend(d for d in nuevas if self._toca(d, [zona]))
+            results = self._resultado(imagen, detections)
+        else:
+            results, detections = self.detector.analizar_imagen(imagen)
+            reutilizadas = 0
+
+        elapsed = time.perf_counter() - t0
+        if modo == "completa":
+            self._reusos = 0
+            self._t_completa = elapsed if self._t_completa is None else 0.8 * self._t_completa + 0.2 * elapsed
+        else:
+            self._reusos += 1
+        ahorro = max(0.0, self._t_completa - elapsed) if self._t_completa is not None and modo != "completa" else 0.0
+
+        self._small, self._hashes, self._detections = small, hashes, [dict(d) for d in detections]
+        self.stats["ciclos"] += 1
+        self.stats[{"omitida": "omitidas", "parcial": "parciales", "completa": "completas"}[modo]] += 1
+        self.stats["teselas_reutilizadas"] += reutilizadas
+        self.stats["teselas_totales"] += n_teselas
+        self.stats["ahorro_s"] += ahorro
+        self.ultimo_ciclo = {"modo": modo, "zonas": zonas, "teselas_reutilizadas": reutilizadas,
+                             "tiempo_s": elapsed, "ahorro_s": ahorro}
+        print(f"INFO: Caché de escena: inferencia {modo}, {reutilizadas}/{n_teselas} teselas reutilizadas, "
+              f"{elapsed * 1000:.1f} ms (ahorro {ahorro * 1000:.1f} ms). Acumulado: "
+              f"acierto {self.tasa_acierto() * 100:.0f}% de teselas, {self.stats['omitidas']} inferencias omitidas, "
+              f"ahorro total {self.stats['ahorro_s']:.2f} s")
+        return results, detections
+
+    def tasa_acierto(self):
+        """Fracción de teselas reutilizadas desde el inicio."""
+        return self.stats["teselas_reutilizadas"] / self.stats["teselas_totales"] if self.stats["teselas_totales"] else 0.0
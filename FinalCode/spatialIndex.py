@@ -0,0 +1,72 @@
+# spatialIndex.py
+"""
+Índice de rejilla uniforme sobre las cajas de las detecciones para consultas de vecindad.
+
+Cada caja se asigna a la celda de su centroide. Con celdas de lado radio + lado máximo de caja,
+dos cajas a menos de `radio` píxeles de hueco están siempre en la misma celda o en una de las 8
+vecinas, así que solo se comparan esos pares: O(N · vecinos) en lugar de la matriz N×N.
+Todo se hace vectorizado con NumPy (ordenación por celda + searchsorted), sin bucles por caja.
+"""
+import numpy as np
+
+CELL_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def hueco_cajas(a, b):
+    """Distancia euclídea (píxeles) entre cajas xyxy emparejadas fila a fila (0 si se solapan)."""
+    dx = np.maximum(0.0, np.maximum(a[:, 0], b[:, 0]) - np.minimum(a[:, 2], b[:, 2]))
+    dy = np.maximum(0.0, np.maximum(a[:, 1], b[:, 1]) - np.minimum(a[:, 3], b[:, 3]))
+    return np.hypot(dx, dy)
+
+
+class IndiceRejilla:
+    def __init__(self, boxes, radio):
+        """
+        boxes: Cajas xyxy (N, 4) en píxeles.
+        radio: Hueco máximo (píxeles) de las consultas; los vecinos más alejados se ignoran.
+        """
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.radio = float(radio)
+        n = len(self.boxes)
+        lados = self.boxes[:, 2:] - self.boxes[:, :2]
+        self.cell = self.radio + (float(lados.max()) if n else 0.0) + 1.0
+        centros = (self.boxes[:, :2] + self.boxes[:, 2:]) / 2
+        celdas = np.floor(centros / self.cell).astype(np.int64)
+        if n:
+            celdas -= celdas.min(axis=0) - 1 # Índices >= 1: las celdas vecinas (±1) no colisionan entre columnas
+        self._filas = int(celdas[:, 1].max()) + 2 if n else 1
+        self._claves = celdas[:, 0] * self._filas + celdas[:, 1]
+        self._orden = np.argsort(self._claves, kind="stable")
+        self._claves_ordenadas = self._claves[self._orden]
+
+    def pares_cercanos(self):
+        """Pares (i, j, hueco) con i != j y hueco < radio (cada par aparece en los dos sentidos)."""
+        n = len(self.boxes)
+        todos_i, todos_j = [], []
+        for dx, dy in CELL_OFFSETS:
+            vecina = self._claves + dx * self._filas + dy
+            lo = np.searchsorted(self._claves_ordenadas, vecina, side="left")
+            cuenta = np.searchsorted(self._claves_ordenadas, vecina, side="right") - lo
+            total = int(cuenta.sum())
+            if total == 0:
+                continue
+            i = np.repeat(np.arange(n), cuenta)
+            # Posición dentro del tramo [lo, lo + cuenta) de cada celda vecina
+            desplazamiento = np.arange(total) - np.repeat(np.cumsum(cuenta) - cuenta, cuenta)
+            todos_i.append(i)
+            todos_j.append(self._orden[np.repeat(lo, cuenta) + desplazamiento])
+        if not todos_i:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+        i, j = np.concatenate(todos_i), np.concatenate(todos_j)
+        distintos = i != j
+        i, j = i[distintos], j[distintos]
+        huecos = hueco_cajas(self.boxes[i], self.boxes[j])
+        cerca = huecos < self.radio
+        return i[cerca], j[cerca], huecos[cerca]
+
+    def holguras(self):
+        """Hueco libre de cada caja con la más cercana de las demás (inf si no hay ninguna a menos de radio)."""
+        holgura = np.full(len(self.boxes), np.inf)
+        i, _, huecos = self.pares_cercanos()
+        np.minimum.at(holgura, i, huecos)
+        return holgura
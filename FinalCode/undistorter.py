@@ -0,0 +1,165 @@
+# undistorter.py
+import os
+import json
+import hashlib
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+class Undistorter:
+    """
+    Desdistorsión de imágenes con mapas de remapeo precalculados:
+      - Los mapas (initUndistortRectifyMap) se calculan una sola vez por (intrínsecos, resolución).
+      - Se guardan en formato de punto fijo (CV_16SC2 + CV_16UC1), que cv2.remap aplica más rápido.
+      - Opcionalmente se persisten como .npy junto al JSON de calibración y se cargan
+        con memoria mapeada en los siguientes arranques.
+    """
+
+    def __init__(self,
+                 camera_matrix,
+                 dist_coeffs,
+                 alpha: Optional[float] = None,
+                 cache_dir: Optional[str] = None,
+                 cache_prefix: str = "intrinsic_calibration_data"):
+        """
+        alpha: None conserva la matriz de cámara original (como cv2.undistort sin newCameraMatrix);
+               un valor en [0, 1] usa getOptimalNewCameraMatrix(alpha) como las herramientas de calibración.
+        cache_dir: Directorio donde persistir los mapas. None los mantiene solo en memoria.
+        """
+        self.camera_matrix = np.asarray(camera_matrix, dtype=np.float64)
+        self.dist_coeffs = np.asarray(dist_coeffs, dtype=np.float64)
+        self.alpha = alpha
+        self.cache_dir = cache_dir
+        self.cache_prefix = cache_prefix
+        self._maps: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._new_matrices: Dict[Tuple[int, int], np.ndarray] = {}
+        self._roi_maps: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_json(cls, json_path: str, alpha: Optional[float] = None, persist: bool = True) -> "Undistorter":
+        """Crea el undistorter a partir de intrinsic_calibration_data.json (mapas junto al JSON)."""
+        with open(json_path, "r") as f:
+            data = json.load(f)
+        cache_dir = (os.path.dirname(os.path.abspath(json_path)) or ".") if persist else None
+        prefix = os.path.splitext(os.path.basename(json_path))[0]
+        return cls(data["camera_matrix"], data["dist_coeffs"], alpha=alpha,
+                   cache_dir=cache_dir, cache_prefix=prefix)
+
+    def _cache_paths(self, size: Tuple[int, int]) -> Tuple[str, str]:
+        # El hash de los intrínsecos invalida los mapas si se recalibra la cámara
+        key = hashlib.sha1(self.camera_matrix.tobytes() + self.dist_coeffs.tobytes()
+                           + repr(self.alpha).encode()).hexdigest()[:10]
+        base = os.path.join(self.cache_dir, f"{self.cache_prefix}_remap_{size[0]}x{size[1]}_{key}")
+        return base + "_map1.npy", base + "_map2.npy"
+
+    def new_camera_matrix(self, size: Tuple[int, int]) -> np.ndarray:
+        """Matriz de cámara de la imagen desdistorsionada para una resolución (w, h)."""
+        new_matrix = self._new_matrices.get(size)
+        if new_matrix is None:
+            if self.alpha is None:
+                new_matrix = self.camera_matrix
+            else:
+                new_matrix, _ = cv2.getOptimalNewCameraMatrix(self.camera_matrix, self.dist_coeffs, size, self.alpha)
+            self._new_matrices[size] = new_matrix
+        return new_matrix
+
+    def _get_maps(self, size: Tuple[int, int]):
+        maps = self._maps.get(size)
+        if maps is not None:
+            return maps
+
+        new_matrix = self.new_camera_matrix(size)
+        map1 = map2 = None
+        if self.cache_dir:
+            path1, path2 = self._cache_paths(size)
+            if os.path.exists(path1) and os.path.exists(path2):
+                try:
+                    map1 = np.load(path1, mmap_mode="r")
+                    map2 = np.load(path2, mmap_mode="r")
+                except (OSError, ValueError) as e:
+                    print(f"WARN: No se pudieron cargar los mapas de desdistorsión en caché: {e}")
+                    map1 = map2 = None
+
+        if map1 is None:
+            map1, map2 = cv2.initUndistortRectifyMap(self.camera_matrix, self.dist_coeffs, None,
+                                                     new_matrix, size, cv2.CV_16SC2)
+            if self.cache_dir:
+                try:
+                    np.save(path1, map1)
+                    np.save(path2, map2)
+                except OSError as e:
+                    print(f"WARN: No se pudieron guardar los mapas de desdistorsión: {e}")
+
+        maps = (map1, map2, new_matrix)
+        self._maps[size] = maps
+        return maps
+
+    def undistort(self, image, interpolation: int = cv2.INTER_LINEAR,
+                  offset: Tuple[int, int] = (0, 0), full_size: Optional[Tuple[int, int]] = None):
+        """
+        Desdistorsiona `image` con cv2.remap usando los mapas de su resolución.
+        Si `image` es un recorte (ROI) de un frame de tamaño `full_size` situado en `offset`,
+        se usa la porción correspondiente de los mapas del frame completo: el resultado es
+        esa misma región de la imagen desdistorsionada completa.
+        """
+        h, w = image.shape[:2]
+        if full_size is None or (tuple(offset) == (0, 0) and tuple(full_size) == (w, h)):
+            map1, map2, _ = self._get_maps((w, h))
+        else:
+            map1, map2 = self._get_roi_maps(tuple(full_size), tuple(offset), (w, h))
+        return cv2.remap(image, map1, map2, interpolation)
+
+    def _get_roi_maps(self, full_size, offset, size):
+        key = (full_size, offset, size)
+        maps = self._roi_maps.get(key)
+        if maps is None:
+            full_map1, full_map2, _ = self._get_maps(full_size)
+            (x, y), (w, h) = offset, size
+            # Coordenadas de origen relativas al recorte (los píxeles fuera de él quedan en negro)
+            map1 = np.ascontiguousarray(full_map1[y:y + h, x:x + w]) - np.array([x, y], dtype=np.int16)
+            map2 = np.ascontiguousarray(full_map2[y:y + h, x:x + w])
+            maps = (map1, map2)
+            self._roi_maps[key] = maps
+        return maps
+
+    def undistort_points(self, points, size: Tuple[int, int]) -> np.ndarray:
+        """
+        Lleva puntos (N, 2) de la imagen cruda a las coordenadas de la imagen desdistorsionada
+        (las mismas que daría undistort() sobre el frame completo), sin remapear la imagen.
+        """
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if pts.shape[0] == 0:
+            return np.empty((0, 2), dtype=np.float64)
+        new_matrix = self.new_camera_matrix(size)
+        return cv2.undistortPoints(pts, self.camera_matrix, self.dist_coeffs, P=new_matrix).reshape(-1, 2)
+
+    def undistort_detections(self, detections: List[Dict], size: Tuple[int, int]) -> List[Dict]:
+        """
+        Devuelve una copia de `detections` (formato de TaponesDetector.analizar_imagen) con
+        'bounding_box', 'centroid' y 'area' en coordenadas desdistorsionadas. Las cuatro
+        esquinas de cada caja y su centroide se transforman en una sola llamada.
+        """
+        if not detections:
+            return []
+        boxes = np.array([det["bounding_box"] for det in detections], dtype=np.float64)
+        centroids = np.array([det["centroid"] for det in detections], dtype=np.float64)
+        x1, y1, x2, y2 = boxes.T
+        corners = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                            np.stack([x1, y2], 1), np.stack([x2, y2], 1)], axis=1) # (N, 4, 2)
+
+        n = len(detections)
+        mapped = self.undistort_points(np.concatenate([corners.reshape(-1, 2), centroids]), size)
+        mapped_corners = mapped[:4 * n].reshape(n, 4, 2)
+        mapped_centroids = np.rint(mapped[4 * n:]).astype(int)
+        new_boxes = np.concatenate([mapped_corners.min(axis=1), mapped_corners.max(axis=1)], axis=1)
+        new_boxes = np.rint(new_boxes).astype(int)
+
+        undistorted = []
+        for det, box, centroid in zip(detections, new_boxes, mapped_centroids):
+            bx1, by1, bx2, by2 = (int(v) for v in box)
+            new_det = dict(det)
+            new_det["bounding_box"] = [bx1, by1, bx2, by2]
+            new_det["centroid"] = [int(centroid[0]), int(centroid[1])]
+            new_det["area"] = (bx2 - bx1) * (by2 - by1)
+            undistorted.append(new_det)
+        return undistorted
@@ -5,17 +5,45 @@ import time
 ROBOT_IP = "169.254.12.28"
 SPEED = 1.0
 ACCELERATION = 1.4
-WAIT_TIME = 2.0
+WAIT_TIME = 0.0              # Espera mínima tras cada movimiento (s); el final se detecta por RTDE
+SETTLE_TOLERANCE_RAD = 1e-3  # Error articular máximo para dar un moveJ por terminado
+SETTLE_TOLERANCE_M = 5e-4    # Error de posición TCP máximo para dar un moveL por terminado
+SETTLE_VELOCITY = 2e-3       # Velocidad máxima (rad/s o m/s) para considerar el robot parado
+SETTLE_TIMEOUT = 2.0         # Espera máxima de asentamiento (s)
+
+def wait_until_settled(con_rcv, target, joint_space):
+    """Espera a que el robot esté en `target` y parado; devuelve el tiempo de asentamiento (s)."""
+    t0 = time.perf_counter()
+    if WAIT_TIME > 0:
+        time.sleep(WAIT_TIME)
+    while True:
+        if joint_space:
+            actual, velocidad = con_rcv.getActualQ(), con_rcv.getActualQd()
+            error = max(abs(a - b) for a, b in zip(actual, target))
+            tolerancia = SETTLE_TOLERANCE_RAD
+        else:
+            actual, velocidad = con_rcv.getActualTCPPose(), con_rcv.getActualTCPSpeed()
+            error = sum((a - b) ** 2 for a, b in zip(actual[:3], target[:3])) ** 0.5
+            tolerancia = SETTLE_TOLERANCE_M
+        if error <= tolerancia and max(abs(v) for v in velocidad) <= SETTLE_VELOCITY:
+            break
+        if time.perf_counter() - t0 >= SETTLE_TIMEOUT:
+            print(f"AVISO: El robot no se asentó en {SETTLE_TIMEOUT} s (error {error:.2e}).")
+            break
+        time.sleep(0.004)
+    settle_time = time.perf_counter() - t0
+    print(f"Asentado en {settle_time * 1000:.0f} ms")
+    return settle_time
 
 def move_joint(con_ctr, con_rcv, q, speed, acceleration):
     print(f"Moviendo a la posición articular: {q}")
     con_ctr.moveJ(q, speed, acceleration)
-    time.sleep(WAIT_TIME)
+    wait_until_settled(con_rcv, q, joint_space=True)
     return con_rcv.getActualTCPPose()
 
 def move_linear(con_ctr, con_rcv, pose, speed, acceleration):
     con_ctr.moveL(pose, speed, acceleration)
-    time.sleep(WAIT_TIME)
+    wait_until_settled(con_rcv, pose, joint_space=False)
     return con_rcv.getActualTCPPose()
 
 if __name__ == "__main__":